@@ -8,13 +8,20 @@ into 2D and 3D visualizations.
 
 import os
 import sys
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Iterator, Tuple, Union
+
+import rerun as rr
 
 # Add SpatialLM to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
 
 from spatiallm import Layout
 from claude_api import ClaudeAPI
+from incremental_layout import LayoutChanges, LayoutSession
+from model_router import ModelRouter
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight, description_key
+from template_router import route_simple_description
 from text_to_layout import TextToLayout
 
 
@@ -24,58 +31,287 @@ class ArcLLM:
     into 2D and 3D visualizations.
     """
 
-    def __init__(self, claude_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        claude_api_key: Optional[str] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        use_templates: bool = True,
+        model: Optional[str] = None,
+        model_router: Optional[ModelRouter] = None,
+    ):
         """
         Initialize Arc LLM.
 
         Args:
             claude_api_key: Optional API key for Claude API. If not provided,
                            will look for CLAUDE_API_KEY environment variable.
+            semantic_cache: Optional cache of structured descriptions. Texts
+                            similar to a cached one reuse its description
+                            instead of calling the Claude API.
+            use_templates: If True, simple single-room descriptions are laid
+                           out by a local template without calling the
+                           Claude API.
+            model: Optional Claude model to use for every description.
+            model_router: Optional policy choosing the model per description
+                          instead, escalating to stronger models when an
+                          output does not parse.
         """
-        self.claude_api = ClaudeAPI(api_key=claude_api_key)
+        self.claude_api = ClaudeAPI(api_key=claude_api_key, model=model)
         self.text_to_layout = TextToLayout(claude_api_key=claude_api_key)
+        self.semantic_cache = semantic_cache
+        self.use_templates = use_templates
+        self.model_router = model_router
+        # Coalesces identical in-flight requests
+        self.single_flight = SingleFlight()
 
-    def convert_text_to_layout(self, text: str) -> str:
+    def convert_text_to_layout(
+        self,
+        text: str,
+        parallel: bool = False,
+        compact: bool = False,
+        return_model: bool = False,
+    ) -> Union[str, Tuple[str, Optional[str]]]:
         """
         Convert text description to layout format.
 
+        Concurrent calls with the same normalized description and options
+        share a single Claude API request and all receive its result.
+
         Args:
             text: Text description of the scene.
+            parallel: If True, generate each floor in a separate concurrent
+                      Claude API request.
+            compact: If True, have Claude emit compact JSON records instead of
+                     English lines, which cuts the generated tokens.
+            return_model: If True, also return the model that generated the
+                          accepted description.
 
         Returns:
-            Layout string in SpatialLM format.
+            Layout string in SpatialLM format, or a tuple of the layout string
+            and the model if `return_model` is True. The model is None when
+            the description came from the templates or the semantic cache.
         """
-        # Generate structured layout description using Claude API
-        layout_description = self.claude_api.generate_layout_description(text)
-        
-        # Convert structured layout description to SpatialLM layout format
-        layout_str = self.text_to_layout.generate_layout(layout_description)
+        key = description_key(text, parallel, compact)
+        layout_str, model = self.single_flight.do(
+            key, self._convert_text_to_layout, text, parallel, compact
+        )
+        return (layout_str, model) if return_model else layout_str
+
+    async def convert_text_to_layout_async(
+        self,
+        text: str,
+        parallel: bool = False,
+        compact: bool = False,
+        return_model: bool = False,
+    ) -> Union[str, Tuple[str, Optional[str]]]:
+        """
+        Awaitable version of `convert_text_to_layout`.
+
+        Async and threaded callers are coalesced together.
+
+        Args:
+            text: Text description of the scene.
+            parallel: If True, generate each floor in a separate concurrent
+                      Claude API request.
+            compact: If True, have Claude emit compact JSON records.
+            return_model: If True, also return the model that generated the
+                          accepted description.
+
+        Returns:
+            Layout string in SpatialLM format, or a tuple of the layout string
+            and the model (None for template or cached descriptions).
+        """
+        key = description_key(text, parallel, compact)
+        layout_str, model = await self.single_flight.do_async(
+            key, self._convert_text_to_layout, text, parallel, compact
+        )
+        return (layout_str, model) if return_model else layout_str
+
+    def _known_description(self, text: str) -> Optional[str]:
+        """Get a structured description from the templates or cache, if any."""
+        layout_description = None
+        if self.use_templates:
+            layout_description = route_simple_description(text)
+
+        if layout_description is None and self.semantic_cache is not None:
+            layout_description = self.semantic_cache.get(text)
+
+        return layout_description
+
+    def _convert_text_to_layout(self, text: str, parallel: bool, compact: bool) -> Tuple[str, Optional[str]]:
+        """Convert text description to layout format without coalescing; also returns the model."""
+        layout_description = self._known_description(text)
+        if layout_description is not None:
+            return self.text_to_layout.generate_layout(layout_description), None
+
+        # Generate structured layout description using Claude API, moving up
+        # the router's models while the output does not parse into any walls
+        models = self.model_router.candidates(text) if self.model_router else [None]
+        for model in models:
+            if compact:
+                layout_description = self.claude_api.generate_layout_description_compact(text, model=model)
+            elif parallel:
+                layout_description = self.claude_api.generate_layout_description_parallel(text, model=model)
+            else:
+                layout_description = self.claude_api.generate_layout_description(text, model=model)
+
+            # Convert structured layout description to SpatialLM layout format
+            layout = self.text_to_layout.build_layout(layout_description)
+            if layout.walls:
+                break
+
+        if layout.walls and self.semantic_cache is not None:
+            self.semantic_cache.put(text, layout_description)
         
-        return layout_str
+        return layout.to_language_string(), model or self.claude_api.model
 
-    def visualize(self, layout_str: str, output_file: Optional[str] = None) -> None:
+    def new_session(self) -> LayoutSession:
+        """
+        Start an incremental layout session.
+
+        The session is fed structured descriptions directly, so edits skip the
+        Claude API call and only the changed lines are re-parsed.
+
+        Returns:
+            A new LayoutSession using this instance's converter.
+        """
+        return LayoutSession(converter=self.text_to_layout)
+
+    def visualize(
+        self,
+        layout_str: str,
+        output_file: Optional[str] = None,
+        instanced: bool = False,
+    ) -> None:
         """
         Visualize layout using rerun.
 
         Args:
             layout_str: Layout string in SpatialLM format.
             output_file: Optional output file path for saving the visualization.
+            instanced: If True, log one box template per object class with
+                       per-instance poses instead of one entity per object.
         """
-        self.text_to_layout.visualize_layout(layout_str, output_file=output_file)
+        self.text_to_layout.visualize_layout(
+            layout_str, output_file=output_file, instanced=instanced
+        )
 
-    def text_to_visualization(self, text: str, output_file: Optional[str] = None) -> str:
+    def visualize_chunked(
+        self,
+        layout_str: str,
+        output_dir: str,
+        instanced: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Visualize layout as per-floor, per-level-of-detail `.rrd` chunks.
+
+        Args:
+            layout_str: Layout string in SpatialLM format.
+            output_dir: Directory to write the chunk files and manifest into.
+            instanced: If True, log one box template per object class.
+
+        Returns:
+            The chunk manifest.
+        """
+        return self.text_to_layout.visualize_layout_chunked(
+            layout_str, output_dir, instanced=instanced
+        )
+
+    def follow_text(
+        self,
+        text: str,
+        session: LayoutSession,
+        recording: Optional["rr.RecordingStream"] = None,
+        interval: float = 0.2,
+    ) -> Iterator[LayoutChanges]:
+        """
+        Build a layout in a session while its description is generated.
+
+        The structured description is streamed from the Claude API, unless
+        the templates or the semantic cache already have one, and fed to
+        `LayoutSession.follow`. Once the stream ends, `session.description`
+        holds the complete description and `session.model` the model that
+        generated it (None for template or cached descriptions).
+
+        Args:
+            text: Text description of the scene.
+            session: Session to build the layout in, e.g. from `new_session`.
+            recording: Optional open recording to log each update to.
+            interval: Minimum time in seconds between session updates.
+
+        Yields:
+            The changes of every session update.
+        """
+        layout_description = self._known_description(text)
+        generated = layout_description is None
+        if generated:
+            # Entities are shown as they arrive, so the routed model is not
+            # escalated from once streaming has started
+            model = self.model_router.select(text) if self.model_router else None
+            lines = self.claude_api.generate_layout_description_stream(text, model=model)
+            session.model = model or self.claude_api.model
+        else:
+            lines = iter(layout_description.split("\n"))
+            session.model = None
+
+        yield from session.follow(lines, recording=recording, interval=interval)
+
+        if generated and self.semantic_cache is not None:
+            self.semantic_cache.put(text, session.description)
+
+    def text_to_live_visualization(
+        self,
+        text: str,
+        connect: Optional[str] = None,
+        serve: bool = False,
+        interval: float = 0.2,
+    ) -> str:
+        """
+        Convert text to a layout while streaming it to a live rerun viewer.
+
+        The structured description is streamed from the Claude API and fed
+        to an incremental session as it arrives, so entities show up in the
+        viewer while the rest of the building is still being generated.
+
+        Args:
+            text: Text description of the scene.
+            connect: Address ("host:port") of a running rerun viewer. A
+                     viewer is spawned if neither this nor `serve` is given.
+            serve: If True, serve a web viewer from this process.
+            interval: Minimum time in seconds between viewer updates.
+
+        Returns:
+            Layout string in SpatialLM format.
+        """
+        session = self.new_session()
+        recording = session.live_recording(connect=connect, serve=serve)
+        for _ in self.follow_text(text, session, recording=recording, interval=interval):
+            pass
+        # A served viewer lives as long as its recording, so it is kept open
+        if not serve:
+            recording.disconnect()
+
+        return self.text_to_layout.generate_layout(session.description)
+
+    def text_to_visualization(
+        self,
+        text: str,
+        output_file: Optional[str] = None,
+        instanced: bool = False,
+    ) -> str:
         """
         Convert text description to visualization.
 
         Args:
             text: Text description of the scene.
             output_file: Optional output file path for saving the visualization.
+            instanced: If True, log one box template per object class.
 
         Returns:
             Layout string in SpatialLM format.
         """
         layout_str = self.convert_text_to_layout(text)
-        self.visualize(layout_str, output_file=output_file)
+        self.visualize(layout_str, output_file=output_file, instanced=instanced)
         return layout_str
 
 
@@ -87,6 +323,13 @@ def main():
     parser.add_argument("--text-file", type=str, help="File containing text description")
     parser.add_argument("--output", type=str, help="Output file path for layout")
     parser.add_argument("--vis-output", type=str, help="Output file path for visualization")
+    parser.add_argument("--instanced", action="store_true", help="Log one box template per object class")
+    parser.add_argument("--no-templates", action="store_true", help="Always use the Claude API, even for simple rooms")
+    parser.add_argument("--live", action="store_true", help="Stream entities to a rerun viewer while generating")
+    parser.add_argument("--connect", type=str, help="Address of a running rerun viewer for --live (host:port)")
+    parser.add_argument("--serve", action="store_true", help="Serve a web viewer for --live instead of spawning one")
+    parser.add_argument("--model", type=str, help="Claude model to use for every description")
+    parser.add_argument("--route", action="store_true", help="Choose the Claude model by description size, escalating on parse failures")
     parser.add_argument("--claude-api-key", type=str, help="Claude API key")
     
     args = parser.parse_args()
@@ -102,10 +345,22 @@ def main():
         return
     
     # Create Arc LLM
-    arc_llm = ArcLLM(claude_api_key=args.claude_api_key)
+    arc_llm = ArcLLM(
+        claude_api_key=args.claude_api_key,
+        use_templates=not args.no_templates,
+        model=args.model,
+        model_router=ModelRouter() if args.route else None,
+    )
     
     # Convert text to visualization
-    layout_str = arc_llm.text_to_visualization(text, output_file=args.vis_output)
+    if args.live:
+        layout_str = arc_llm.text_to_live_visualization(
+            text, connect=args.connect, serve=args.serve
+        )
+    else:
+        layout_str = arc_llm.text_to_visualization(
+            text, output_file=args.vis_output, instanced=args.instanced
+        )
     
     # Save layout
     if args.output:
@@ -113,6 +368,15 @@ def main():
             f.write(layout_str)
     
     print(layout_str)
+    
+    usage = arc_llm.claude_api.usage.summary()
+    if usage["calls"]:
+        print(f"Claude API: {usage['calls']} calls, {usage['input_tokens']} input and "
+              f"{usage['output_tokens']} output tokens, ${usage['cost']:.4f}")
+    
+    # The web viewer is served from this process
+    if args.live and args.serve:
+        input("Serving the viewer, press Enter to exit")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Building Connectivity Graph for Arc LLM
+
+This module turns a layout into a graph with rooms as nodes and doors,
+openings, archways and staircases as edges, stored as compressed sparse rows
+(CSR). It answers reachability, shortest-path and unreachable-room queries
+for circulation and egress checks, and caches all-pairs distances for small
+buildings so repeated queries are table lookups.
+"""
+
+import argparse
+import heapq
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import floor_index, floor_levels
+from room_geometry import Room, extract_rooms, points_in_polygons
+from text_to_layout import TextToLayout
+
+# Edge kinds, stored as small integers in the adjacency arrays
+EDGE_KINDS = ["door", "opening", "archway", "staircase"]
+
+# Buildings with at most this many nodes get a cached all-pairs table
+ALL_PAIRS_LIMIT = 256
+
+EXTERIOR = "exterior"
+
+STAIRCASE_PATTERN = re.compile(
+    r"staircase\s+from\s+floor\s+(\d+)\s+to\s+floor\s+(\d+)\s+at\s+position\s+\(([^)]+)\)",
+    re.IGNORECASE,
+)
+
+
+class BuildingGraph:
+    """
+    Undirected room connectivity graph in CSR form.
+
+    Node 0 is the exterior, so doors in outside walls connect rooms to it;
+    nodes 1..n are rooms. Edge weights are walking distances in meters
+    between room centroids through the connecting door or staircase.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        edges: List[Tuple[int, int, float, str]],
+        rooms: Optional[List[Room]] = None,
+    ):
+        """
+        Build the CSR adjacency from an edge list.
+
+        Args:
+            names: Node names, with the exterior first.
+            edges: (node, node, weight, kind) tuples; each is stored in both
+                   directions, and parallel edges keep the lightest weight.
+            rooms: Room polygons of nodes 1..n, if built from geometry.
+        """
+        self.names = names
+        self.rooms = rooms or []
+        self.index = {name: i for i, name in enumerate(names)}
+
+        best: Dict[Tuple[int, int], Tuple[float, int]] = {}
+        for a, b, weight, kind in edges:
+            if a == b:
+                continue
+            key = (min(a, b), max(a, b))
+            value = (weight, EDGE_KINDS.index(kind))
+            if key not in best or value < best[key]:
+                best[key] = value
+
+        count = len(names)
+        sources = np.array([k[0] for k in best] + [k[1] for k in best], dtype=np.int64)
+        targets = np.array([k[1] for k in best] + [k[0] for k in best], dtype=np.int64)
+        weights = np.array([v[0] for v in best.values()] * 2, dtype=np.float64)
+        kinds = np.array([v[1] for v in best.values()] * 2, dtype=np.int8)
+
+        order = np.argsort(sources, kind="stable")
+        self.indices = targets[order]
+        self.weights = weights[order]
+        self.kinds = kinds[order]
+        self.indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=count), out=self.indptr[1:])
+
+        self._hops: Optional[np.ndarray] = None
+        self._distances: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def node(self, room: Union[int, str]) -> int:
+        """Get a node index from a node index or name."""
+        return room if isinstance(room, (int, np.integer)) else self.index[room]
+
+    def neighbours(self, room: Union[int, str]) -> List[Tuple[int, str, float]]:
+        """List the (node, edge kind, weight) pairs adjacent to a node."""
+        i = self.node(room)
+        span = slice(self.indptr[i], self.indptr[i + 1])
+        return [
+            (int(n), EDGE_KINDS[k], float(w))
+            for n, k, w in zip(self.indices[span], self.kinds[span], self.weights[span])
+        ]
+
+    def _bfs(self, source: int) -> np.ndarray:
+        """Hop counts from a node to every node (-1 if unreachable)."""
+        hops = np.full(len(self.names), -1, dtype=np.int64)
+        hops[source] = 0
+        frontier = np.array([source])
+        level = 0
+        while len(frontier):
+            level += 1
+            # Gather the neighbours of the whole frontier at once
+            starts, ends = self.indptr[frontier], self.indptr[frontier + 1]
+            lengths = ends - starts
+            if not lengths.sum():
+                break
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            candidates = np.unique(self.indices[offsets])
+            frontier = candidates[hops[candidates] < 0]
+            hops[frontier] = level
+        return hops
+
+    def _dijkstra(self, source: int) -> np.ndarray:
+        """Walking distances from a node to every node (inf if unreachable)."""
+        distances = np.full(len(self.names), np.inf)
+        distances[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            for i in range(self.indptr[node], self.indptr[node + 1]):
+                candidate = distance + self.weights[i]
+                target = self.indices[i]
+                if candidate < distances[target]:
+                    distances[target] = candidate
+                    heapq.heappush(heap, (candidate, target))
+        return distances
+
+    def _all_pairs(self) -> bool:
+        """Compute the all-pairs tables once, for small buildings only."""
+        if self._distances is not None:
+            return True
+        count = len(self.names)
+        if count > ALL_PAIRS_LIMIT:
+            return False
+
+        # Floyd-Warshall, vectorized over each intermediate node
+        distances = np.full((count, count), np.inf)
+        hops = np.full((count, count), np.inf)
+        np.fill_diagonal(distances, 0.0)
+        np.fill_diagonal(hops, 0.0)
+        sources = np.repeat(np.arange(count), np.diff(self.indptr))
+        distances[sources, self.indices] = self.weights
+        hops[sources, self.indices] = 1.0
+        for k in range(count):
+            np.minimum(distances, distances[:, k:k + 1] + distances[k:k + 1, :], out=distances)
+            np.minimum(hops, hops[:, k:k + 1] + hops[k:k + 1, :], out=hops)
+
+        self._distances = distances
+        self._hops = np.where(np.isinf(hops), -1, hops).astype(np.int64)
+        return True
+
+    def hops(self, source: Union[int, str]) -> np.ndarray:
+        """Number of connections from a node to every node (-1 if unreachable)."""
+        source = self.node(source)
+        if self._all_pairs():
+            return self._hops[source]
+        return self._bfs(source)
+
+    def distances(self, source: Union[int, str]) -> np.ndarray:
+        """Walking distance from a node to every node (inf if unreachable)."""
+        source = self.node(source)
+        if self._all_pairs():
+            return self._distances[source]
+        return self._dijkstra(source)
+
+    def reachable(self, source: Union[int, str], target: Union[int, str]) -> bool:
+        """Whether target can be reached from source."""
+        return bool(self.hops(source)[self.node(target)] >= 0)
+
+    def distance(self, source: Union[int, str], target: Union[int, str]) -> float:
+        """Shortest walking distance between two nodes (inf if unreachable)."""
+        return float(self.distances(source)[self.node(target)])
+
+    def unreachable(self, source: Union[int, str] = EXTERIOR) -> List[str]:
+        """
+        List the rooms that cannot be reached from a node.
+
+        Args:
+            source: Node to start from; the exterior by default, which gives
+                    the rooms with no way out of the building.
+
+        Returns:
+            Names of the unreachable nodes.
+        """
+        hops = self.hops(source)
+        return [self.names[i] for i in np.flatnonzero(hops < 0)]
+
+    @classmethod
+    def from_layout(
+        cls,
+        layout: Union[Layout, str],
+        description: Optional[str] = None,
+        tolerance: float = 0.05,
+    ) -> "BuildingGraph":
+        """
+        Build the graph of a layout's rooms.
+
+        Rooms are traced from the walls (see `room_geometry.extract_rooms`)
+        and each door connects the rooms on either side of its wall, or a
+        room and the exterior. A structured description, if given, adds its
+        staircases and its "connected to ... via" openings and archways;
+        description rooms are matched to traced rooms on the same floor by
+        their dimensions.
+
+        Args:
+            layout: Layout or layout string in SpatialLM format.
+            description: Optional structured description the layout came from.
+            tolerance: Distance in meters within which wall endpoints meet.
+
+        Returns:
+            The building graph.
+        """
+        if isinstance(layout, str):
+            layout = Layout(layout)
+        rooms = extract_rooms(layout, tolerance)
+        levels = floor_levels(layout)
+        names = [EXTERIOR] + [f"room_{room.index}" for room in rooms]
+        polygons = [room.polygon for room in rooms]
+        centroids = np.array([room.polygon.mean(axis=0) for room in rooms]).reshape(-1, 2)
+        room_floors = np.array([room.floor for room in rooms], dtype=np.int64)
+
+        def locate(points: np.ndarray, floors: np.ndarray) -> np.ndarray:
+            """Node of the smallest room containing each point, or 0."""
+            if not rooms:
+                return np.zeros(len(points), dtype=np.int64)
+            inside = points_in_polygons(points, polygons)
+            inside &= floors[:, np.newaxis] == room_floors[np.newaxis, :]
+            areas = np.array([room.area for room in rooms])
+            best = np.argmin(np.where(inside, areas[np.newaxis, :], np.inf), axis=1)
+            return np.where(inside.any(axis=1), best + 1, 0)
+
+        def walk(a: int, b: int, point: np.ndarray) -> float:
+            """Distance between two room centroids through a point."""
+            total = 0.0
+            for node in (a, b):
+                if node:
+                    total += float(np.hypot(*(centroids[node - 1] - point)))
+            return total
+
+        edges: List[Tuple[int, int, float, str]] = []
+
+        # Doors: probe just beyond both faces of the wall
+        walls = {wall.id: wall for wall in layout.walls}
+        doors = [door for door in layout.doors if door.wall_id in walls]
+        if doors and rooms:
+            centers = np.array([[d.position_x, d.position_y] for d in doors])
+            normals, offsets = [], []
+            for door in doors:
+                wall = walls[door.wall_id]
+                direction = np.array([wall.bx - wall.ax, wall.by - wall.ay], dtype=np.float64)
+                direction /= max(np.hypot(*direction), 1e-9)
+                normals.append([-direction[1], direction[0]])
+                offsets.append(max(wall.thickness, 0.1))
+            probe = np.array(normals) * np.array(offsets)[:, np.newaxis]
+            floors = np.array([floor_index(levels, d.position_z) for d in doors])
+            left = locate(centers + probe, floors)
+            right = locate(centers - probe, floors)
+            for a, b, center in zip(left.tolist(), right.tolist(), centers):
+                edges.append((a, b, walk(a, b, center), "door"))
+
+        if description:
+            edges.extend(_description_edges(description, rooms, names, levels, locate, walk))
+
+        return cls(names, edges, rooms)
+
+
+def _description_edges(description, rooms, names, levels, locate, walk):
+    """
+    Derive staircase, opening and archway edges from a structured description.
+
+    Description rooms are given names of matching traced rooms in `names`.
+    """
+    edges = []
+
+    # Staircases join the rooms at their position on both floors
+    for match in STAIRCASE_PATTERN.finditer(description):
+        low, high = int(match.group(1)), int(match.group(2))
+        position = [float(v) for v in match.group(3).split(",")]
+        if max(low, high) >= len(levels):
+            continue
+        point = np.array([position[:2], position[:2]])
+        a, b = locate(point, np.array([low, high])).tolist()
+        rise = abs(levels[high] - levels[low])
+        edges.append((a, b, walk(a, b, point[0]) + rise, "staircase"))
+
+    # Match named rooms to traced rooms of the same floor and size
+    floors = TextToLayout()._parse_floors_and_rooms(description)
+    named: Dict[str, int] = {}
+    taken = set()
+    for floor_num, floor_info in floors.items():
+        for room_name, room_info in floor_info["rooms"].items():
+            size = sorted((room_info["width"], room_info["length"]))
+            best, best_error = None, None
+            for room in rooms:
+                if room.floor != floor_num or room.index in taken:
+                    continue
+                extent = sorted(np.ptp(room.polygon, axis=0).tolist())
+                error = abs(extent[0] - size[0]) + abs(extent[1] - size[1])
+                if best is None or error < best_error:
+                    best, best_error = room, error
+            if best is not None and best_error <= 0.1 * sum(size):
+                taken.add(best.index)
+                named[room_name] = best.index + 1
+                names[best.index + 1] = room_name
+
+    for floor_info in floors.values():
+        for room_name, room_info in floor_info["rooms"].items():
+            other = room_info["connected_to"]
+            kind = (room_info["connection_type"] or "").lower()
+            if kind not in ("opening", "archway") or room_name not in named or other not in named:
+                continue
+            a, b = named[room_name], named[other]
+            midpoint = (rooms[a - 1].polygon.mean(axis=0) + rooms[b - 1].polygon.mean(axis=0)) / 2
+            edges.append((a, b, walk(a, b, midpoint), kind))
+    return edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the connectivity of a SpatialLM layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file")
+    parser.add_argument("--description-file", type=str, help="Structured description the layout came from")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout_str = f.read()
+    description = None
+    if args.description_file:
+        with open(args.description_file, "r") as f:
+            description = f.read()
+
+    graph = BuildingGraph.from_layout(layout_str, description)
+    distances = graph.distances(EXTERIOR)
+    for i, name in enumerate(graph.names[1:], start=1):
+        links = ", ".join(f"{graph.names[n]} ({kind})" for n, kind, _ in graph.neighbours(i))
+        print(f"{name}: {distances[i]:.1f} m from exterior; connects to {links or 'nothing'}")
+
+    unreachable = graph.unreachable()
+    if unreachable:
+        print(f"Unreachable from the exterior: {', '.join(unreachable)}")
+    else:
+        print("Every room is reachable from the exterior")
+
+
+if __name__ == "__main__":
+    main()
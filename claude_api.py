@@ -7,9 +7,139 @@ layout descriptions from text input.
 """
 
 import os
+import re
 import json
+import queue
+import threading
+import time
 import requests
-from typing import Dict, List, Optional, Union, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union, Any
+
+from usage_ledger import CallUsage, UsageLedger
+
+DEFAULT_MODEL = "claude-3-opus-20240229"
+
+LAYOUT_SYSTEM_PROMPT = """
+        You are a specialized assistant that converts natural language descriptions of buildings, houses, and spaces into structured layout descriptions. Your task is to analyze the user's description and generate a structured representation that follows these specific formats:
+
+        # Basic Elements
+        1. Walls: "wall from (x1,y1,z1) to (x2,y2,z2) with height h and thickness t"
+        2. Doors: "door on wall N at position (x,y,z) with width w and height h"
+        3. Windows: "window on wall N at position (x,y,z) with width w and height h"
+        4. Objects: "a [object_name] at position (x,y,z) with angle a and scale (sx,sy,sz)"
+
+        # Multi-Floor Support
+        5. Floors: "floor N at height h with dimensions (width, length)"
+        6. Staircases: "staircase from floor N to floor M at position (x,y,z) with width w and direction d"
+
+        # Room Relationships
+        7. Rooms: "room [room_name] on floor N with dimensions (width, length) connected to [other_room] via [connection_type]"
+        8. Open Areas: "open area between [room1] and [room2] with dimensions (width, length)"
+
+        # Advanced Object Types
+        9. Architectural Features: "a [feature_type] at position (x,y,z) with dimensions (w,l,h) and style [style]"
+        10. Built-ins: "a built-in [type] along wall N from position (x1,y1,z1) to (x2,y2,z2) with height h"
+        11. Fixtures: "a [fixture_type] at position (x,y,z) facing direction d with dimensions (w,l,h)"
+
+        # Measurement and Proportion
+        12. Dimensions: "set [room/object] dimensions to (w,l,h) in [units]"
+        13. Proportions: "make [room1] [X] times larger than [room2]"
+        14. Constraints: "ensure minimum distance of [distance] between [object1] and [object2]"
+
+        # Style and Material
+        15. Materials: "set [element] material to [material_type] with color [color]"
+        16. Style: "apply [style_name] style to [room/entire_house]"
+
+        Where:
+        - Coordinates are in meters unless otherwise specified
+        - Wall N refers to the Nth wall defined (starting from 0)
+        - Floor N refers to the Nth floor (0 = ground floor, 1 = first floor, etc.)
+        - Angles are in radians
+        - Scale values are in meters
+        - Connection types include: "door", "opening", "archway"
+        - Direction values include: "north", "south", "east", "west" or degrees in radians
+
+        Your response should ONLY contain these structured descriptions, one per line, with no additional text or explanations. Use reasonable default values for any dimensions not specified in the description.
+
+        For complex descriptions like multi-floor buildings or houses with multiple rooms, organize your response by floor and then by room, using comments (lines starting with #) to indicate sections:
+
+        # Example output for a two-story house:
+        # Ground Floor
+        floor 0 at height 0 with dimensions (10, 15)
+        room living_room on floor 0 with dimensions (5, 7) connected to kitchen via opening
+        wall from (0,0,0) to (5,0,0) with height 2.8 and thickness 0.2
+        wall from (5,0,0) to (5,7,0) with height 2.8 and thickness 0.2
+        wall from (5,7,0) to (0,7,0) with height 2.8 and thickness 0.2
+        wall from (0,7,0) to (0,0,0) with height 2.8 and thickness 0.2
+        window on wall 0 at position (2.5,0,1.0) with width 1.5 and height 1.0
+        a sofa at position (2.5,6,0) with angle 3.14 and scale (2.0,0.8,0.8)
+        a coffee_table at position (2.5,4,0) with angle 0 and scale (1.2,1.2,0.5)
+        
+        room kitchen on floor 0 with dimensions (5, 5) connected to living_room via opening
+        wall from (5,0,0) to (10,0,0) with height 2.8 and thickness 0.2
+        wall from (10,0,0) to (10,5,0) with height 2.8 and thickness 0.2
+        wall from (10,5,0) to (5,5,0) with height 2.8 and thickness 0.2
+        a built-in cabinet along wall 0 from position (6,0,0) to (9,0,0) with height 2.0
+        
+        # First Floor
+        floor 1 at height 3.0 with dimensions (10, 15)
+        staircase from floor 0 to floor 1 at position (8,10,0) with width 1.0 and direction west
+        
+        room bedroom on floor 1 with dimensions (5, 5) connected to hallway via door
+        wall from (0,0,3.0) to (5,0,3.0) with height 2.8 and thickness 0.2
+        wall from (5,0,3.0) to (5,5,3.0) with height 2.8 and thickness 0.2
+        wall from (5,5,3.0) to (0,5,3.0) with height 2.8 and thickness 0.2
+        wall from (0,5,3.0) to (0,0,3.0) with height 2.8 and thickness 0.2
+        door on wall 2 at position (2.5,5,3.0) with width 1.0 and height 2.0
+        a bed at position (2.5,2.5,3.0) with angle 0 and scale (2.0,1.6,0.5)
+        """
+
+PLANNING_SYSTEM_PROMPT = """
+        You are a specialized assistant that plans the floors and rooms of buildings described in natural language. Your task is to produce only the skeleton of the building, using these formats:
+
+        1. Floors: "floor N at height h with dimensions (width, length)"
+        2. Rooms: "room [room_name] on floor N with dimensions (width, length) connected to [other_room] via [connection_type]"
+        3. Staircases: "staircase from floor N to floor M at position (x,y,z) with width w and direction d"
+
+        Where coordinates and dimensions are in meters, floor 0 is the ground floor and connection types include "door", "opening" and "archway".
+
+        Your response should ONLY contain these lines, one per line, with no walls, doors, windows, objects or additional text.
+        """
+
+COMPACT_SYSTEM_PROMPT = """
+        You are a specialized assistant that converts natural language descriptions of buildings, houses, and spaces into compact structured layouts. Output one JSON array per line, using these records:
+
+        ["f", floor, height, width, length]                        floor
+        ["r", name, floor, width, length, connected_to, via]       room (last two optional)
+        ["s", from_floor, to_floor, x, y, z, width, direction]     staircase
+        ["w", x1, y1, z1, x2, y2, z2, height, thickness]           wall (height defaults to 2.8, thickness to 0.2)
+        ["d", wall, x, y, z, width, height]                        door (width defaults to 1.0, height to 2.0)
+        ["wi", wall, x, y, z, width, height]                       window (width defaults to 1.5, height to 1.0)
+        ["b", class, x, y, z, angle, sx, sy, sz]                   object (angle defaults to 0, scale to 1)
+        ["bi", class, wall, x1, y1, z1, x2, y2, z2, height]        built-in along a wall (height defaults to 2.0)
+
+        Where:
+        - Coordinates are in meters and angles in radians
+        - wall refers to the Nth "w" record (starting from 0)
+        - Trailing values equal to their defaults must be left out
+        - Fixtures and architectural features are objects ("b" records)
+
+        Your response should ONLY contain these arrays, one per line, with no additional text. For example:
+        ["f",0,0,10,15]
+        ["r","living_room",0,5,7,"kitchen","opening"]
+        ["w",0,0,0,5,0,0]
+        ["w",5,0,0,5,7,0]
+        ["wi",0,2.5,0,1.0]
+        ["b","sofa",2.5,6,0,3.14,2.0,0.8,0.8]
+        ["bi","cabinet",0,1,0,0,4,0,0]
+        """
+
+FLOOR_LINE_PATTERN = re.compile(r"^floor\s+(\d+)\s+at\s+height", re.IGNORECASE)
+ROOM_LINE_PATTERN = re.compile(r"^room\s+\w+\s+on\s+floor\s+(\d+)", re.IGNORECASE)
+STAIRCASE_LINE_PATTERN = re.compile(r"^staircase\s+from\s+floor\s+(\d+)", re.IGNORECASE)
+WALL_LINE_PATTERN = re.compile(r"^wall\s+from", re.IGNORECASE)
+WALL_REFERENCE_PATTERN = re.compile(r"((?:on|along)\s+wall\s+)(\d+)", re.IGNORECASE)
 
 
 class ClaudeAPI:
@@ -17,13 +147,27 @@ class ClaudeAPI:
     Client for interacting with the Claude API.
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: Optional[str] = None,
+        model: Optional[str] = None,
+        usage: Optional[UsageLedger] = None,
+    ):
         """
         Initialize the Claude API client.
 
         Args:
             api_key: Claude API key. If not provided, will look for CLAUDE_API_KEY
                     environment variable.
+            api_url: Messages API endpoint. If not provided, will look for the
+                    CLAUDE_API_URL environment variable, e.g. to point at
+                    mock_claude_server, and default to the Anthropic API.
+            model: Default Claude model. If not provided, will look for the
+                   CLAUDE_MODEL environment variable and default to
+                   `DEFAULT_MODEL`.
+            usage: Optional ledger to record the tokens and latency of every
+                   call in; a new one if not provided.
         """
         self.api_key = api_key or os.environ.get("CLAUDE_API_KEY")
         if not self.api_key:
@@ -32,152 +176,390 @@ class ClaudeAPI:
                 "set the CLAUDE_API_KEY environment variable."
             )
         
-        self.api_url = "https://api.anthropic.com/v1/messages"
+        self.api_url = (
+            api_url
+            or os.environ.get("CLAUDE_API_URL")
+            or "https://api.anthropic.com/v1/messages"
+        )
+        self.model = model or os.environ.get("CLAUDE_MODEL") or DEFAULT_MODEL
+        self.usage = usage if usage is not None else UsageLedger()
         self.headers = {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
 
+    def _build_request(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        prefill: Optional[str] = None,
+        stream: bool = False,
+    ) -> Dict[str, Any]:
+        """Build the JSON body of a Messages API request."""
+        if system_prompt is None:
+            system_prompt = (
+                "You are a helpful assistant that generates structured layout descriptions "
+                "for 3D scenes. Your task is to convert the user's text description into "
+                "a structured format that can be used to create a 3D visualization."
+            )
+
+        messages = [
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ]
+        # A trailing assistant message makes Claude continue from that text
+        if prefill:
+            messages.append({
+                "role": "assistant",
+                "content": prefill,
+            })
+
+        data = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "system": system_prompt,
+            "messages": messages,
+        }
+        if stream:
+            data["stream"] = True
+        return data
+
     def generate(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        model: str = "claude-3-opus-20240229",
+        model: Optional[str] = None,
         max_tokens: int = 4096,
         temperature: float = 0.7,
+        max_continuations: int = 4,
     ) -> str:
         """
         Generate a response from Claude.
 
+        If a response stops because it hit `max_tokens`, it is cut back to its
+        last complete line and a continuation request resumes from there, up
+        to `max_continuations` times. The pieces are stitched into one text.
+
         Args:
             prompt: The user prompt to send to Claude.
             system_prompt: Optional system prompt to provide context.
-            model: Claude model to use.
-            max_tokens: Maximum number of tokens to generate.
+            model: Claude model to use; the client's default if None.
+            max_tokens: Maximum number of tokens to generate per request.
             temperature: Sampling temperature.
+            max_continuations: Maximum number of continuation requests.
 
         Returns:
             Generated text response.
         """
-        if system_prompt is None:
-            system_prompt = (
-                "You are a helpful assistant that generates structured layout descriptions "
-                "for 3D scenes. Your task is to convert the user's text description into "
-                "a structured format that can be used to create a 3D visualization."
+        model = model or self.model
+        prefill = None
+        for attempt in range(max_continuations + 1):
+            data = self._build_request(
+                prompt, system_prompt, model, max_tokens, temperature, prefill=prefill
             )
 
-        data = {
-            "model": model,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "system": system_prompt,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-        }
+            start = time.perf_counter()
+            response = requests.post(
+                self.api_url,
+                headers=self.headers,
+                json=data,
+            )
+
+            if response.status_code != 200:
+                raise Exception(f"API request failed: {response.text}")
+
+            result = response.json()
+            usage = result.get("usage", {})
+            self.usage.record(CallUsage(
+                model,
+                usage.get("input_tokens", 0),
+                usage.get("output_tokens", 0),
+                time.perf_counter() - start,
+                stop_reason=result.get("stop_reason"),
+            ))
+            text = (prefill or "") + result["content"][0]["text"]
+
+            if result.get("stop_reason") != "max_tokens" or attempt == max_continuations:
+                return text
+
+            # Resume from the last complete line; the cut-off line is regenerated
+            prefill = _complete_lines(text)
+
+        return text
+
+    def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        max_continuations: int = 4,
+    ) -> Iterator[str]:
+        """
+        Stream a response from Claude line by line.
+
+        The response is read on a background thread, so when it stops at
+        `max_tokens` the continuation request is issued immediately, while
+        the caller is still consuming the lines already received.
 
+        Args:
+            prompt: The user prompt to send to Claude.
+            system_prompt: Optional system prompt to provide context.
+            model: Claude model to use; the client's default if None.
+            max_tokens: Maximum number of tokens to generate per request.
+            temperature: Sampling temperature.
+            max_continuations: Maximum number of continuation requests.
+
+        Yields:
+            Complete lines of the response, without the trailing newline.
+        """
+        model = model or self.model
+        lines: "queue.Queue" = queue.Queue()
+        done = object()
+
+        def produce():
+            try:
+                emitted: List[str] = []
+                # Start of a line kept in the prefill when no line was complete
+                carry = ""
+                for attempt in range(max_continuations + 1):
+                    prefill = None
+                    # Text the continuation repeats after the prefill, which
+                    # was already emitted: the newlines the prefill is
+                    # stripped of, since it may not end in whitespace
+                    skip = ""
+                    if attempt:
+                        received = "\n".join(emitted + [carry])
+                        prefill = received.rstrip() or None
+                        if not carry:
+                            skip = received[len(prefill or ""):]
+                    data = self._build_request(
+                        prompt, system_prompt, model, max_tokens, temperature,
+                        prefill=prefill, stream=True,
+                    )
+
+                    buffer = carry
+                    stop_reason = None
+                    input_tokens = output_tokens = 0
+                    first_token_latency = None
+                    start = time.perf_counter()
+                    for event in self._stream_events(data):
+                        if event["type"] == "message_start":
+                            input_tokens = event["message"].get("usage", {}).get("input_tokens", 0)
+                        elif event["type"] == "content_block_delta":
+                            if first_token_latency is None:
+                                first_token_latency = time.perf_counter() - start
+                            buffer += event["delta"].get("text", "")
+                            if skip:
+                                if skip.startswith(buffer):
+                                    continue
+                                if buffer.startswith(skip):
+                                    buffer = buffer[len(skip):]
+                                skip = ""
+                            while "\n" in buffer:
+                                line, buffer = buffer.split("\n", 1)
+                                emitted.append(line)
+                                lines.put(line)
+                        elif event["type"] == "message_delta":
+                            stop_reason = event["delta"].get("stop_reason")
+                            output_tokens = event.get("usage", {}).get("output_tokens", output_tokens)
+                    self.usage.record(CallUsage(
+                        model, input_tokens, output_tokens, time.perf_counter() - start,
+                        first_token_latency=first_token_latency, stop_reason=stop_reason,
+                    ))
+
+                    if stop_reason != "max_tokens" or attempt == max_continuations:
+                        # A buffer still being matched against skip is repeated text
+                        if buffer and not skip:
+                            lines.put(buffer)
+                        break
+
+                    # The cut-off line is regenerated, unless nothing is complete yet
+                    carry = "" if emitted else buffer.rstrip()
+            except Exception as e:
+                lines.put(e)
+            finally:
+                lines.put(done)
+
+        threading.Thread(target=produce, daemon=True).start()
+
+        while True:
+            item = lines.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _stream_events(self, data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Send a streaming request and yield its server-sent events."""
         response = requests.post(
             self.api_url,
             headers=self.headers,
             json=data,
+            stream=True,
         )
 
         if response.status_code != 200:
             raise Exception(f"API request failed: {response.text}")
 
-        result = response.json()
-        return result["content"][0]["text"]
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):].strip())
+                if event.get("type") == "error":
+                    raise Exception(f"API request failed: {event.get('error')}")
+                yield event
 
-    def generate_layout_description(self, text: str) -> str:
+    def generate_layout_description(self, text: str, model: Optional[str] = None) -> str:
         """
         Generate a structured layout description from text.
 
         Args:
             text: Text description of the scene.
+            model: Claude model to use; the client's default if None.
 
         Returns:
             Structured layout description.
         """
-        system_prompt = """
-        You are a specialized assistant that converts natural language descriptions of buildings, houses, and spaces into structured layout descriptions. Your task is to analyze the user's description and generate a structured representation that follows these specific formats:
+        system_prompt = LAYOUT_SYSTEM_PROMPT
 
-        # Basic Elements
-        1. Walls: "wall from (x1,y1,z1) to (x2,y2,z2) with height h and thickness t"
-        2. Doors: "door on wall N at position (x,y,z) with width w and height h"
-        3. Windows: "window on wall N at position (x,y,z) with width w and height h"
-        4. Objects: "a [object_name] at position (x,y,z) with angle a and scale (sx,sy,sz)"
+        prompt = _layout_prompt(text)
 
-        # Multi-Floor Support
-        5. Floors: "floor N at height h with dimensions (width, length)"
-        6. Staircases: "staircase from floor N to floor M at position (x,y,z) with width w and direction d"
+        return self.generate(prompt, system_prompt=system_prompt, model=model)
 
-        # Room Relationships
-        7. Rooms: "room [room_name] on floor N with dimensions (width, length) connected to [other_room] via [connection_type]"
-        8. Open Areas: "open area between [room1] and [room2] with dimensions (width, length)"
+    def generate_layout_description_compact(self, text: str, model: Optional[str] = None) -> str:
+        """
+        Generate a compact structured layout description from text.
 
-        # Advanced Object Types
-        9. Architectural Features: "a [feature_type] at position (x,y,z) with dimensions (w,l,h) and style [style]"
-        10. Built-ins: "a built-in [type] along wall N from position (x1,y1,z1) to (x2,y2,z2) with height h"
-        11. Fixtures: "a [fixture_type] at position (x,y,z) facing direction d with dimensions (w,l,h)"
+        The model emits one JSON array per entity with default values left
+        out, which needs far fewer output tokens than the English grammar.
+        TextToLayout parses it without regular expressions.
 
-        # Measurement and Proportion
-        12. Dimensions: "set [room/object] dimensions to (w,l,h) in [units]"
-        13. Proportions: "make [room1] [X] times larger than [room2]"
-        14. Constraints: "ensure minimum distance of [distance] between [object1] and [object2]"
+        Args:
+            text: Text description of the scene.
+            model: Claude model to use; the client's default if None.
 
-        # Style and Material
-        15. Materials: "set [element] material to [material_type] with color [color]"
-        16. Style: "apply [style_name] style to [room/entire_house]"
+        Returns:
+            Compact structured layout description, one JSON array per line.
+        """
+        prompt = f"""
+        Please convert the following description into compact layout records:
 
-        Where:
-        - Coordinates are in meters unless otherwise specified
-        - Wall N refers to the Nth wall defined (starting from 0)
-        - Floor N refers to the Nth floor (0 = ground floor, 1 = first floor, etc.)
-        - Angles are in radians
-        - Scale values are in meters
-        - Connection types include: "door", "opening", "archway"
-        - Direction values include: "north", "south", "east", "west" or degrees in radians
+        {text}
 
-        Your response should ONLY contain these structured descriptions, one per line, with no additional text or explanations. Use reasonable default values for any dimensions not specified in the description.
+        Remember to output only JSON arrays, one per line.
+        """
 
-        For complex descriptions like multi-floor buildings or houses with multiple rooms, organize your response by floor and then by room, using comments (lines starting with #) to indicate sections:
+        return self.generate(prompt, system_prompt=COMPACT_SYSTEM_PROMPT, model=model)
 
-        # Example output for a two-story house:
-        # Ground Floor
-        floor 0 at height 0 with dimensions (10, 15)
-        room living_room on floor 0 with dimensions (5, 7) connected to kitchen via opening
-        wall from (0,0,0) to (5,0,0) with height 2.8 and thickness 0.2
-        wall from (5,0,0) to (5,7,0) with height 2.8 and thickness 0.2
-        wall from (5,7,0) to (0,7,0) with height 2.8 and thickness 0.2
-        wall from (0,7,0) to (0,0,0) with height 2.8 and thickness 0.2
-        window on wall 0 at position (2.5,0,1.0) with width 1.5 and height 1.0
-        a sofa at position (2.5,6,0) with angle 3.14 and scale (2.0,0.8,0.8)
-        a coffee_table at position (2.5,4,0) with angle 0 and scale (1.2,1.2,0.5)
-        
-        room kitchen on floor 0 with dimensions (5, 5) connected to living_room via opening
-        wall from (5,0,0) to (10,0,0) with height 2.8 and thickness 0.2
-        wall from (10,0,0) to (10,5,0) with height 2.8 and thickness 0.2
-        wall from (10,5,0) to (5,5,0) with height 2.8 and thickness 0.2
-        a built-in cabinet along wall 0 from position (6,0,0) to (9,0,0) with height 2.0
-        
-        # First Floor
-        floor 1 at height 3.0 with dimensions (10, 15)
-        staircase from floor 0 to floor 1 at position (8,10,0) with width 1.0 and direction west
-        
-        room bedroom on floor 1 with dimensions (5, 5) connected to hallway via door
-        wall from (0,0,3.0) to (5,0,3.0) with height 2.8 and thickness 0.2
-        wall from (5,0,3.0) to (5,5,3.0) with height 2.8 and thickness 0.2
-        wall from (5,5,3.0) to (0,5,3.0) with height 2.8 and thickness 0.2
-        wall from (0,5,3.0) to (0,0,3.0) with height 2.8 and thickness 0.2
-        door on wall 2 at position (2.5,5,3.0) with width 1.0 and height 2.0
-        a bed at position (2.5,2.5,3.0) with angle 0 and scale (2.0,1.6,0.5)
+    def generate_layout_description_stream(
+        self,
+        text: str,
+        model: Optional[str] = None,
+    ) -> Iterator[str]:
         """
+        Stream a structured layout description from text, line by line.
 
-        prompt = f"""
+        Args:
+            text: Text description of the scene.
+            model: Claude model to use; the client's default if None.
+
+        Yields:
+            Lines of the structured layout description as they are generated.
+        """
+        return self.generate_stream(
+            _layout_prompt(text), system_prompt=LAYOUT_SYSTEM_PROMPT, model=model
+        )
+
+    def generate_layout_description_parallel(
+        self,
+        text: str,
+        max_workers: int = 4,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        Generate a structured layout description with one request per floor.
+
+        A short planning request first produces the floor, room and staircase
+        skeleton. The walls, openings and objects of each floor are then
+        requested concurrently and merged into a single description, with wall
+        indices re-based so they stay global across floors.
+
+        Args:
+            text: Text description of the scene.
+            max_workers: Maximum number of concurrent floor requests.
+            model: Claude model to use; the client's default if None.
+
+        Returns:
+            Structured layout description.
+        """
+        plan_prompt = f"""
+        Please plan the floors and rooms of the following description:
+
+        {text}
+
+        Remember to output only floor, room and staircase lines, one per line.
+        """
+        skeleton = self.generate(
+            plan_prompt, system_prompt=PLANNING_SYSTEM_PROMPT, model=model, max_tokens=1024
+        )
+
+        # Group the skeleton lines by the floor they belong to
+        floors: Dict[int, List[str]] = {}
+        for line in skeleton.split("\n"):
+            line = line.strip()
+            for pattern in (FLOOR_LINE_PATTERN, ROOM_LINE_PATTERN, STAIRCASE_LINE_PATTERN):
+                match = pattern.match(line)
+                if match:
+                    floors.setdefault(int(match.group(1)), []).append(line)
+                    break
+
+        # Nothing to fan out over, so a single request is just as fast
+        if len(floors) < 2:
+            return self.generate_layout_description(text, model=model)
+
+        def generate_floor(floor_num: int) -> str:
+            floor_skeleton = "\n".join(floors[floor_num])
+            prompt = f"""
+        Please convert the following description into a structured layout format:
+
+        {text}
+
+        The building has this floor and room plan:
+
+        {skeleton}
+
+        Only describe floor {floor_num}, whose plan is:
+
+        {floor_skeleton}
+
+        Output the walls, doors, windows and objects of this floor only, without floor, room or staircase lines. Number walls starting from 0 for this floor.
+        Remember to follow the specified format exactly, with one structure per line.
+        """
+            return self.generate(prompt, system_prompt=LAYOUT_SYSTEM_PROMPT, model=model)
+
+        floor_nums = sorted(floors)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            details = list(executor.map(generate_floor, floor_nums))
+
+        return merge_floor_descriptions(
+            [floors[floor_num] for floor_num in floor_nums], details
+        )
+
+
+def _layout_prompt(text: str) -> str:
+    """Build the user prompt asking for a structured layout description."""
+    return f"""
         Please convert the following description into a structured layout format:
 
         {text}
@@ -185,7 +567,59 @@ class ClaudeAPI:
         Remember to follow the specified format exactly, with one structure per line.
         """
 
-        return self.generate(prompt, system_prompt=system_prompt)
+
+def _complete_lines(text: str) -> str:
+    """
+    Cut text back to its last complete line.
+
+    Trailing whitespace is removed, since the API rejects assistant prefills
+    that end in whitespace. Text without any newline is returned whole.
+    """
+    if "\n" in text:
+        text = text[:text.rindex("\n")]
+    return text.rstrip()
+
+
+def merge_floor_descriptions(skeletons: List[List[str]], details: List[str]) -> str:
+    """
+    Merge per-floor structured descriptions into one.
+
+    Each floor's detail output numbers its walls from 0. References such as
+    "on wall N" and "along wall N" are shifted by the number of walls on the
+    preceding floors so they index the merged description. Floor, room and
+    staircase lines in the details are dropped in favour of the skeleton.
+
+    Args:
+        skeletons: Floor, room and staircase lines of each floor, in order.
+        details: Structured description generated for each floor, in order.
+
+    Returns:
+        The merged structured description.
+    """
+    merged = []
+    wall_offset = 0
+    for skeleton, detail in zip(skeletons, details):
+        merged.extend(skeleton)
+        floor_walls = 0
+        for line in detail.split("\n"):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if any(
+                pattern.match(line)
+                for pattern in (FLOOR_LINE_PATTERN, ROOM_LINE_PATTERN, STAIRCASE_LINE_PATTERN)
+            ):
+                continue
+            if WALL_LINE_PATTERN.match(line):
+                floor_walls += 1
+            elif wall_offset:
+                line = WALL_REFERENCE_PATTERN.sub(
+                    lambda m: f"{m.group(1)}{int(m.group(2)) + wall_offset}", line
+                )
+            merged.append(line)
+        wall_offset += floor_walls
+        merged.append("")
+    return "\n".join(merged).strip()
 
 
 if __name__ == "__main__":
@@ -195,6 +629,9 @@ if __name__ == "__main__":
     parser.add_argument("--api-key", type=str, help="Claude API key")
     parser.add_argument("--text", type=str, help="Text description of the scene")
     parser.add_argument("--text-file", type=str, help="File containing text description")
+    parser.add_argument("--parallel", action="store_true", help="Generate each floor in a separate concurrent request")
+    parser.add_argument("--compact", action="store_true", help="Generate compact JSON records instead of English lines")
+    parser.add_argument("--model", type=str, help=f"Claude model to use (default: {DEFAULT_MODEL})")
     
     args = parser.parse_args()
     
@@ -208,9 +645,14 @@ if __name__ == "__main__":
         text = "A living room with a sofa against the north wall, a coffee table in the center, and a TV on the south wall. There's a window on the east wall and a door on the west wall."
     
     # Create Claude API client
-    claude_api = ClaudeAPI(api_key=args.api_key)
+    claude_api = ClaudeAPI(api_key=args.api_key, model=args.model)
     
     # Generate layout description
-    layout_description = claude_api.generate_layout_description(text)
+    if args.compact:
+        layout_description = claude_api.generate_layout_description_compact(text)
+    elif args.parallel:
+        layout_description = claude_api.generate_layout_description_parallel(text)
+    else:
+        layout_description = claude_api.generate_layout_description(text)
     
     print(layout_description)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Entity Feed for Arc LLM
+
+This module buffers the events of one layout generation so any number of
+clients can read them as they are produced. Every event gets a sequence
+number that doubles as a resume cursor, so a client that reconnects with
+its last seen number receives exactly the events it missed.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class FeedEvent:
+    """One event of a feed: a sequence number, an event type and JSON data."""
+
+    def __init__(self, event_id: int, event_type: str, data: Any):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def to_sse(self) -> str:
+        """Format the event as a server-sent event."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class EntityFeed:
+    """
+    Append-only, thread-safe event log for one generation.
+
+    The producer calls `publish` and finally `close`; readers call `wait`
+    or iterate `stream` from a cursor. Sequence numbers start at 1, so a
+    cursor of 0 reads the feed from the beginning.
+    """
+
+    def __init__(self):
+        self.events: List[FeedEvent] = []
+        self.closed = False
+        self.created = time.time()
+        self._condition = threading.Condition()
+
+    def publish(self, event_type: str, data: Any) -> int:
+        """
+        Append an event and wake up waiting readers.
+
+        Returns:
+            The event's sequence number.
+        """
+        with self._condition:
+            if self.closed:
+                raise RuntimeError("Feed is closed")
+            event = FeedEvent(len(self.events) + 1, event_type, data)
+            self.events.append(event)
+            self._condition.notify_all()
+            return event.id
+
+    def close(self, event_type: Optional[str] = None, data: Any = None) -> None:
+        """Mark the feed as complete, optionally publishing a final event."""
+        with self._condition:
+            if event_type is not None and not self.closed:
+                self.events.append(FeedEvent(len(self.events) + 1, event_type, data))
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait(self, cursor: int, timeout: Optional[float] = None) -> Tuple[List[FeedEvent], bool]:
+        """
+        Get the events after a cursor, waiting for new ones if there are none.
+
+        Args:
+            cursor: Sequence number of the last event the reader has seen.
+            timeout: Maximum time in seconds to wait for a new event.
+
+        Returns:
+            Tuple of the events after the cursor (possibly empty on timeout)
+            and whether the feed is closed.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self.events) > cursor or self.closed, timeout=timeout
+            )
+            return self.events[max(cursor, 0):], self.closed
+
+    def stream(self, cursor: int = 0, keepalive: float = 15.0) -> Iterator[str]:
+        """
+        Yield the feed after a cursor as server-sent events until it closes.
+
+        A comment line is sent every `keepalive` seconds without events so
+        proxies do not drop idle connections.
+
+        Args:
+            cursor: Sequence number of the last event the client has seen,
+                    e.g. from the `Last-Event-ID` header.
+            keepalive: Seconds between keep-alive comments.
+
+        Yields:
+            Server-sent event text.
+        """
+        yield "retry: 1000\n\n"
+        while True:
+            events, closed = self.wait(cursor, timeout=keepalive)
+            for event in events:
+                yield event.to_sse()
+            if events:
+                cursor = events[-1].id
+            elif not closed:
+                yield ": keep-alive\n\n"
+            if closed and cursor >= len(self.events):
+                return
+
+
+def parse_cursor(value: Optional[str]) -> int:
+    """Parse a `Last-Event-ID` value, treating missing or invalid ones as 0."""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Floor Plan Renderer for Arc LLM
+
+This module renders a top-down 2D floor plan of a layout as SVG or PNG using
+only NumPy, so a preview can be produced without going through rerun.
+"""
+
+import argparse
+import html
+import os
+import struct
+import sys
+import zlib
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import box_footprints, floor_index, floor_levels
+
+# Fill colors (RGB) per drawing category, drawn in this order
+CATEGORY_COLORS = {
+    "furniture": (205, 214, 224),
+    "wall": (40, 40, 40),
+    "window": (110, 170, 230),
+    "door": (200, 150, 90),
+}
+BACKGROUND_COLOR = (255, 255, 255)
+
+
+def _as_layout(layout: Union[Layout, str]) -> Layout:
+    """Parse a layout string, or return a Layout unchanged."""
+    if isinstance(layout, str):
+        return Layout(layout)
+    return layout
+
+
+def _category(class_name: str) -> str:
+    """Map a box class to its drawing category."""
+    return class_name if class_name in ("wall", "door", "window") else "furniture"
+
+
+def floor_plan_polygons(
+    layout: Union[Layout, str],
+    floor: Optional[int] = None,
+) -> List[Tuple[str, str, np.ndarray]]:
+    """
+    Collect the footprint polygons of a layout in drawing order.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        floor: Optional floor index to restrict the plan to.
+
+    Returns:
+        List of (category, label, corners) tuples, where corners has shape
+        (4, 2). Furniture comes first so walls and openings draw on top.
+    """
+    layout = _as_layout(layout)
+    boxes = layout.to_boxes()
+    footprints = box_footprints(boxes)
+
+    if floor is not None:
+        levels = floor_levels(layout)
+        keep = np.array(
+            [floor_index(levels, box["center"][2]) == floor for box in boxes],
+            dtype=bool,
+        )
+        boxes = [box for box, k in zip(boxes, keep) if k]
+        footprints = footprints[keep]
+
+    polygons = []
+    for category in CATEGORY_COLORS:
+        for box, corners in zip(boxes, footprints):
+            if _category(box["class"]) == category:
+                polygons.append((category, box["label"], corners))
+    return polygons
+
+
+def _bounds(
+    polygons: List[Tuple[str, str, np.ndarray]],
+    margin: float,
+) -> Tuple[float, float, float, float]:
+    """Get (min_x, min_y, max_x, max_y) of all polygons plus a margin."""
+    if not polygons:
+        return -margin, -margin, margin, margin
+    points = np.concatenate([corners for _, _, corners in polygons])
+    min_x, min_y = points.min(axis=0) - margin
+    max_x, max_y = points.max(axis=0) + margin
+    return float(min_x), float(min_y), float(max_x), float(max_y)
+
+
+def render_svg(
+    layout: Union[Layout, str],
+    floor: Optional[int] = None,
+    scale: float = 50.0,
+    margin: float = 0.5,
+) -> str:
+    """
+    Render a top-down floor plan as an SVG document.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        floor: Optional floor index to restrict the plan to.
+        scale: Output size in pixels per meter.
+        margin: Margin around the plan in meters.
+
+    Returns:
+        SVG document as a string.
+    """
+    polygons = floor_plan_polygons(layout, floor=floor)
+    min_x, min_y, max_x, max_y = _bounds(polygons, margin)
+    width, height = max_x - min_x, max_y - min_y
+
+    lines = [
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width * scale:.0f}" height="{height * scale:.0f}" '
+        f'viewBox="{min_x:.3f} {-max_y:.3f} {width:.3f} {height:.3f}">',
+        f'<rect x="{min_x:.3f}" y="{-max_y:.3f}" width="{width:.3f}" '
+        f'height="{height:.3f}" fill="rgb{BACKGROUND_COLOR}"/>',
+    ]
+    for category, color in CATEGORY_COLORS.items():
+        lines.append(f'<g class="{html.escape(category, quote=True)}" fill="rgb{color}">')
+        for poly_category, label, corners in polygons:
+            if poly_category != category:
+                continue
+            # SVG's y axis points down, so flip y to keep north up
+            points = " ".join(f"{x:.3f},{-y:.3f}" for x, y in corners)
+            # Labels are class names from the model, so they are escaped
+            lines.append(f'<polygon points="{points}"><title>{html.escape(label, quote=True)}</title></polygon>')
+        lines.append("</g>")
+    lines.append("</svg>")
+    return "\n".join(lines)
+
+
+def rasterize(
+    layout: Union[Layout, str],
+    floor: Optional[int] = None,
+    scale: float = 50.0,
+    margin: float = 0.5,
+    max_size: int = 2048,
+) -> np.ndarray:
+    """
+    Rasterize a top-down floor plan into an RGB image.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        floor: Optional floor index to restrict the plan to.
+        scale: Output size in pixels per meter.
+        margin: Margin around the plan in meters.
+        max_size: Maximum width or height of the image in pixels; the scale
+                  is reduced to fit.
+
+    Returns:
+        Image array of shape (H, W, 3) and dtype uint8.
+    """
+    polygons = floor_plan_polygons(layout, floor=floor)
+    min_x, min_y, max_x, max_y = _bounds(polygons, margin)
+    scale = min(scale, max_size / max(max_x - min_x, max_y - min_y))
+    width = max(int(np.ceil((max_x - min_x) * scale)), 1)
+    height = max(int(np.ceil((max_y - min_y) * scale)), 1)
+
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND_COLOR
+
+    for category, _, corners in polygons:
+        # Pixel coordinates with row 0 at the top (max y)
+        px = (corners[:, 0] - min_x) * scale
+        py = (max_y - corners[:, 1]) * scale
+        x0, x1 = max(int(px.min()), 0), min(int(np.ceil(px.max())) + 1, width)
+        y0, y1 = max(int(py.min()), 0), min(int(np.ceil(py.max())) + 1, height)
+        if x0 >= x1 or y0 >= y1:
+            continue
+
+        # Sample pixel centers and keep those on the inner side of every edge
+        xs = np.arange(x0, x1) + 0.5
+        ys = np.arange(y0, y1)[:, np.newaxis] + 0.5
+        edge_x = np.roll(px, -1) - px
+        edge_y = np.roll(py, -1) - py
+        cross = (
+            edge_x[:, np.newaxis, np.newaxis] * (ys - py[:, np.newaxis, np.newaxis])
+            - edge_y[:, np.newaxis, np.newaxis] * (xs - px[:, np.newaxis, np.newaxis])
+        )
+        # Flipping y reverses the winding, so accept either orientation
+        inside = np.all(cross >= 0, axis=0) | np.all(cross <= 0, axis=0)
+        image[y0:y1, x0:x1][inside] = CATEGORY_COLORS[category]
+
+    return image
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode an (H, W, 3) uint8 image as PNG bytes."""
+    height, width, _ = image.shape
+    # Prefix every scanline with filter type 0 (None)
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
+def render_png(
+    layout: Union[Layout, str],
+    floor: Optional[int] = None,
+    scale: float = 50.0,
+    margin: float = 0.5,
+    max_size: int = 2048,
+) -> bytes:
+    """
+    Render a top-down floor plan as PNG bytes.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        floor: Optional floor index to restrict the plan to.
+        scale: Output size in pixels per meter.
+        margin: Margin around the plan in meters.
+        max_size: Maximum width or height of the image in pixels.
+
+    Returns:
+        PNG-encoded image.
+    """
+    image = rasterize(layout, floor=floor, scale=scale, margin=margin, max_size=max_size)
+    return encode_png(image)
+
+
+def save_floor_plan(
+    layout: Union[Layout, str],
+    output_file: str,
+    floor: Optional[int] = None,
+    scale: float = 50.0,
+) -> None:
+    """
+    Save a floor plan, choosing SVG or PNG from the file extension.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        output_file: Output path ending in `.svg` or `.png`.
+        floor: Optional floor index to restrict the plan to.
+        scale: Output size in pixels per meter.
+    """
+    if output_file.lower().endswith(".svg"):
+        with open(output_file, "w") as f:
+            f.write(render_svg(layout, floor=floor, scale=scale))
+    elif output_file.lower().endswith(".png"):
+        with open(output_file, "wb") as f:
+            f.write(render_png(layout, floor=floor, scale=scale))
+    else:
+        raise ValueError(f"Unsupported floor plan format: {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a 2D floor plan from a layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file in SpatialLM format")
+    parser.add_argument("--output", type=str, required=True, help="Output file path (.svg or .png)")
+    parser.add_argument("--floor", type=int, help="Only render this floor")
+    parser.add_argument("--scale", type=float, default=50.0, help="Pixels per meter")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout_str = f.read()
+
+    save_floor_plan(layout_str, args.output, floor=args.floor, scale=args.scale)
+    print(f"Floor plan saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
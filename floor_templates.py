@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Shared Floor Templates for Arc LLM
+
+Tall buildings repeat the same typical floor many times. A `TemplatedLayout`
+stores each distinct floor once as a template in floor-local coordinates and
+describes the building as a list of floors that reference a template at an
+elevation. A floor is copied only when it is edited on its own, so memory,
+serialized size and `.rrd` size grow with the number of distinct floors.
+Templated layout strings are only understood by this module; the main
+visualizer and the web interface take `TemplatedLayout.materialize()`.
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rerun as rr
+import rerun.blueprint as rrb
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import box_meshes, class_color, floor_index, floor_levels
+from layout_transform import stamp
+from simplified_spatiallm import write_layout
+
+# Template names are used in serialized keys and rerun entity paths
+TEMPLATE_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class FloorInstance:
+    """A floor of a building that references a template at an elevation."""
+
+    def __init__(self, template: str, elevation: float):
+        self.template = template
+        self.elevation = elevation
+
+
+def _floor_local(walls: List, doors: List, windows: List, bboxes: List, elevation: float) -> Layout:
+    """
+    Copy a floor's entities into a new layout relative to its elevation.
+
+    IDs are renumbered from 0 in list order, and door and window wall
+    references are remapped to match.
+    """
+    local = Layout()
+    local.walls, local.doors, local.windows, local.bboxes = [], [], [], []
+    wall_ids = {}
+    for index, wall in enumerate(walls):
+        clone = copy.copy(wall)
+        wall_ids[wall.id] = clone.id = index
+        clone.az -= elevation
+        clone.bz -= elevation
+        local.walls.append(clone)
+    for source, target in ((doors, local.doors), (windows, local.windows)):
+        for opening in source:
+            if opening.wall_id not in wall_ids:
+                continue
+            clone = copy.copy(opening)
+            clone.id = len(target)
+            clone.wall_id = wall_ids[opening.wall_id]
+            clone.position_z -= elevation
+            target.append(clone)
+    for index, bbox in enumerate(bboxes):
+        clone = copy.copy(bbox)
+        clone.id = index
+        clone.position_z -= elevation
+        local.bboxes.append(clone)
+    return local
+
+
+def _signature(layout: Layout, precision: int) -> Tuple:
+    """Hashable summary of a floor-local layout that ignores nothing but IDs."""
+    def rounded(*values) -> Tuple:
+        return tuple(round(value, precision) for value in values)
+
+    return (
+        tuple(rounded(w.ax, w.ay, w.az, w.bx, w.by, w.bz, w.height, w.thickness) for w in layout.walls),
+        tuple(
+            (kind, o.wall_id) + rounded(o.position_x, o.position_y, o.position_z, o.width, o.height)
+            for kind, openings in (("door", layout.doors), ("window", layout.windows))
+            for o in openings
+        ),
+        tuple(
+            (b.class_name,) + rounded(b.position_x, b.position_y, b.position_z, b.angle_z, b.scale_x, b.scale_y, b.scale_z)
+            for b in layout.bboxes
+        ),
+    )
+
+
+class TemplatedLayout:
+    """
+    A building described as floors that share templates.
+
+    Templates are layouts in floor-local coordinates, so a floor's entities
+    are its template's entities raised by the floor's elevation. Several
+    floors may reference one template; `edit_floor` gives a floor its own
+    copy before it is changed (copy-on-write).
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, Layout] = {}
+        self.floors: List[FloorInstance] = []
+
+    def add_template(self, name: str, layout: Layout, elevation: float = 0.0) -> str:
+        """
+        Add a template from a copy of a layout.
+
+        Args:
+            name: Template name; letters, digits and underscores only.
+            layout: Layout of one floor. It is copied, not referenced.
+            elevation: Height of the layout's floor, subtracted from its z
+                       coordinates to make them floor-local.
+
+        Returns:
+            The template name.
+        """
+        if not TEMPLATE_NAME.match(name):
+            raise ValueError(f"Invalid template name: {name}")
+        if name in self.templates:
+            raise ValueError(f"Template already exists: {name}")
+        self.templates[name] = _floor_local(layout.walls, layout.doors, layout.windows, layout.bboxes, elevation)
+        return name
+
+    def add_floor(self, template: str, elevation: float) -> int:
+        """
+        Add a floor that references a template.
+
+        Returns:
+            Index of the new floor.
+        """
+        if template not in self.templates:
+            raise KeyError(f"Unknown template: {template}")
+        self.floors.append(FloorInstance(template, elevation))
+        return len(self.floors) - 1
+
+    def users(self, template: str) -> int:
+        """Number of floors that reference a template."""
+        return sum(1 for floor in self.floors if floor.template == template)
+
+    def floor_layout(self, index: int) -> Layout:
+        """
+        Get the floor-local layout of a floor.
+
+        The layout may be shared with other floors and must not be modified;
+        use `edit_floor` to change a single floor.
+        """
+        return self.templates[self.floors[index].template]
+
+    def edit_floor(self, index: int) -> Layout:
+        """
+        Get a floor-local layout of a floor that is safe to modify.
+
+        If other floors share the floor's template, the template is copied
+        first and the floor is pointed at the copy, so the edit only affects
+        this floor.
+
+        Args:
+            index: Index of the floor to edit.
+
+        Returns:
+            The floor's own template layout, in floor-local coordinates.
+        """
+        floor = self.floors[index]
+        if self.users(floor.template) > 1:
+            name = f"{floor.template}_floor_{index}"
+            while name in self.templates:
+                name += "_"
+            self.add_template(name, self.templates[floor.template])
+            floor.template = name
+        return self.templates[floor.template]
+
+    def entity_counts(self) -> Tuple[int, int]:
+        """
+        Count stored and represented entities.
+
+        Returns:
+            Tuple of the number of entities held by the templates and the
+            number of entities the materialized building would hold.
+        """
+        sizes = {
+            name: len(t.walls) + len(t.doors) + len(t.windows) + len(t.bboxes)
+            for name, t in self.templates.items()
+        }
+        return sum(sizes.values()), sum(sizes[floor.template] for floor in self.floors)
+
+    def materialize(self) -> Layout:
+        """
+        Expand every floor into a plain layout.
+
+        Each floor's IDs are shifted past the largest ID of each entity type
+        on the floors before it, so the result has unique IDs even when
+        edits left gaps in a template's numbering. This is the only form
+        the main visualizer and the web interface accept.
+        """
+        result = Layout()
+        result.walls, result.doors, result.windows, result.bboxes = [], [], [], []
+        next_ids = {"walls": 0, "doors": 0, "windows": 0, "bboxes": 0}
+        for floor in self.floors:
+            placed = stamp(self.templates[floor.template], [(0.0, 0.0, floor.elevation)])
+            wall_base = next_ids["walls"]
+            for kind, on_wall in (("walls", False), ("doors", True), ("windows", True), ("bboxes", False)):
+                base = next_ids[kind]
+                for entity in getattr(placed, kind):
+                    entity.id += base
+                    if on_wall:
+                        entity.wall_id += wall_base
+                    next_ids[kind] = max(next_ids[kind], entity.id + 1)
+                    getattr(result, kind).append(entity)
+        return result
+
+    @classmethod
+    def from_layout(cls, layout: Layout, precision: int = 3) -> "TemplatedLayout":
+        """
+        Split a layout into floors and share the floors that are identical.
+
+        Floors are inferred from wall base heights (see `floor_levels`).
+        Doors and windows belong to the floor of their wall and boxes to the
+        floor they stand on. Two floors share a template when their
+        floor-local entities match in order to `precision` decimals.
+
+        Args:
+            layout: Layout to split. It is not modified.
+            precision: Number of decimals compared when matching floors.
+
+        Returns:
+            The templated layout.
+        """
+        levels = floor_levels(layout)
+        grouped: Dict[int, Dict[str, List]] = defaultdict(lambda: defaultdict(list))
+        wall_floor = {}
+        for wall in layout.walls:
+            wall_floor[wall.id] = floor_index(levels, min(wall.az, wall.bz))
+            grouped[wall_floor[wall.id]]["walls"].append(wall)
+        for kind, openings in (("doors", layout.doors), ("windows", layout.windows)):
+            for opening in openings:
+                if opening.wall_id in wall_floor:
+                    grouped[wall_floor[opening.wall_id]][kind].append(opening)
+        for bbox in layout.bboxes:
+            grouped[floor_index(levels, bbox.position_z)]["bboxes"].append(bbox)
+
+        templated = cls()
+        names: Dict[Tuple, str] = {}
+        for index, elevation in enumerate(levels):
+            entities = grouped[index]
+            local = _floor_local(entities["walls"], entities["doors"], entities["windows"], entities["bboxes"], elevation)
+            signature = _signature(local, precision)
+            if signature not in names:
+                names[signature] = f"floor_{index}"
+                templated.templates[names[signature]] = local
+            templated.add_floor(names[signature], elevation)
+        return templated
+
+    @classmethod
+    def stack(cls, layout: Layout, floors: int, floor_height: float, elevation: float = 0.0) -> "TemplatedLayout":
+        """
+        Build a building of identical floors that all share one template.
+
+        Args:
+            layout: Layout of the typical floor.
+            floors: Number of floors.
+            floor_height: Vertical distance between floors.
+            elevation: Height of the typical floor in `layout`.
+
+        Returns:
+            The templated layout.
+        """
+        templated = cls()
+        templated.add_template("typical", layout, elevation)
+        for index in range(floors):
+            templated.add_floor("typical", elevation + index * floor_height)
+        return templated
+
+    def to_language_string(self) -> str:
+        """
+        Serialize the templates and floor references.
+
+        Template entities are written in the usual SpatialLM line format with
+        the template name as a prefix, e.g. `typical.wall_0=Wall(...)`, and
+        each floor as `floor_<i>=Floor(<template>,<elevation>)`. Use
+        `materialize().to_language_string()` for the plain format.
+        """
+        lines = ["# Templated layout: template entities are relative to their floor's elevation"]
+        for name, template in self.templates.items():
+            for line in template.to_language_string().split("\n"):
+                if line:
+                    lines.append(f"{name}.{line}")
+        for index, floor in enumerate(self.floors):
+            lines.append(f"floor_{index}=Floor({floor.template},{floor.elevation})")
+        return "\n".join(lines)
+
+    @classmethod
+    def from_string(cls, text: str) -> "TemplatedLayout":
+        """
+        Parse the output of `to_language_string`.
+
+        A plain layout string without template prefixes is split into floors
+        with `from_layout`.
+        """
+        template_lines: Dict[str, List[str]] = defaultdict(list)
+        floors: List[Tuple[int, str, float]] = []
+        plain: List[str] = []
+        for line in text.strip().split("\n"):
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            if "." in key:
+                name, entity_key = key.split(".", 1)
+                template_lines[name].append(f"{entity_key}={value}")
+            elif key.startswith("floor_") and value.startswith("Floor("):
+                name, elevation = value[len("Floor("):].rstrip(")").split(",")
+                floors.append((int(key[len("floor_"):]), name.strip(), float(elevation)))
+            else:
+                plain.append(line)
+
+        if not template_lines:
+            return cls.from_layout(Layout("\n".join(plain)))
+
+        templated = cls()
+        for name, lines in template_lines.items():
+            templated.templates[name] = Layout("\n".join(lines))
+        for _, name, elevation in sorted(floors):
+            templated.add_floor(name, elevation)
+        return templated
+
+
+def visualize_templated(
+    templated: TemplatedLayout,
+    output_file: Optional[str] = None,
+    recording: Optional["rr.RecordingStream"] = None,
+) -> None:
+    """
+    Visualize a templated layout with one mesh per template and class.
+
+    Each template's boxes are triangulated once per class and logged as a
+    `world/pred/templates/<template>/<class>` mesh whose instance poses
+    place it at the elevation of every floor that uses the template, so the
+    recording grows with the number of distinct floors.
+
+    Args:
+        templated: Layout to visualize.
+        output_file: Optional `.rrd` path; the viewer is spawned if None.
+        recording: Optional recording to log into instead of a new one.
+    """
+    owns_recording = recording is None
+    if owns_recording:
+        blueprint = rrb.Blueprint(
+            rrb.Spatial3DView(name="3D", origin="/world", background=[255, 255, 255]),
+            collapse_panels=True,
+        )
+        recording = rr.new_recording("rerun_arcllm")
+        if output_file:
+            recording.save(output_file, default_blueprint=blueprint)
+        else:
+            recording.spawn(default_blueprint=blueprint)
+
+    rr.log("world", rr.ViewCoordinates.RIGHT_HAND_Z_UP, static=True, recording=recording)
+
+    elevations: Dict[str, List[float]] = defaultdict(list)
+    for floor in templated.floors:
+        elevations[floor.template].append(floor.elevation)
+
+    for name, template in templated.templates.items():
+        if not elevations[name]:
+            continue
+        translations = np.array([[0.0, 0.0, z] for z in elevations[name]], dtype=np.float32)
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        for box in template.to_boxes():
+            groups[box["class"]].append(box)
+        for group, boxes in groups.items():
+            vertices, triangles = box_meshes(boxes)
+            rr.log(
+                f"world/pred/templates/{name}/{group}",
+                rr.Mesh3D(
+                    vertex_positions=vertices.astype(np.float32),
+                    triangle_indices=triangles.astype(np.uint32),
+                    albedo_factor=class_color(group),
+                ),
+                rr.InstancePoses3D(translations=translations),
+                static=True,
+                recording=recording,
+            )
+
+    if owns_recording:
+        recording.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share identical floors of a SpatialLM layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Plain or templated layout file")
+    parser.add_argument("--output", type=str, help="Output file for the templated layout")
+    parser.add_argument("--expand", type=str, help="Output file for the materialized plain layout")
+    parser.add_argument("--vis-output", type=str, help="Output .rrd file with instanced floors")
+    parser.add_argument("--stack", type=int, help="Treat the layout as one floor and stack this many copies")
+    parser.add_argument("--floor-height", type=float, default=3.0, help="Floor height used with --stack")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        text = f.read()
+
+    if args.stack:
+        templated = TemplatedLayout.stack(Layout(text), args.stack, args.floor_height)
+    else:
+        templated = TemplatedLayout.from_string(text)
+
+    stored, total = templated.entity_counts()
+    print(
+        f"{len(templated.floors)} floors, {len(templated.templates)} templates, "
+        f"{stored} of {total} entities stored"
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(templated.to_language_string())
+    if args.expand:
+        with open(args.expand, "w") as f:
+            write_layout(templated.materialize(), f)
+    if args.vis_output:
+        visualize_templated(templated, output_file=args.vis_output)
+
+
+if __name__ == "__main__":
+    main()
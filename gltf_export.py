@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+glTF Exporter for Arc LLM
+
+This module writes a layout as binary glTF (GLB) using only NumPy, so CAD,
+BIM and web 3D tools can load it directly. Walls become slabs with their
+door and window openings cut out, and boxes become cuboids. Geometry is
+generated with array operations and merged into one vertex and index buffer
+per material, and repeated furniture can be instanced with
+`EXT_mesh_gpu_instancing`, so the number of draw calls stays at the number
+of materials however large the building is.
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+from collections import defaultdict
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import (
+    UNIT_CUBE_CORNERS,
+    UNIT_CUBE_TRIANGLES,
+    box_mesh_arrays,
+    class_color,
+    z_rotations,
+)
+
+# Base colors (RGBA, 0-1) of the structural materials
+STRUCTURE_COLORS = {
+    "wall": (0.85, 0.85, 0.82, 1.0),
+    "door": (0.55, 0.38, 0.22, 1.0),
+    "window": (0.6, 0.8, 0.95, 0.4),
+}
+# Thickness of door leaves and window panes placed in the openings
+PANEL_THICKNESS = {"door": 0.05, "window": 0.02}
+# Rotation of the root node from the layout's z-up frame to glTF's y-up frame
+Z_UP_TO_Y_UP = [-math.sqrt(0.5), 0.0, 0.0, math.sqrt(0.5)]
+
+# glTF constants
+FLOAT, UNSIGNED_SHORT, UNSIGNED_INT = 5126, 5123, 5125
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+
+def _as_layout(layout: Union[Layout, str]) -> Layout:
+    """Parse a layout string, or return a Layout unchanged."""
+    if isinstance(layout, str):
+        return Layout(layout)
+    return layout
+
+
+def _wall_frames(layout: Layout) -> Dict[str, np.ndarray]:
+    """Start points, directions, lengths and angles of all walls as arrays."""
+    walls = np.array(
+        [[w.ax, w.ay, min(w.az, w.bz), w.bx, w.by, w.height, w.thickness] for w in layout.walls],
+        dtype=np.float64,
+    ).reshape(-1, 7)
+    delta = walls[:, 3:5] - walls[:, 0:2]
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    directions = delta / np.maximum(lengths, 1e-12)[:, np.newaxis]
+    return {
+        "start": walls[:, 0:3],
+        "direction": directions,
+        "length": lengths,
+        "angle": np.arctan2(delta[:, 1], delta[:, 0]),
+        "height": walls[:, 5],
+        "thickness": walls[:, 6],
+    }
+
+
+def _opening_rects(layout: Layout, frames: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Locate doors and windows on their walls.
+
+    Returns:
+        Per opening kind, an (N, 5) array of wall index and the opening's
+        extent (u0, u1) along the wall and (v0, v1) above the wall's base,
+        clipped to the wall.
+    """
+    index = {wall.id: i for i, wall in enumerate(layout.walls)}
+    rects = {}
+    for kind, openings in (("door", layout.doors), ("window", layout.windows)):
+        rows = np.array(
+            [
+                [index[o.wall_id], o.position_x, o.position_y, o.position_z, o.width, o.height]
+                for o in openings
+                if o.wall_id in index
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 6)
+        walls = rows[:, 0].astype(np.int64)
+        offset = rows[:, 1:3] - frames["start"][walls, :2]
+        center = np.einsum("ij,ij->i", offset, frames["direction"][walls])
+        u0 = np.clip(center - rows[:, 4] / 2, 0.0, frames["length"][walls])
+        u1 = np.clip(center + rows[:, 4] / 2, 0.0, frames["length"][walls])
+        v0 = np.clip(rows[:, 3] - frames["start"][walls, 2], 0.0, frames["height"][walls])
+        v1 = np.clip(v0 + rows[:, 5], 0.0, frames["height"][walls])
+        keep = (u1 > u0) & (v1 > v0)
+        rects[kind] = np.stack([walls, u0, u1, v0, v1], axis=1)[keep]
+    return rects
+
+
+def _cut_wall(length: float, height: float, holes: np.ndarray) -> List[Tuple[float, float, float, float]]:
+    """
+    Split a wall face around rectangular holes into solid rectangles.
+
+    The face is cut into vertical strips at every hole edge, and each strip
+    keeps the spans of height no hole covers.
+
+    Args:
+        length: Wall length.
+        height: Wall height.
+        holes: (N, 4) array of hole extents (u0, u1, v0, v1).
+
+    Returns:
+        Solid rectangles as (u0, u1, v0, v1) tuples.
+    """
+    cuts = np.unique(np.concatenate([[0.0, length], holes[:, 0], holes[:, 1]]))
+    pieces = []
+    for u0, u1 in zip(cuts[:-1], cuts[1:]):
+        if u1 - u0 <= 1e-6:
+            continue
+        middle = (u0 + u1) / 2
+        covering = holes[(holes[:, 0] < middle) & (holes[:, 1] > middle)]
+        v = 0.0
+        for v0, v1 in sorted(zip(covering[:, 2], covering[:, 3])):
+            if v0 > v:
+                pieces.append((u0, u1, v, v0))
+            v = max(v, v1)
+        if v < height:
+            pieces.append((u0, u1, v, height))
+    return pieces
+
+
+def _rect_boxes(frames: Dict[str, np.ndarray], rects: np.ndarray, thickness: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Turn rectangles on walls into boxes centered on the wall axis.
+
+    Args:
+        frames: Wall frames from `_wall_frames`.
+        rects: (N, 5) array of wall index and (u0, u1, v0, v1).
+        thickness: Box thickness per rectangle.
+
+    Returns:
+        Tuple of box centers, sizes and rotation matrices.
+    """
+    walls = rects[:, 0].astype(np.int64)
+    u = (rects[:, 1] + rects[:, 2]) / 2
+    v = (rects[:, 3] + rects[:, 4]) / 2
+    centers = frames["start"][walls].copy()
+    centers[:, :2] += frames["direction"][walls] * u[:, np.newaxis]
+    centers[:, 2] += v
+    scales = np.stack([rects[:, 2] - rects[:, 1], thickness, rects[:, 4] - rects[:, 3]], axis=1)
+    return centers, scales, z_rotations(frames["angle"][walls])
+
+
+def wall_meshes(layout: Union[Layout, str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Build the merged meshes of walls, door leaves and window panes.
+
+    Walls without openings are a single slab each and are built in one
+    batch; only walls with openings are cut piece by piece.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+
+    Returns:
+        Mapping from material ("wall", "door", "window") to vertex
+        positions (V, 3) and triangle indices (T, 3).
+    """
+    layout = _as_layout(layout)
+    frames = _wall_frames(layout)
+    rects = _opening_rects(layout, frames)
+    holes = np.concatenate([rects["door"], rects["window"]])
+
+    solid = np.ones(len(layout.walls), dtype=bool)
+    solid[holes[:, 0].astype(np.int64)] = False
+    pieces = [
+        np.stack([
+            np.flatnonzero(solid),
+            np.zeros(solid.sum()),
+            frames["length"][solid],
+            np.zeros(solid.sum()),
+            frames["height"][solid],
+        ], axis=1)
+    ]
+    by_wall = defaultdict(list)
+    for row in holes:
+        by_wall[int(row[0])].append(row[1:])
+    for wall, wall_holes in by_wall.items():
+        cut = _cut_wall(frames["length"][wall], frames["height"][wall], np.array(wall_holes))
+        pieces.append(np.array([(wall,) + piece for piece in cut], dtype=np.float64).reshape(-1, 5))
+    pieces = np.concatenate(pieces)
+
+    thickness = frames["thickness"][pieces[:, 0].astype(np.int64)]
+    meshes = {"wall": box_mesh_arrays(*_rect_boxes(frames, pieces, thickness))}
+    for kind in ("door", "window"):
+        if len(rects[kind]):
+            thickness = np.full(len(rects[kind]), PANEL_THICKNESS[kind])
+            meshes[kind] = box_mesh_arrays(*_rect_boxes(frames, rects[kind], thickness))
+    return {kind: mesh for kind, mesh in meshes.items() if len(mesh[1])}
+
+
+def _bbox_arrays(layout: Layout) -> Dict[str, np.ndarray]:
+    """Positions, angles and sizes of all bboxes, grouped by class."""
+    groups = defaultdict(list)
+    for b in layout.bboxes:
+        groups[b.class_name].append(
+            [b.position_x, b.position_y, b.position_z, b.angle_z, b.scale_x, b.scale_y, b.scale_z]
+        )
+    return {name: np.array(rows, dtype=np.float64) for name, rows in groups.items()}
+
+
+class _GLBBuilder:
+    """Accumulates glTF JSON objects and the binary buffer they reference."""
+
+    def __init__(self):
+        self.gltf = {
+            "asset": {"version": "2.0", "generator": "arc-llm"},
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [{"name": "layout", "rotation": Z_UP_TO_Y_UP, "children": []}],
+            "meshes": [],
+            "materials": [],
+            "accessors": [],
+            "bufferViews": [],
+            "buffers": [],
+        }
+        self.chunks: List[bytes] = []
+        self.length = 0
+
+    def _view(self, data: bytes, target: Optional[int] = None) -> int:
+        """Append bytes as a 4-byte aligned buffer view."""
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        padding = (-len(data)) % 4
+        self.chunks.append(data + b"\0" * padding)
+        self.length += len(data) + padding
+        self.gltf["bufferViews"].append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def accessor(self, array: np.ndarray, kind: str, target: Optional[int] = None, bounds: bool = False) -> int:
+        """Append an array as an accessor of glTF type `kind` (SCALAR, VEC3, ...)."""
+        if array.dtype == np.uint16:
+            component = UNSIGNED_SHORT
+        elif array.dtype == np.uint32:
+            component = UNSIGNED_INT
+        else:
+            array = array.astype(np.float32)
+            component = FLOAT
+        accessor = {
+            "bufferView": self._view(np.ascontiguousarray(array).tobytes(), target),
+            "componentType": component,
+            "count": len(array) if kind != "SCALAR" else array.size,
+            "type": kind,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def material(self, name: str, color: Tuple[float, ...]) -> int:
+        """Append a rough, non-metallic material, blended if translucent."""
+        material = {
+            "name": name,
+            "pbrMetallicRoughness": {
+                "baseColorFactor": list(color),
+                "metallicFactor": 0.0,
+                "roughnessFactor": 0.9,
+            },
+        }
+        if color[3] < 1.0:
+            material["alphaMode"] = "BLEND"
+        self.gltf["materials"].append(material)
+        return len(self.gltf["materials"]) - 1
+
+    def mesh(self, name: str, vertices: np.ndarray, triangles: np.ndarray, material: int) -> int:
+        """Append a single-primitive mesh and a node that shows it."""
+        index_type = np.uint16 if len(vertices) <= 0xFFFF else np.uint32
+        primitive = {
+            "attributes": {"POSITION": self.accessor(vertices, "VEC3", ARRAY_BUFFER, bounds=True)},
+            "indices": self.accessor(triangles.astype(index_type).ravel(), "SCALAR", ELEMENT_ARRAY_BUFFER),
+            "material": material,
+        }
+        self.gltf["meshes"].append({"name": name, "primitives": [primitive]})
+        self.gltf["nodes"].append({"name": name, "mesh": len(self.gltf["meshes"]) - 1})
+        node = len(self.gltf["nodes"]) - 1
+        self.gltf["nodes"][0]["children"].append(node)
+        return node
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize as a GLB container.
+
+        glTF does not allow empty arrays, so an empty layout has no meshes,
+        buffers or BIN chunk, only its root node.
+        """
+        binary = b"".join(self.chunks)
+        self.gltf["buffers"] = [{"byteLength": len(binary)}] if binary else []
+        gltf = {key: value for key, value in self.gltf.items() if value != []}
+        gltf["nodes"] = [
+            {key: value for key, value in node.items() if value != []} for node in gltf["nodes"]
+        ]
+        document = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        document += b" " * ((-len(document)) % 4)
+        parts = [struct.pack("<I4s", len(document), b"JSON"), document]
+        if binary:
+            parts += [struct.pack("<I4s", len(binary), b"BIN\0"), binary]
+        total = 12 + sum(len(part) for part in parts)
+        return b"".join([struct.pack("<4sII", b"glTF", 2, total)] + parts)
+
+
+def layout_to_glb(layout: Union[Layout, str], instancing: bool = True) -> bytes:
+    """
+    Convert a layout to binary glTF.
+
+    Walls, door leaves and window panes each become one merged mesh. Boxes
+    become one mesh per class: with `instancing`, a unit cube drawn once
+    per box through `EXT_mesh_gpu_instancing`, otherwise the boxes merged
+    into one buffer.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        instancing: Whether to instance boxes. Viewers without support for
+                    the extension need this off.
+
+    Returns:
+        GLB file contents.
+    """
+    layout = _as_layout(layout)
+    builder = _GLBBuilder()
+
+    for kind, (vertices, triangles) in wall_meshes(layout).items():
+        builder.mesh(kind, vertices, triangles, builder.material(kind, STRUCTURE_COLORS[kind]))
+
+    for name, boxes in _bbox_arrays(layout).items():
+        color = tuple(c / 255 for c in class_color(name)) + (1.0,)
+        material = builder.material(name, color)
+        centers, angles, scales = boxes[:, 0:3], boxes[:, 3], boxes[:, 4:7]
+        if not instancing:
+            builder.mesh(name, *box_mesh_arrays(centers, scales, z_rotations(angles)), material)
+            continue
+
+        node = builder.mesh(name, UNIT_CUBE_CORNERS, UNIT_CUBE_TRIANGLES, material)
+        rotations = np.zeros((len(boxes), 4))
+        rotations[:, 2] = np.sin(angles / 2)
+        rotations[:, 3] = np.cos(angles / 2)
+        builder.gltf["nodes"][node]["extensions"] = {
+            "EXT_mesh_gpu_instancing": {
+                "attributes": {
+                    "TRANSLATION": builder.accessor(centers, "VEC3"),
+                    "ROTATION": builder.accessor(rotations, "VEC4"),
+                    "SCALE": builder.accessor(scales, "VEC3"),
+                }
+            }
+        }
+        builder.gltf["extensionsUsed"] = ["EXT_mesh_gpu_instancing"]
+        builder.gltf["extensionsRequired"] = ["EXT_mesh_gpu_instancing"]
+
+    return builder.to_bytes()
+
+
+def save_glb(
+    layout: Union[Layout, str],
+    output: Union[str, BinaryIO],
+    instancing: bool = True,
+) -> int:
+    """
+    Write a layout as a GLB file.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        output: Output path or binary file object.
+        instancing: Whether to instance boxes (see `layout_to_glb`).
+
+    Returns:
+        Number of bytes written.
+    """
+    data = layout_to_glb(layout, instancing=instancing)
+    if isinstance(output, str):
+        with open(output, "wb") as f:
+            f.write(data)
+    else:
+        output.write(data)
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a SpatialLM layout as binary glTF")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file in SpatialLM format")
+    parser.add_argument("--output", type=str, required=True, help="Output .glb file")
+    parser.add_argument("--no-instancing", action="store_true", help="Merge boxes instead of using EXT_mesh_gpu_instancing")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout_str = f.read()
+
+    size = save_glb(layout_str, args.output, instancing=not args.no_instancing)
+    print(f"GLB saved to {args.output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Incremental Layout Sessions for Arc LLM
+
+This module keeps a structured layout description alive across edits. Each
+update diffs the new description against the previous one line by line,
+re-parses only the lines that changed and keeps stable entity IDs for the
+rest, so the cost of an edit scales with the edit rather than the building.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import rerun as rr
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+from spatiallm.layout.entity import Wall, Door, Window
+
+from text_to_layout import ParseContext, TextToLayout
+
+FLOOR_PATTERN = re.compile(r"floor\s+\d+\s+at\s+height\s+(\d+(?:\.\d+)?)", re.IGNORECASE)
+WALL_REFERENCE_PATTERN = re.compile(r"(?:on|along)\s+wall\s+(\d+)", re.IGNORECASE)
+
+
+def entity_kind(entity) -> str:
+    """Get the layout entity type ("wall", "door", "window" or "bbox")."""
+    if isinstance(entity, Wall):
+        return "wall"
+    if isinstance(entity, Door):
+        return "door"
+    if isinstance(entity, Window):
+        return "window"
+    return "bbox"
+
+
+def entity_class(entity) -> str:
+    """Get the visualizer class of an entity, as used in `Layout.to_boxes`."""
+    kind = entity_kind(entity)
+    return entity.class_name if kind == "bbox" else kind
+
+
+def entity_record(entity) -> Dict:
+    """
+    Describe an entity as a JSON-serializable record.
+
+    The record carries the entity's `uid` (as used in entity paths and
+    `Layout.to_boxes`), its kind and visualizer class, and its fields.
+    """
+    kind = entity_kind(entity)
+    record = {"uid": f"{kind}_{entity.id}", "kind": kind, "class": entity_class(entity)}
+    record.update(
+        (name, value) for name, value in vars(entity).items()
+        if name != "class_name" and isinstance(value, (int, float, str))
+    )
+    return record
+
+
+class LayoutChanges:
+    """
+    Entities added and removed by one `LayoutSession.update` call.
+
+    An entity whose line was edited shows up as removed under its old ID and
+    added under a new one.
+    """
+
+    def __init__(self, revision: int, added: List, removed: List, unchanged: int):
+        self.revision = revision
+        self.added = added
+        self.removed = removed
+        self.unchanged = unchanged
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the update changed nothing."""
+        return not self.added and not self.removed
+
+    def to_dict(self) -> Dict:
+        """Describe the changes as JSON-serializable data."""
+        return {
+            "revision": self.revision,
+            "added": [entity_record(entity) for entity in self.added],
+            "removed": [f"{entity_kind(entity)}_{entity.id}" for entity in self.removed],
+            "unchanged": self.unchanged,
+        }
+
+
+class LayoutSession:
+    """
+    Incrementally maintained layout for an evolving structured description.
+
+    A session is not safe to update from several threads at once; callers
+    sharing one hold `lock` around `update`.
+    """
+
+    def __init__(self, converter: Optional[TextToLayout] = None):
+        """
+        Initialize an empty layout session.
+
+        Args:
+            converter: TextToLayout whose line parsers are used. A new
+                       rule-based converter is created if not provided.
+        """
+        self.converter = converter or TextToLayout()
+        self.recording_id = str(uuid.uuid4())
+        self.lock = threading.Lock()
+        self.revision = -1
+        # Description of the current revision, and the model that generated
+        # it when it came from the Claude API
+        self.description = ""
+        self.model: Optional[str] = None
+        self.layout = Layout()
+        self.layout.walls = []
+        self.layout.doors = []
+        self.layout.windows = []
+        self.layout.bboxes = []
+        # Allocates IDs for new entities across every revision
+        self._context = ParseContext()
+        # Parsed entities of the previous revision, keyed by line and context
+        self._lines: Dict[Tuple, List[List]] = {}
+
+    def _parse_line(self, line: str, walls: List[Wall]) -> List:
+        """Run every non-wall entity parser over a single line."""
+        converter, context = self.converter, self._context
+        entities = []
+        entities.extend(converter._parse_door(context, line, walls))
+        entities.extend(converter._parse_window(context, line, walls))
+        entities.extend(converter._parse_bbox(context, line))
+        entities.extend(converter._parse_fixtures(context, line))
+        entities.extend(converter._parse_built_ins(context, line, walls))
+        entities.extend(converter._parse_architectural_features(context, line))
+        return entities
+
+    def update(self, description: str) -> LayoutChanges:
+        """
+        Update the layout to match a new structured description.
+
+        Lines are matched against the previous revision by their text and the
+        context they depend on (floor height for walls, the referenced wall
+        for doors, windows and built-ins). Matched lines keep their entities;
+        only the remaining lines are parsed.
+
+        Args:
+            description: Structured layout description, one item per line.
+
+        Returns:
+            The entities added and removed by this update.
+        """
+        previous = self._lines
+        lines: Dict[Tuple, List[List]] = defaultdict(list)
+        added = []
+        unchanged = 0
+
+        def reuse_or_parse(key, parse):
+            nonlocal unchanged
+            if previous.get(key):
+                entities = previous[key].pop()
+                unchanged += len(entities)
+            else:
+                entities = parse()
+                added.extend(entities)
+            lines[key].append(entities)
+            return entities
+
+        # First pass: walls, which later lines refer to by index
+        floor_height = 0.0
+        walls: List[Wall] = []
+        other_lines = []
+        for raw_line in description.split("\n"):
+            line = raw_line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            floor_match = FLOOR_PATTERN.match(line)
+            if floor_match:
+                floor_height = float(floor_match.group(1))
+                continue
+
+            if re.match(r"wall\s+from", line, re.IGNORECASE):
+                key = ("wall", line, floor_height)
+                walls.extend(reuse_or_parse(
+                    key,
+                    lambda: self.converter._parse_wall(self._context, line, floor_height),
+                ))
+            else:
+                other_lines.append(line)
+
+        # Second pass: everything else, keyed by the wall it references
+        doors, windows, bboxes = [], [], []
+        for line in other_lines:
+            reference = None
+            ref_match = WALL_REFERENCE_PATTERN.search(line)
+            if ref_match and int(ref_match.group(1)) < len(walls):
+                wall = walls[int(ref_match.group(1))]
+                reference = (wall.id, wall.ax, wall.ay, wall.bx, wall.by)
+
+            key = ("entity", line, reference)
+            for entity in reuse_or_parse(key, lambda: self._parse_line(line, walls)):
+                kind = entity_kind(entity)
+                if kind == "door":
+                    doors.append(entity)
+                elif kind == "window":
+                    windows.append(entity)
+                else:
+                    bboxes.append(entity)
+
+        # Whatever was not matched no longer exists
+        removed = [
+            entity
+            for groups in previous.values()
+            for entities in groups
+            for entity in entities
+        ]
+
+        self._lines = lines
+        self.layout.walls = walls
+        self.layout.doors = doors
+        self.layout.windows = windows
+        self.layout.bboxes = bboxes
+        self.description = description
+        self.revision += 1
+
+        return LayoutChanges(self.revision, added, removed, unchanged)
+
+    def to_language_string(self) -> str:
+        """Get the current layout in SpatialLM format."""
+        return self.layout.to_language_string()
+
+    def visualize_changes(
+        self,
+        changes: LayoutChanges,
+        output_file: Optional[str] = None,
+    ) -> None:
+        """
+        Log only the entities touched by an update to rerun.
+
+        Every revision is logged on the "revision" timeline of the session's
+        recording, so the `.rrd` files written for successive revisions can be
+        opened together and the viewer merges them into the current state.
+
+        Args:
+            changes: Changes returned by `update`.
+            output_file: Optional output file path for this revision's `.rrd`.
+                         If not provided, the changes are sent to a spawned
+                         viewer.
+        """
+        recording = rr.new_recording("rerun_arcllm", recording_id=self.recording_id)
+        if output_file:
+            recording.save(output_file)
+        else:
+            recording.spawn()
+
+        self.log_changes(changes, recording)
+        recording.disconnect()
+
+    def log_changes(self, changes: LayoutChanges, recording: "rr.RecordingStream") -> None:
+        """
+        Log the entities touched by an update to an open recording.
+
+        Args:
+            changes: Changes returned by `update`.
+            recording: Recording to log into; it is left open.
+        """
+        rr.log("world", rr.ViewCoordinates.RIGHT_HAND_Z_UP, static=True, recording=recording)
+        rr.set_time_sequence("revision", changes.revision, recording=recording)
+
+        for entity in changes.removed:
+            rr.log(
+                f"world/pred/{entity_class(entity)}/{entity_kind(entity)}_{entity.id}",
+                rr.Clear(recursive=False),
+                recording=recording,
+            )
+
+        # Doors and windows need their wall to be placed, even if it is unchanged
+        walls_by_id = {wall.id: wall for wall in self.layout.walls}
+        partial = Layout()
+        partial.walls = [e for e in changes.added if entity_kind(e) == "wall"]
+        partial.doors = [e for e in changes.added if entity_kind(e) == "door"]
+        partial.windows = [e for e in changes.added if entity_kind(e) == "window"]
+        partial.bboxes = [e for e in changes.added if entity_kind(e) == "bbox"]
+        added_ids = {f"{entity_kind(e)}_{e.id}" for e in changes.added}
+        context_walls = {
+            opening.wall_id for opening in partial.doors + partial.windows
+        } - {wall.id for wall in partial.walls}
+        partial.walls.extend(
+            walls_by_id[wall_id] for wall_id in context_walls if wall_id in walls_by_id
+        )
+
+        for box in partial.to_boxes():
+            if box["id"] not in added_ids:
+                continue
+            rr.log(
+                f"world/pred/{box['class']}/{box['id']}",
+                rr.Boxes3D(
+                    centers=box["center"],
+                    half_sizes=0.5 * np.asarray(box["scale"]),
+                    labels=box["label"],
+                ),
+                rr.InstancePoses3D(mat3x3=box["rotation"]),
+                recording=recording,
+            )
+
+    def live_recording(
+        self,
+        connect: Optional[str] = None,
+        serve: bool = False,
+    ) -> "rr.RecordingStream":
+        """
+        Open a recording that streams to a viewer while it is being logged.
+
+        Args:
+            connect: Address ("host:port") of a running rerun viewer to
+                     connect to.
+            serve: If True and `connect` is not given, serve a web viewer
+                   from this process instead of spawning a native one.
+
+        Returns:
+            A recording with the session's recording ID.
+        """
+        recording = rr.new_recording("rerun_arcllm", recording_id=self.recording_id)
+        if connect:
+            rr.connect_tcp(connect, recording=recording)
+        elif serve:
+            rr.serve_web(recording=recording)
+        else:
+            recording.spawn()
+        return recording
+
+    def follow(
+        self,
+        lines: Iterable[str],
+        recording: Optional["rr.RecordingStream"] = None,
+        interval: float = 0.2,
+    ) -> Iterator[LayoutChanges]:
+        """
+        Update the layout while a description is still being generated.
+
+        Lines are accumulated as they arrive, e.g. from
+        `ClaudeAPI.generate_layout_description_stream`, and the session is
+        updated at most once per `interval` seconds and once more at the
+        end. Because unchanged lines are reused, each update only parses the
+        lines received since the previous one.
+
+        Args:
+            lines: Lines of the structured description, in order.
+            recording: Optional open recording, e.g. from `live_recording`,
+                       that each update's changes are logged to.
+            interval: Minimum time in seconds between updates.
+
+        Yields:
+            The changes of every update that changed something.
+        """
+        received: List[str] = []
+        pending = False
+        last_update = time.monotonic()
+
+        def apply() -> LayoutChanges:
+            changes = self.update("\n".join(received))
+            if recording is not None and not changes.is_empty:
+                self.log_changes(changes, recording)
+            return changes
+
+        for line in lines:
+            received.append(line)
+            pending = True
+            if time.monotonic() - last_update >= interval:
+                changes = apply()
+                pending = False
+                last_update = time.monotonic()
+                if not changes.is_empty:
+                    yield changes
+
+        if pending:
+            changes = apply()
+            if not changes.is_empty:
+                yield changes
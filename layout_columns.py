@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Columnar Layout Datasets for Arc LLM
+
+This module writes the entities of many layouts into typed columnar tables,
+one table per entity type, each with a `layout_id` column, so analytics over
+large numbers of generated layouts are vectorized scans instead of text
+parsing. Tables are written as Parquet or Arrow IPC with pyarrow, or as
+NumPy `.npz` files when pyarrow is not installed.
+
+A dataset is a directory with a subdirectory per table. Every writer adds
+new part files, so layouts can be appended to a dataset by later runs.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import uuid
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+# Columns of every table as (name, NumPy dtype); "U" columns hold strings
+OPENING_COLUMNS = [
+    ("layout_id", "U"), ("id", "int32"), ("wall_id", "int32"),
+    ("position_x", "float32"), ("position_y", "float32"), ("position_z", "float32"),
+    ("width", "float32"), ("height", "float32"),
+]
+SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    "layouts": [
+        ("layout_id", "U"), ("model", "U"), ("metadata", "U"),
+        ("walls", "int32"), ("doors", "int32"), ("windows", "int32"), ("bboxes", "int32"),
+    ],
+    "walls": [
+        ("layout_id", "U"), ("id", "int32"),
+        ("ax", "float32"), ("ay", "float32"), ("az", "float32"),
+        ("bx", "float32"), ("by", "float32"), ("bz", "float32"),
+        ("height", "float32"), ("thickness", "float32"), ("length", "float32"),
+    ],
+    "doors": OPENING_COLUMNS,
+    "windows": OPENING_COLUMNS,
+    "bboxes": [
+        ("layout_id", "U"), ("id", "int32"), ("class_name", "U"),
+        ("position_x", "float32"), ("position_y", "float32"), ("position_z", "float32"),
+        ("angle_z", "float32"), ("scale_x", "float32"), ("scale_y", "float32"), ("scale_z", "float32"),
+    ],
+    "rooms": [
+        ("layout_id", "U"), ("index", "int32"), ("floor", "int32"),
+        ("elevation", "float32"), ("area", "float32"), ("perimeter", "float32"),
+        ("height", "float32"), ("volume", "float32"), ("walls", "int32"),
+    ],
+}
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+
+
+def _column(values: List, dtype: str) -> np.ndarray:
+    """Build a typed column, keeping string columns as Unicode arrays."""
+    if dtype == "U":
+        return np.array(values, dtype=str) if values else np.zeros(0, dtype="U1")
+    return np.array(values, dtype=dtype)
+
+
+def _table(rows: List[Tuple], schema: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+    """Turn row tuples into named columns following a schema."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return {name: _column(list(values), dtype) for (name, dtype), values in zip(schema, columns)}
+
+
+def layout_tables(
+    layout: Union[Layout, str],
+    layout_id: str,
+    model: str = "",
+    metadata: Optional[Dict] = None,
+    rooms: bool = False,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Convert a layout into columnar tables.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        layout_id: Value of the `layout_id` column of every row.
+        model: Model that generated the layout, for the `layouts` table.
+        metadata: Optional JSON-serializable metadata for the `layouts` table.
+        rooms: Whether to trace rooms (see `room_geometry`) into a `rooms`
+               table. This is much slower than the other tables.
+
+    Returns:
+        Mapping from table name to a mapping from column name to array.
+    """
+    if isinstance(layout, str):
+        layout = Layout(layout)
+
+    tables = {
+        "layouts": _table(
+            [(layout_id, model, json.dumps(metadata or {}), len(layout.walls),
+              len(layout.doors), len(layout.windows), len(layout.bboxes))],
+            SCHEMAS["layouts"],
+        ),
+        "walls": _table(
+            [(layout_id, w.id, w.ax, w.ay, w.az, w.bx, w.by, w.bz, w.height, w.thickness,
+              float(np.hypot(w.bx - w.ax, w.by - w.ay))) for w in layout.walls],
+            SCHEMAS["walls"],
+        ),
+        "bboxes": _table(
+            [(layout_id, b.id, b.class_name, b.position_x, b.position_y, b.position_z,
+              b.angle_z, b.scale_x, b.scale_y, b.scale_z) for b in layout.bboxes],
+            SCHEMAS["bboxes"],
+        ),
+    }
+    for name, openings in (("doors", layout.doors), ("windows", layout.windows)):
+        tables[name] = _table(
+            [(layout_id, o.id, o.wall_id, o.position_x, o.position_y, o.position_z,
+              o.width, o.height) for o in openings],
+            SCHEMAS[name],
+        )
+
+    if rooms:
+        # Imported here since tracing rooms is only needed on request
+        from room_geometry import extract_rooms
+
+        tables["rooms"] = _table(
+            [(layout_id, r.index, r.floor, r.elevation, r.area, r.perimeter, r.height,
+              r.volume, len(r.wall_ids)) for r in extract_rooms(layout)],
+            SCHEMAS["rooms"],
+        )
+    return tables
+
+
+def _arrow_schema(name: str) -> "pa.Schema":
+    """Arrow schema of a table."""
+    return pa.schema([
+        (column, pa.string() if dtype == "U" else pa.from_numpy_dtype(np.dtype(dtype)))
+        for column, dtype in SCHEMAS[name]
+    ])
+
+
+class LayoutDatasetWriter:
+    """
+    Append layouts to a columnar dataset.
+
+    Layouts are buffered and written every `batch_size` layouts as one row
+    group (Parquet), record batch (Arrow) or part file (npz). Each writer
+    writes new part files, so several runs can append to one dataset, but
+    not at the same time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        format: Optional[str] = None,
+        batch_size: int = 1000,
+        rooms: bool = False,
+    ):
+        """
+        Open a dataset for appending.
+
+        Args:
+            path: Dataset directory; created if missing.
+            format: "parquet", "arrow" or "npz". Defaults to Parquet, or npz
+                    if pyarrow is not installed.
+            batch_size: Number of layouts per written batch.
+            rooms: Whether to also write the `rooms` table.
+        """
+        format = format or ("parquet" if pa is not None else "npz")
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+        if format != "npz" and pa is None:
+            raise ImportError(f"pyarrow is required for the {format} format")
+
+        self.path = path
+        self.format = format
+        self.batch_size = batch_size
+        self.rooms = rooms
+        self.count = 0
+        self._pending: List[Dict[str, Dict[str, np.ndarray]]] = []
+        self._writers: Dict[str, object] = {}
+
+        tables = [name for name in SCHEMAS if name != "rooms" or rooms]
+        for name in tables:
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+        # Continue numbering after the parts of earlier runs
+        self._part = max(
+            [_part_number(part) + 1 for name in tables for part in _parts(path, name)],
+            default=0,
+        )
+
+    def add(
+        self,
+        layout: Union[Layout, str],
+        layout_id: Optional[str] = None,
+        model: str = "",
+        metadata: Optional[Dict] = None,
+    ) -> str:
+        """
+        Add a layout to the dataset.
+
+        Args:
+            layout: Layout or layout string in SpatialLM format.
+            layout_id: ID of the layout; a new UUID if not provided.
+            model: Model that generated the layout.
+            metadata: Optional JSON-serializable metadata.
+
+        Returns:
+            The layout ID.
+        """
+        layout_id = layout_id or str(uuid.uuid4())
+        self._pending.append(layout_tables(layout, layout_id, model, metadata, rooms=self.rooms))
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return layout_id
+
+    def flush(self) -> None:
+        """Write the buffered layouts."""
+        if not self._pending:
+            return
+        for name in self._pending[0]:
+            columns = {
+                column: np.concatenate([tables[name][column] for tables in self._pending])
+                for column, _ in SCHEMAS[name]
+            }
+            self._write(name, columns)
+        self._pending = []
+        if self.format == "npz":
+            self._part += 1
+
+    def _write(self, name: str, columns: Dict[str, np.ndarray]) -> None:
+        """Write one batch of a table."""
+        file_name = os.path.join(self.path, name, f"part-{self._part:05d}{FORMATS[self.format]}")
+        if self.format == "npz":
+            np.savez_compressed(file_name, **columns)
+            return
+
+        schema = _arrow_schema(name)
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(columns[field.name], type=field.type) for field in schema],
+            schema=schema,
+        )
+        writer = self._writers.get(name)
+        if writer is None:
+            if self.format == "parquet":
+                writer = pq.ParquetWriter(file_name, schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(file_name, schema)
+            self._writers[name] = writer
+        writer.write_batch(batch)
+
+    def close(self) -> None:
+        """Write the remaining layouts and close the part files."""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def __enter__(self) -> "LayoutDatasetWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _parts(path: str, name: str) -> List[str]:
+    """Part files of a table, in order."""
+    return sorted(
+        part
+        for extension in FORMATS.values()
+        for part in glob.glob(os.path.join(path, name, f"part-*{extension}"))
+    )
+
+
+def _part_number(part: str) -> int:
+    """Number of a part file, from its name."""
+    return int(os.path.basename(part).split(".")[0][len("part-"):])
+
+
+def read_table(path: str, name: str) -> Dict[str, np.ndarray]:
+    """
+    Read a table of a dataset into NumPy columns.
+
+    Args:
+        path: Dataset directory.
+        name: Table name ("layouts", "walls", "doors", "windows", "bboxes"
+              or "rooms").
+
+    Returns:
+        Mapping from column name to array, with all parts concatenated.
+    """
+    pieces: Dict[str, List[np.ndarray]] = {column: [] for column, _ in SCHEMAS[name]}
+    for part in _parts(path, name):
+        if part.endswith(".npz"):
+            with np.load(part) as data:
+                for column in pieces:
+                    pieces[column].append(data[column])
+            continue
+        if pa is None:
+            raise ImportError(f"pyarrow is required to read {part}")
+        if part.endswith(".parquet"):
+            table = pq.read_table(part)
+        else:
+            with pa.ipc.open_file(part) as reader:
+                table = reader.read_all()
+        for column, dtype in SCHEMAS[name]:
+            values = table.column(column).to_numpy(zero_copy_only=False)
+            pieces[column].append(values.astype(str) if dtype == "U" else values)
+
+    return {
+        column: np.concatenate(arrays) if arrays else _column([], dtype)
+        for (column, dtype), arrays in zip(SCHEMAS[name], pieces.values())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append SpatialLM layouts to a columnar dataset")
+    parser.add_argument("--layout-files", type=str, nargs="+", required=True, help="Layout files; the file name is the layout ID")
+    parser.add_argument("--output", type=str, required=True, help="Dataset directory")
+    parser.add_argument("--format", type=str, choices=sorted(FORMATS), help="Table format (default: parquet, or npz without pyarrow)")
+    parser.add_argument("--model", type=str, default="", help="Model that generated the layouts")
+    parser.add_argument("--rooms", action="store_true", help="Also trace rooms into a rooms table")
+
+    args = parser.parse_args()
+
+    with LayoutDatasetWriter(args.output, format=args.format, rooms=args.rooms) as writer:
+        for layout_file in args.layout_files:
+            with open(layout_file, "r") as f:
+                layout_str = f.read()
+            layout_id = os.path.splitext(os.path.basename(layout_file))[0]
+            writer.add(layout_str, layout_id=layout_id, model=args.model)
+
+    bboxes = read_table(args.output, "bboxes")
+    classes, counts = np.unique(bboxes["class_name"], return_counts=True)
+    print(f"Wrote {writer.count} layouts ({writer.format}) to {args.output}")
+    for class_name, count in sorted(zip(classes, counts), key=lambda item: -item[1])[:10]:
+        print(f"  {class_name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
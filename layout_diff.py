@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Structural Layout Diff for Arc LLM
+
+This module compares two layouts entity by entity. Entities are matched by
+class and geometry rather than by ID, using a spatial hash of their centers,
+so the diff is stable when IDs shift between generations.
+"""
+
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import NEIGHBOUR_OFFSETS
+
+
+class _Entry:
+    """Geometry of one entity, normalized for comparison."""
+
+    __slots__ = ("entity", "kind", "class_name", "center", "size", "angle")
+
+    def __init__(self, entity, kind, class_name, center, size, angle):
+        self.entity = entity
+        self.kind = kind
+        self.class_name = class_name
+        self.center = center
+        self.size = size
+        self.angle = angle
+
+
+def _entries(layout: Layout) -> List[_Entry]:
+    """Extract the comparable geometry of every entity in a layout."""
+    entries = []
+    for wall in layout.walls:
+        dx, dy = wall.bx - wall.ax, wall.by - wall.ay
+        # A wall drawn in the opposite direction is the same wall
+        angle = math.atan2(dy, dx) % math.pi
+        entries.append(_Entry(
+            wall, "wall", "wall",
+            ((wall.ax + wall.bx) / 2, (wall.ay + wall.by) / 2, min(wall.az, wall.bz)),
+            (math.hypot(dx, dy), wall.thickness, wall.height),
+            angle,
+        ))
+    for kind, openings in (("door", layout.doors), ("window", layout.windows)):
+        for opening in openings:
+            entries.append(_Entry(
+                opening, kind, kind,
+                (opening.position_x, opening.position_y, opening.position_z),
+                (opening.width, 0.0, opening.height),
+                0.0,
+            ))
+    for bbox in layout.bboxes:
+        entries.append(_Entry(
+            bbox, "bbox", bbox.class_name,
+            (bbox.position_x, bbox.position_y, bbox.position_z),
+            (bbox.scale_x, bbox.scale_y, bbox.scale_z),
+            bbox.angle_z % (2 * math.pi),
+        ))
+    return entries
+
+
+def _close(a: Tuple[float, ...], b: Tuple[float, ...], tolerance: float) -> bool:
+    """Whether two vectors agree component-wise within a tolerance."""
+    return all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+
+def _angle_close(a: float, b: float, tolerance: float) -> bool:
+    """Whether two angles agree within a tolerance, modulo a full turn."""
+    delta = abs(a - b) % (2 * math.pi)
+    return min(delta, 2 * math.pi - delta) <= tolerance
+
+
+def _distance2(a: Tuple[float, ...], b: Tuple[float, ...]) -> float:
+    """Squared Euclidean distance between two points."""
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+class _FreePoints:
+    """
+    Points that can each be taken once, nearest first.
+
+    Taken points stay in the KD-tree until it is rebuilt, so a query asks
+    for one more neighbor than the points taken since the last build,
+    which guarantees a free one among them. Rebuilding after about
+    sqrt(n) takes keeps both the queries and the rebuilds sub-quadratic
+    even when every query contends for the same points.
+    """
+
+    def __init__(self, points: List[Tuple[float, ...]]):
+        self.points = np.array(points, dtype=float)
+        self.taken = np.zeros(len(self.points), dtype=bool)
+        self.max_stale = max(16, int(math.sqrt(len(self.points))))
+        self._build()
+
+    def _build(self) -> None:
+        self._free = np.flatnonzero(~self.taken)
+        self._tree = cKDTree(self.points[self._free]) if len(self._free) else None
+        self._stale = 0
+
+    def take_nearest(self, point: Tuple[float, ...], bound: float) -> Optional[int]:
+        """Take the nearest free point within `bound`, returning its index."""
+        if self._stale >= self.max_stale:
+            self._build()
+        if self._tree is None:
+            return None
+        k = min(self._stale + 1, len(self._free))
+        distances, indices = self._tree.query(point, k=k, distance_upper_bound=bound)
+        for distance, i in zip(np.atleast_1d(distances), np.atleast_1d(indices)):
+            if not np.isfinite(distance):
+                return None
+            index = self._free[i]
+            if not self.taken[index]:
+                self.taken[index] = True
+                self._stale += 1
+                return int(index)
+        return None
+
+
+class LayoutDiff:
+    """
+    Result of comparing an old layout with a new one.
+
+    `moved` and `resized` hold (old_entity, new_entity) pairs; `added` holds
+    entities of the new layout and `removed` entities of the old one.
+    """
+
+    def __init__(self):
+        self.added: List = []
+        self.removed: List = []
+        self.moved: List[Tuple] = []
+        self.resized: List[Tuple] = []
+        self.unchanged = 0
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the two layouts are equivalent within the tolerance."""
+        return not (self.added or self.removed or self.moved or self.resized)
+
+    def summary(self) -> Dict[str, int]:
+        """Get the number of entities in each category."""
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "moved": len(self.moved),
+            "resized": len(self.resized),
+            "unchanged": self.unchanged,
+        }
+
+
+def diff_layouts(
+    old: Union[Layout, str],
+    new: Union[Layout, str],
+    tolerance: float = 0.05,
+    angle_tolerance: float = 0.01,
+    move_radius: Optional[float] = 10.0,
+) -> LayoutDiff:
+    """
+    Compare two layouts structurally.
+
+    Entities are paired in three passes: exact geometric matches by hash,
+    then entities of the same class whose centers lie within `tolerance`
+    (found through a spatial hash with cells of that size), and finally
+    the nearest entity of the same class and size within `move_radius`
+    (found through a KD-tree per class and size). Pairs from the second
+    pass are reported as resized (or moved, if only their rotation
+    changed), pairs from the third as moved. Entities moved further than
+    `move_radius` are reported as removed and added.
+
+    Args:
+        old: Old layout or layout string in SpatialLM format.
+        new: New layout or layout string in SpatialLM format.
+        tolerance: Maximum difference in meters for positions and sizes to
+                   be considered equal.
+        angle_tolerance: Maximum difference in radians for rotations to be
+                         considered equal.
+        move_radius: Maximum distance in meters an entity is looked for
+                     after moving. None searches the whole layout, which is
+                     slow when many identical entities move far.
+
+    Returns:
+        The structural differences between the layouts.
+    """
+    if isinstance(old, str):
+        old = Layout(old)
+    if isinstance(new, str):
+        new = Layout(new)
+
+    result = LayoutDiff()
+    old_entries = _entries(old)
+    new_entries = _entries(new)
+
+    def exact_key(entry: _Entry) -> Tuple:
+        quantize = lambda values: tuple(round(v / tolerance) for v in values)
+        return (
+            entry.class_name,
+            quantize(entry.center),
+            quantize(entry.size),
+            round(entry.angle / angle_tolerance),
+        )
+
+    # Pass 1: exact matches, which are the common case between close layouts
+    exact: Dict[Tuple, List[_Entry]] = defaultdict(list)
+    for entry in old_entries:
+        exact[exact_key(entry)].append(entry)
+
+    pending_new = []
+    for entry in new_entries:
+        bucket = exact.get(exact_key(entry))
+        if bucket:
+            bucket.pop()
+            result.unchanged += 1
+        else:
+            pending_new.append(entry)
+    pending_old = [entry for bucket in exact.values() for entry in bucket]
+
+    # Pass 2: same class within tolerance of the same center
+    def cell(center: Tuple[float, ...]) -> Tuple[int, ...]:
+        return tuple(math.floor(v / tolerance) for v in center)
+
+    grid: Dict[Tuple, List[_Entry]] = defaultdict(list)
+    for entry in pending_old:
+        grid[(entry.class_name,) + cell(entry.center)].append(entry)
+
+    matched_old = set()
+    unmatched_new = []
+    for entry in pending_new:
+        cx, cy, cz = cell(entry.center)
+        best, best_distance = None, None
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            for candidate in grid.get((entry.class_name, cx + dx, cy + dy, cz + dz), ()):
+                if id(candidate) in matched_old:
+                    continue
+                if not _close(candidate.center, entry.center, tolerance):
+                    continue
+                distance = _distance2(candidate.center, entry.center)
+                if best is None or distance < best_distance:
+                    best, best_distance = candidate, distance
+
+        if best is None:
+            unmatched_new.append(entry)
+            continue
+
+        matched_old.add(id(best))
+        if not _close(best.size, entry.size, tolerance):
+            result.resized.append((best.entity, entry.entity))
+        elif not _angle_close(best.angle, entry.angle, angle_tolerance):
+            result.moved.append((best.entity, entry.entity))
+        else:
+            result.unchanged += 1
+
+    # Pass 3: same class and size nearby, i.e. the entity was moved
+    def size_key(entry: _Entry) -> Tuple:
+        return (entry.class_name,) + tuple(round(v / tolerance) for v in entry.size)
+
+    old_by_size: Dict[Tuple, List[_Entry]] = defaultdict(list)
+    for entry in pending_old:
+        if id(entry) not in matched_old:
+            old_by_size[size_key(entry)].append(entry)
+    new_by_size: Dict[Tuple, List[_Entry]] = defaultdict(list)
+    for entry in unmatched_new:
+        new_by_size[size_key(entry)].append(entry)
+
+    bound = math.inf if move_radius is None else move_radius
+    matches: Dict[int, _Entry] = {}
+    for key, new_bucket in new_by_size.items():
+        old_bucket = old_by_size.get(key)
+        if not old_bucket:
+            continue
+        free = _FreePoints([entry.center for entry in old_bucket])
+        for entry in new_bucket:
+            index = free.take_nearest(entry.center, bound)
+            if index is not None:
+                matches[id(entry)] = old_bucket[index]
+
+    for entry in unmatched_new:
+        match = matches.get(id(entry))
+        if match is None:
+            result.added.append(entry.entity)
+        else:
+            matched_old.add(id(match))
+            result.moved.append((match.entity, entry.entity))
+
+    result.removed = [
+        entry.entity for entry in pending_old if id(entry) not in matched_old
+    ]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two SpatialLM layouts structurally")
+    parser.add_argument("--old", type=str, required=True, help="Old layout file")
+    parser.add_argument("--new", type=str, required=True, help="New layout file")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Position and size tolerance in meters")
+    parser.add_argument("--move-radius", type=float, default=10.0, help="Maximum distance in meters to pair moved entities")
+
+    args = parser.parse_args()
+
+    with open(args.old, "r") as f:
+        old_str = f.read()
+    with open(args.new, "r") as f:
+        new_str = f.read()
+
+    diff = diff_layouts(old_str, new_str, tolerance=args.tolerance, move_radius=args.move_radius)
+    for category, count in diff.summary().items():
+        print(f"{category}: {count}")
+
+
+if __name__ == "__main__":
+    main()
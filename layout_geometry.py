@@ -0,0 +1,139 @@
+"""
+Layout Geometry Helpers for Arc LLM
+
+This module provides small, dependency-free geometry helpers shared by the
+visualizers and exporters: floor inference, vectorized box footprints and
+meshes, and spatial hashing.
+"""
+
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Offsets of a cell and its 26 neighbours in a 3D grid
+NEIGHBOUR_OFFSETS = [
+    (dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+]
+
+
+def floor_levels(layout, precision: int = 2) -> List[float]:
+    """
+    Infer floor base heights from the distinct base heights of the walls.
+
+    Args:
+        layout: Layout whose walls define the floors.
+        precision: Number of decimals used to merge nearly equal heights.
+
+    Returns:
+        Sorted list of floor heights, or [0.0] if the layout has no walls.
+    """
+    levels = {round(min(wall.az, wall.bz), precision) for wall in layout.walls}
+    return sorted(levels) or [0.0]
+
+
+def floor_index(levels: List[float], z: float, tolerance: float = 1e-3) -> int:
+    """Get the index of the highest floor level at or below height z."""
+    index = int(np.searchsorted(levels, z + tolerance, side="right")) - 1
+    return max(index, 0)
+
+
+def box_arrays(boxes: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stack the boxes produced by `Layout.to_boxes` into arrays.
+
+    Returns:
+        Tuple of centers (N, 3), scales (N, 3) and rotations (N, 3, 3).
+    """
+    if not boxes:
+        return np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3, 3))
+    centers = np.array([box["center"] for box in boxes], dtype=np.float64)
+    scales = np.array([box["scale"] for box in boxes], dtype=np.float64)
+    rotations = np.array([box["rotation"] for box in boxes], dtype=np.float64)
+    return centers, scales, rotations
+
+
+def box_footprints(boxes: List[Dict]) -> np.ndarray:
+    """
+    Compute the top-down footprint of each box.
+
+    Args:
+        boxes: Boxes produced by `Layout.to_boxes`.
+
+    Returns:
+        Array of shape (N, 4, 2) with the XY corners of every footprint in
+        counter-clockwise order.
+    """
+    centers, scales, rotations = box_arrays(boxes)
+    unit = np.array([[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5]])
+    local = unit[np.newaxis, :, :] * scales[:, np.newaxis, :2]
+    corners = np.einsum("nij,nkj->nki", rotations[:, :2, :2], local)
+    return corners + centers[:, np.newaxis, :2]
+
+
+# Corners of a unit cube centered at the origin and the triangles of its faces
+UNIT_CUBE_CORNERS = np.array(
+    [[x, y, z] for z in (-0.5, 0.5) for y in (-0.5, 0.5) for x in (-0.5, 0.5)]
+)
+UNIT_CUBE_TRIANGLES = np.array([
+    [0, 2, 1], [1, 2, 3],  # bottom
+    [4, 5, 6], [5, 7, 6],  # top
+    [0, 1, 4], [1, 5, 4],  # front
+    [2, 6, 3], [3, 6, 7],  # back
+    [0, 4, 2], [2, 4, 6],  # left
+    [1, 3, 5], [3, 7, 5],  # right
+])
+
+
+def box_meshes(boxes: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Triangulate boxes into a single mesh.
+
+    Args:
+        boxes: Boxes produced by `Layout.to_boxes`.
+
+    Returns:
+        Tuple of vertex positions (8N, 3) and triangle indices (12N, 3).
+    """
+    return box_mesh_arrays(*box_arrays(boxes))
+
+
+def box_mesh_arrays(
+    centers: np.ndarray,
+    scales: np.ndarray,
+    rotations: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Triangulate boxes given as arrays into a single mesh.
+
+    Args:
+        centers: Box centers (N, 3).
+        scales: Box sizes (N, 3).
+        rotations: Box rotation matrices (N, 3, 3).
+
+    Returns:
+        Tuple of vertex positions (8N, 3) and triangle indices (12N, 3),
+        wound counter-clockwise when seen from outside.
+    """
+    local = UNIT_CUBE_CORNERS[np.newaxis, :, :] * scales[:, np.newaxis, :]
+    vertices = np.einsum("nij,nkj->nki", rotations, local) + centers[:, np.newaxis, :]
+    triangles = UNIT_CUBE_TRIANGLES[np.newaxis, :, :] + 8 * np.arange(len(centers))[:, np.newaxis, np.newaxis]
+    return vertices.reshape(-1, 3), triangles.reshape(-1, 3)
+
+
+def z_rotations(angles: np.ndarray) -> np.ndarray:
+    """Rotation matrices (N, 3, 3) about the z axis by the given angles."""
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotations = np.zeros((len(angles), 3, 3))
+    rotations[:, 0, 0] = cos
+    rotations[:, 0, 1] = -sin
+    rotations[:, 1, 0] = sin
+    rotations[:, 1, 1] = cos
+    rotations[:, 2, 2] = 1.0
+    return rotations
+
+
+def class_color(name: str) -> List[int]:
+    """Stable, mid-tone RGB color for an object class."""
+    value = zlib.crc32(name.encode("utf-8"))
+    return [64 + (value & 0x7F), 64 + ((value >> 8) & 0x7F), 64 + ((value >> 16) & 0x7F)]
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Indexed Layout Store for Arc LLM
+
+This module keeps generated layouts and their artifacts (visualization
+recordings, chunks and so on) in a single SQLite database instead of loose
+files. Artifacts are stored once per distinct content as compressed blobs,
+with zstd if `zstandard` is installed and gzip otherwise, and every layout
+is indexed by its description hash, model, entity counts and timestamps.
+Old layouts are evicted once the store exceeds its retention limits.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from single_flight import description_key
+
+# Names of the artifacts holding the layout string and its full recording
+LAYOUT_ARTIFACT = "layout.txt"
+RECORDING_ARTIFACT = "recording.rrd"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS layouts (
+    id TEXT PRIMARY KEY,
+    description_hash TEXT,
+    model TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    walls INTEGER NOT NULL DEFAULT 0,
+    doors INTEGER NOT NULL DEFAULT 0,
+    windows INTEGER NOT NULL DEFAULT 0,
+    bboxes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS layouts_updated ON layouts (updated);
+CREATE INDEX IF NOT EXISTS layouts_description ON layouts (description_hash, updated);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    layout_id TEXT NOT NULL REFERENCES layouts (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    blob_hash TEXT NOT NULL REFERENCES blobs (hash),
+    PRIMARY KEY (layout_id, name)
+);
+CREATE INDEX IF NOT EXISTS artifacts_blob ON artifacts (blob_hash);
+"""
+
+# Columns of a layout record, in the order of `_select`
+_LAYOUT_COLUMNS = ("id", "description_hash", "model", "created", "updated", "walls", "doors", "windows", "bboxes")
+
+
+def entity_counts(layout_str: str) -> Dict[str, int]:
+    """Count the walls, doors, windows and bboxes of a layout string."""
+    counts = {"walls": 0, "doors": 0, "windows": 0, "bboxes": 0}
+    for line in layout_str.split("\n"):
+        name = line.split("_", 1)[0].strip()
+        # "bbox" -> "bboxes", "wall" -> "walls"
+        key = name + ("es" if name == "bbox" else "s")
+        if key in counts and "=" in line:
+            counts[key] += 1
+    return counts
+
+
+def compress(data: bytes, codec: Optional[str] = None) -> Tuple[str, bytes]:
+    """
+    Compress a blob.
+
+    Args:
+        data: Bytes to compress.
+        codec: "zstd", "gzip" or "none"; zstd if available, otherwise gzip,
+               if None.
+
+    Returns:
+        Tuple of the codec actually used and the stored bytes. Data that
+        does not shrink, such as already compressed recordings, is stored
+        as is with the "none" codec.
+    """
+    codec = codec or ("zstd" if zstandard is not None else "gzip")
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for the zstd codec")
+        stored = zstandard.ZstdCompressor(level=10).compress(data)
+    elif codec == "gzip":
+        stored = gzip.compress(data, compresslevel=6, mtime=0)
+    elif codec == "none":
+        stored = data
+    else:
+        raise ValueError(f"Unsupported codec: {codec}")
+
+    if len(stored) >= len(data):
+        return "none", data
+    return codec, stored
+
+
+def decompress(codec: str, stored: bytes) -> bytes:
+    """Decompress a blob stored with `compress`."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd blobs")
+        return zstandard.ZstdDecompressor().decompress(stored)
+    if codec == "gzip":
+        return gzip.decompress(stored)
+    if codec == "none":
+        return bytes(stored)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+
+class LayoutStore:
+    """
+    SQLite-backed repository of layouts and their artifacts.
+
+    Each layout has named artifacts; the layout string itself is the
+    `layout.txt` artifact. Identical artifacts share one blob. The store
+    is safe to use from several threads; one connection is shared behind a
+    lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_layouts: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        codec: Optional[str] = None,
+    ):
+        """
+        Open or create a store.
+
+        Args:
+            path: Database file; ":memory:" for a temporary store.
+            max_layouts: Optional maximum number of layouts; the least
+                         recently updated ones are evicted beyond it.
+            max_bytes: Optional maximum total size of the stored (compressed)
+                       blobs, enforced the same way.
+            codec: Compression codec for new blobs; see `compress`.
+        """
+        self.path = path
+        self.max_layouts = max_layouts
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._stored_bytes = self._total_stored_bytes()
+
+    def _total_stored_bytes(self) -> int:
+        """Sum the stored size of all blobs."""
+        return self._db.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """
+        Hold the lock for a write transaction.
+
+        The running total of stored bytes is reloaded if the transaction
+        is rolled back.
+        """
+        with self._lock:
+            try:
+                with self._db:
+                    yield
+            except BaseException:
+                self._stored_bytes = self._total_stored_bytes()
+                raise
+
+    def put_layout(
+        self,
+        layout_id: str,
+        layout_str: str,
+        description: Optional[str] = None,
+        model: Optional[str] = None,
+        created: Optional[float] = None,
+    ) -> None:
+        """
+        Add a layout, or replace the layout string of an existing one.
+
+        Args:
+            layout_id: ID of the layout.
+            layout_str: Layout string in SpatialLM format.
+            description: Text description the layout was generated from;
+                         indexed by its `description_key` hash.
+            model: Model that generated the layout.
+            created: Creation time; now if not provided. Existing layouts
+                     keep their creation time.
+        """
+        now = time.time()
+        counts = entity_counts(layout_str)
+        description_hash = description_key(description) if description else None
+        with self._write():
+            self._db.execute(
+                "INSERT INTO layouts (id, description_hash, model, created, updated, walls, doors, windows, bboxes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET"
+                " description_hash = COALESCE(excluded.description_hash, description_hash),"
+                " model = CASE WHEN excluded.model = '' THEN model ELSE excluded.model END,"
+                " updated = excluded.updated, walls = excluded.walls, doors = excluded.doors,"
+                " windows = excluded.windows, bboxes = excluded.bboxes",
+                (layout_id, description_hash, model or "", created or now, now,
+                 counts["walls"], counts["doors"], counts["windows"], counts["bboxes"]),
+            )
+            self._put_artifact(layout_id, LAYOUT_ARTIFACT, layout_str.encode("utf-8"))
+            self._enforce_retention(keep=layout_id)
+
+    def put_artifact(self, layout_id: str, name: str, data: bytes) -> None:
+        """
+        Add or replace an artifact of an existing layout.
+
+        Raises:
+            KeyError: If the layout is not in the store.
+        """
+        with self._write():
+            updated = self._db.execute(
+                "UPDATE layouts SET updated = ? WHERE id = ?", (time.time(), layout_id)
+            ).rowcount
+            if not updated:
+                raise KeyError(layout_id)
+            self._put_artifact(layout_id, name, data)
+            self._enforce_retention(keep=layout_id)
+
+    def put_file(self, layout_id: str, name: str, file_path: str) -> None:
+        """Add the contents of a file as an artifact of an existing layout."""
+        with open(file_path, "rb") as f:
+            self.put_artifact(layout_id, name, f.read())
+
+    def put_directory(self, layout_id: str, prefix: str, directory: str) -> int:
+        """
+        Add every file of a directory as an artifact named `<prefix>/<file name>`.
+
+        Returns:
+            Number of files added.
+        """
+        files = sorted(
+            name for name in os.listdir(directory)
+            if os.path.isfile(os.path.join(directory, name))
+        )
+        for name in files:
+            self.put_file(layout_id, f"{prefix}/{name}", os.path.join(directory, name))
+        return len(files)
+
+    def _put_artifact(self, layout_id: str, name: str, data: bytes) -> None:
+        """Store a blob, unless it is already stored, and link it. Caller holds the lock."""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        exists = self._db.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        if not exists:
+            codec, stored = compress(data, self.codec)
+            self._db.execute(
+                "INSERT INTO blobs (hash, codec, size, stored_size, data) VALUES (?, ?, ?, ?, ?)",
+                (blob_hash, codec, len(data), len(stored), stored),
+            )
+            self._stored_bytes += len(stored)
+        previous = self._db.execute(
+            "SELECT blob_hash FROM artifacts WHERE layout_id = ? AND name = ?", (layout_id, name)
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO artifacts (layout_id, name, blob_hash) VALUES (?, ?, ?)",
+            (layout_id, name, blob_hash),
+        )
+        if previous and previous[0] != blob_hash:
+            self._delete_orphans([previous[0]])
+
+    def get_layout(self, layout_id: str) -> Optional[str]:
+        """Get a layout string, or None if the layout is not in the store."""
+        data = self.get_artifact(layout_id, LAYOUT_ARTIFACT)
+        return data.decode("utf-8") if data is not None else None
+
+    def get_artifact(self, layout_id: str, name: str) -> Optional[bytes]:
+        """Get the contents of an artifact, or None if it does not exist."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blobs.codec, blobs.data FROM artifacts JOIN blobs ON blobs.hash = artifacts.blob_hash"
+                " WHERE artifacts.layout_id = ? AND artifacts.name = ?",
+                (layout_id, name),
+            ).fetchone()
+        return decompress(*row) if row else None
+
+    def has_artifact(self, layout_id: str, name: str) -> bool:
+        """Whether a layout has an artifact, without reading it."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM artifacts WHERE layout_id = ? AND name = ?", (layout_id, name)
+            ).fetchone() is not None
+
+    def has_artifacts(self, layout_id: str, prefix: str) -> bool:
+        """Whether a layout has any artifact named `<prefix>/...`."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM artifacts WHERE layout_id = ? AND name >= ? AND name < ? LIMIT 1",
+                (layout_id, prefix + "/", prefix + "0"),
+            ).fetchone() is not None
+
+    def _select(self, where: str = "", params: tuple = (), limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Layout records with their artifact sizes, most recently updated first."""
+        query = f"SELECT {', '.join(_LAYOUT_COLUMNS)} FROM layouts {where} ORDER BY updated DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            records = [dict(zip(_LAYOUT_COLUMNS, row)) for row in self._db.execute(query, params)]
+            for record in records:
+                record["artifacts"] = {
+                    name: size for name, size in self._db.execute(
+                        "SELECT artifacts.name, blobs.size FROM artifacts JOIN blobs ON blobs.hash = artifacts.blob_hash"
+                        " WHERE artifacts.layout_id = ? ORDER BY artifacts.name",
+                        (record["id"],),
+                    )
+                }
+        return records
+
+    def info(self, layout_id: str) -> Optional[Dict[str, Any]]:
+        """Get the record of a layout: its indexed fields and artifact sizes."""
+        records = self._select("WHERE id = ?", (layout_id,))
+        return records[0] if records else None
+
+    def latest(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the records of the most recently updated layouts."""
+        return self._select(limit=limit)
+
+    def by_description(
+        self,
+        description: Optional[str] = None,
+        description_hash: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the records of the layouts generated from a description.
+
+        Args:
+            description: Text description; hashed with `description_key`.
+            description_hash: Hash to look up instead of a description.
+            limit: Optional maximum number of records.
+
+        Returns:
+            Matching records, most recently updated first.
+        """
+        if description_hash is None:
+            if description is None:
+                raise ValueError("Either description or description_hash is required")
+            description_hash = description_key(description)
+        return self._select("WHERE description_hash = ?", (description_hash,), limit)
+
+    def delete(self, layout_id: str) -> bool:
+        """Delete a layout and its artifacts; returns whether it existed."""
+        with self._write():
+            deleted = self._delete_layouts([layout_id])
+        return bool(deleted)
+
+    def _delete_layouts(self, layout_ids: List[str]) -> int:
+        """
+        Delete layouts and the blobs only they referred to. Caller holds the lock.
+
+        Returns:
+            Number of layouts deleted.
+        """
+        hashes = set()
+        deleted = 0
+        for layout_id in layout_ids:
+            hashes.update(row[0] for row in self._db.execute(
+                "SELECT blob_hash FROM artifacts WHERE layout_id = ?", (layout_id,)
+            ))
+            deleted += self._db.execute("DELETE FROM layouts WHERE id = ?", (layout_id,)).rowcount
+        self._delete_orphans(hashes)
+        return deleted
+
+    def _delete_orphans(self, hashes: Iterable[str]) -> None:
+        """Delete those of the given blobs no artifact refers to anymore. Caller holds the lock."""
+        for blob_hash in hashes:
+            if self._db.execute("SELECT 1 FROM artifacts WHERE blob_hash = ? LIMIT 1", (blob_hash,)).fetchone():
+                continue
+            row = self._db.execute("SELECT stored_size FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM blobs WHERE hash = ?", (blob_hash,))
+                self._stored_bytes -= row[0]
+
+    def _enforce_retention(self, keep: Optional[str] = None) -> None:
+        """Evict the least recently updated layouts beyond the limits. Caller holds the lock."""
+        if self.max_layouts is not None:
+            excess = self._db.execute("SELECT COUNT(*) FROM layouts").fetchone()[0] - self.max_layouts
+            if excess > 0:
+                evicted = [row[0] for row in self._db.execute(
+                    "SELECT id FROM layouts WHERE id != ? ORDER BY updated LIMIT ?", (keep, excess)
+                )]
+                self._delete_layouts(evicted)
+
+        if self.max_bytes is not None:
+            while self._stored_bytes > self.max_bytes:
+                oldest = self._db.execute(
+                    "SELECT id FROM layouts WHERE id != ? ORDER BY updated LIMIT 1", (keep,)
+                ).fetchone()
+                if oldest is None:
+                    break
+                self._delete_layouts([oldest[0]])
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of layouts, artifacts and blobs and their total sizes."""
+        with self._lock:
+            layouts = self._db.execute("SELECT COUNT(*) FROM layouts").fetchone()[0]
+            artifacts = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            blobs, size, stored_size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+        return {
+            "layouts": layouts,
+            "artifacts": artifacts,
+            "blobs": blobs,
+            "size": size,
+            "stored_size": stored_size,
+        }
+
+    def import_folder(self, folder: str) -> int:
+        """
+        Import a flat uploads folder of `<id>.txt` layouts into the store.
+
+        `<id>.rrd` becomes the `recording.rrd` artifact, `<id>.rev<N>.rrd`
+        deltas become `rev<N>.rrd` artifacts, and files in an `<id>/` chunk
+        directory become `chunks/<file name>` artifacts.
+
+        Returns:
+            Number of layouts imported.
+        """
+        imported = 0
+        for layout_path in sorted(glob.glob(os.path.join(folder, "*.txt"))):
+            layout_id = os.path.splitext(os.path.basename(layout_path))[0]
+            with open(layout_path, "r") as f:
+                self.put_layout(layout_id, f.read(), created=os.path.getmtime(layout_path))
+            for vis_path in sorted(glob.glob(os.path.join(folder, f"{layout_id}.*rrd"))):
+                name = os.path.basename(vis_path)[len(layout_id) + 1:]
+                self.put_file(layout_id, RECORDING_ARTIFACT if name == "rrd" else name, vis_path)
+            chunk_dir = os.path.join(folder, layout_id)
+            if os.path.isdir(chunk_dir):
+                self.put_directory(layout_id, "chunks", chunk_dir)
+            imported += 1
+        return imported
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or fill an Arc LLM layout store")
+    parser.add_argument("--db", type=str, default="layouts.db", help="Store database file")
+    parser.add_argument("--import-folder", type=str, help="Import a flat uploads folder")
+    parser.add_argument("--latest", type=int, help="List the most recently updated layouts")
+    parser.add_argument("--description", type=str, help="List the layouts generated from a description")
+    parser.add_argument("--get", type=str, metavar="LAYOUT_ID", help="Print a layout string")
+
+    args = parser.parse_args()
+
+    store = LayoutStore(args.db)
+    if args.import_folder:
+        print(f"Imported {store.import_folder(args.import_folder)} layouts")
+
+    records = []
+    if args.latest:
+        records = store.latest(args.latest)
+    elif args.description:
+        records = store.by_description(args.description)
+    for record in records:
+        counts = ", ".join(f"{record[key]} {key}" for key in ("walls", "doors", "windows", "bboxes"))
+        print(f"{record['id']}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['updated']))}  "
+              f"{record['model'] or '-'}  {counts}  {sum(record['artifacts'].values())} bytes")
+
+    if args.get:
+        layout_str = store.get_layout(args.get)
+        if layout_str is None:
+            print(f"Layout not found: {args.get}")
+        else:
+            print(layout_str)
+
+    stats = store.stats()
+    print(f"{stats['layouts']} layouts, {stats['blobs']} blobs, "
+          f"{stats['size']} bytes stored in {stats['stored_size']} bytes")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
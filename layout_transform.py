@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Whole-Layout Geometric Transforms for Arc LLM
+
+This module moves, rotates, mirrors and scales every entity of a layout at
+once, and stamps copies of a layout at several offsets, e.g. to build a
+tower from a typical floor. The coordinates of all entities are gathered
+into arrays and transformed with a single matrix product per entity type.
+"""
+
+import argparse
+import copy
+import math
+import os
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from simplified_spatiallm import read_layout, write_layout
+
+# Numeric fields of each entity type, in the column order of their arrays
+_WALL_FIELDS = ("ax", "ay", "az", "bx", "by", "bz", "height", "thickness")
+_OPENING_FIELDS = ("position_x", "position_y", "position_z", "width", "height")
+_BBOX_FIELDS = ("position_x", "position_y", "position_z", "angle_z", "scale_x", "scale_y", "scale_z")
+
+
+def _entity_array(entities: List, fields: Tuple[str, ...]) -> np.ndarray:
+    """Numeric fields of a list of entities as an (N, len(fields)) array."""
+    return np.array(
+        [[getattr(entity, field) for field in fields] for entity in entities],
+        dtype=np.float64,
+    ).reshape(-1, len(fields))
+
+
+def _store(entities: List, array: np.ndarray, fields: Tuple[str, ...]) -> None:
+    """Write the rows of an entity array back to the entities."""
+    for entity, row in zip(entities, array.tolist()):
+        for field, value in zip(fields, row):
+            setattr(entity, field, value)
+
+
+def _apply(
+    walls: np.ndarray,
+    openings: List[np.ndarray],
+    bboxes: np.ndarray,
+    linear: np.ndarray,
+    offset: np.ndarray,
+    z_scale: float,
+) -> None:
+    """
+    Transform entity arrays in place.
+
+    XY coordinates are mapped by `linear` (2x2) and z is scaled by
+    `z_scale`, then everything is moved by `offset`. Sizes in the plan are
+    scaled by the linear map's uniform scale factor, heights by `z_scale`,
+    and bbox angles follow the transformed direction of the box's x axis.
+    """
+    planar = round(math.sqrt(abs(np.linalg.det(linear))), 12)
+
+    for start in (0, 3):
+        walls[:, start:start + 2] = walls[:, start:start + 2] @ linear.T + offset[:2]
+        walls[:, start + 2] = walls[:, start + 2] * z_scale + offset[2]
+    walls[:, 6] *= z_scale
+    walls[:, 7] *= planar
+
+    for array in openings:
+        array[:, 0:2] = array[:, 0:2] @ linear.T + offset[:2]
+        array[:, 2] = array[:, 2] * z_scale + offset[2]
+        array[:, 3] *= planar
+        array[:, 4] *= z_scale
+
+    bboxes[:, 0:2] = bboxes[:, 0:2] @ linear.T + offset[:2]
+    bboxes[:, 2] = bboxes[:, 2] * z_scale + offset[2]
+    axes = np.stack([np.cos(bboxes[:, 3]), np.sin(bboxes[:, 3])], axis=1) @ linear.T
+    bboxes[:, 3] = np.arctan2(axes[:, 1], axes[:, 0])
+    bboxes[:, 4:6] *= planar
+    bboxes[:, 6] *= z_scale
+
+
+def transform(
+    layout: Layout,
+    linear: Optional[np.ndarray] = None,
+    offset: Sequence[float] = (0.0, 0.0, 0.0),
+    z_scale: float = 1.0,
+) -> Layout:
+    """
+    Apply an affine transform to every entity of a layout in place.
+
+    Args:
+        layout: Layout to transform.
+        linear: 2x2 matrix applied to XY coordinates; a rotation, a mirror
+                or a uniform scale, or a product of those. Identity if None.
+        offset: Translation (x, y, z) applied after the linear map.
+        z_scale: Factor applied to z coordinates and heights.
+
+    Returns:
+        The same layout, for chaining.
+    """
+    linear = np.eye(2) if linear is None else np.asarray(linear, dtype=np.float64)
+    offset = np.asarray(offset, dtype=np.float64)
+
+    walls = _entity_array(layout.walls, _WALL_FIELDS)
+    doors = _entity_array(layout.doors, _OPENING_FIELDS)
+    windows = _entity_array(layout.windows, _OPENING_FIELDS)
+    bboxes = _entity_array(layout.bboxes, _BBOX_FIELDS)
+    _apply(walls, [doors, windows], bboxes, linear, offset, z_scale)
+    _store(layout.walls, walls, _WALL_FIELDS)
+    _store(layout.doors, doors, _OPENING_FIELDS)
+    _store(layout.windows, windows, _OPENING_FIELDS)
+    _store(layout.bboxes, bboxes, _BBOX_FIELDS)
+    return layout
+
+
+def _about(linear: np.ndarray, origin: Sequence[float]) -> np.ndarray:
+    """Offset that makes a linear map keep `origin` fixed."""
+    origin = np.asarray(origin, dtype=np.float64)[:2]
+    return np.append(origin - linear @ origin, 0.0)
+
+
+def translate(layout: Layout, dx: float = 0.0, dy: float = 0.0, dz: float = 0.0) -> Layout:
+    """Move every entity of a layout by (dx, dy, dz) in place."""
+    return transform(layout, offset=(dx, dy, dz))
+
+
+def rotate(layout: Layout, angle: float, origin: Sequence[float] = (0.0, 0.0)) -> Layout:
+    """Rotate a layout about the vertical axis through `origin` by `angle` radians, in place."""
+    # Rounding keeps quarter turns exact instead of leaving 1e-16 residues
+    cos, sin = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    linear = np.array([[cos, -sin], [sin, cos]])
+    return transform(layout, linear, _about(linear, origin))
+
+
+def mirror(layout: Layout, axis: str = "x", origin: Sequence[float] = (0.0, 0.0)) -> Layout:
+    """
+    Mirror a layout in place.
+
+    Args:
+        layout: Layout to mirror.
+        axis: "x" to flip x coordinates (mirror across a vertical line
+              through `origin`), or "y" to flip y coordinates.
+        origin: Point the mirror line passes through.
+
+    Returns:
+        The same layout, for chaining.
+    """
+    if axis not in ("x", "y"):
+        raise ValueError(f"Unsupported mirror axis: {axis}")
+    linear = np.diag([-1.0, 1.0] if axis == "x" else [1.0, -1.0])
+    return transform(layout, linear, _about(linear, origin))
+
+
+def scale(
+    layout: Layout,
+    factor: float,
+    z_factor: Optional[float] = None,
+    origin: Sequence[float] = (0.0, 0.0),
+) -> Layout:
+    """
+    Scale a layout about `origin` in place.
+
+    Plan scaling is uniform, since rotated boxes cannot represent a
+    non-uniform scale; heights can be scaled separately.
+
+    Args:
+        layout: Layout to scale.
+        factor: Scale factor in the XY plane.
+        z_factor: Scale factor for heights; `factor` if None.
+        origin: Point that stays fixed.
+
+    Returns:
+        The same layout, for chaining.
+    """
+    linear = np.eye(2) * factor
+    return transform(layout, linear, _about(linear, origin), factor if z_factor is None else z_factor)
+
+
+def _id_stride(entities: List) -> int:
+    """One more than the largest ID of a list of entities."""
+    return max((entity.id for entity in entities), default=-1) + 1
+
+
+def _stamp_entities(entities: List, array: np.ndarray, fields: Tuple[str, ...], wall_stride: Optional[int] = None) -> List:
+    """
+    Copy entities once per row block of a (copies, entities, fields) array.
+
+    IDs of copy k are shifted by k times the ID stride of the entities, and
+    if `wall_stride` is given so are the wall IDs the entities refer to.
+    """
+    id_stride = _id_stride(entities)
+    stamped = []
+    for k, rows in enumerate(array.tolist()):
+        for entity, row in zip(entities, rows):
+            clone = copy.copy(entity)
+            clone.id = entity.id + k * id_stride
+            if wall_stride is not None:
+                clone.wall_id = entity.wall_id + k * wall_stride
+            for field, value in zip(fields, row):
+                setattr(clone, field, value)
+            stamped.append(clone)
+    return stamped
+
+
+def stamp(layout: Layout, offsets: Sequence[Sequence[float]]) -> Layout:
+    """
+    Build a new layout from copies of a layout placed at several offsets.
+
+    Copy k is moved by offsets[k], and its entity IDs are shifted by k times
+    one more than the largest ID of each entity type, so IDs stay unique
+    and doors and windows keep pointing at their own copy's walls.
+
+    Args:
+        layout: Layout to copy; it is not modified.
+        offsets: Translation (x, y, z) of each copy, e.g.
+                 `[(0, 0, 3.0 * k) for k in range(40)]` for a 40-storey tower.
+
+    Returns:
+        A new layout with all copies.
+    """
+    offsets = np.asarray(offsets, dtype=np.float64).reshape(-1, 3)
+    copies = len(offsets)
+
+    wall_stride = _id_stride(layout.walls)
+
+    # Every copy's coordinates in one broadcast: (copies, entities, columns)
+    walls = np.repeat(_entity_array(layout.walls, _WALL_FIELDS)[np.newaxis], copies, axis=0)
+    for start in (0, 3):
+        walls[:, :, start:start + 3] += offsets[:, np.newaxis, :]
+    positions = {}
+    for name, openings in (("doors", layout.doors), ("windows", layout.windows)):
+        array = np.repeat(_entity_array(openings, _OPENING_FIELDS)[np.newaxis], copies, axis=0)
+        array[:, :, 0:3] += offsets[:, np.newaxis, :]
+        positions[name] = array
+    bboxes = np.repeat(_entity_array(layout.bboxes, _BBOX_FIELDS)[np.newaxis], copies, axis=0)
+    bboxes[:, :, 0:3] += offsets[:, np.newaxis, :]
+
+    result = type(layout)()
+    result.walls = _stamp_entities(layout.walls, walls, _WALL_FIELDS)
+    result.doors = _stamp_entities(layout.doors, positions["doors"], _OPENING_FIELDS, wall_stride)
+    result.windows = _stamp_entities(layout.windows, positions["windows"], _OPENING_FIELDS, wall_stride)
+    result.bboxes = _stamp_entities(layout.bboxes, bboxes, _BBOX_FIELDS)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transform a SpatialLM layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file")
+    parser.add_argument("--output", type=str, help="Output layout file (default: print)")
+    parser.add_argument("--translate", type=float, nargs=3, metavar=("DX", "DY", "DZ"), help="Translation in meters")
+    parser.add_argument("--rotate", type=float, help="Rotation about z in degrees")
+    parser.add_argument("--mirror", type=str, choices=["x", "y"], help="Coordinate to flip")
+    parser.add_argument("--scale", type=float, help="Uniform scale factor")
+    parser.add_argument("--floors", type=int, help="Stack this many copies vertically")
+    parser.add_argument("--floor-height", type=float, default=3.0, help="Height of each stacked copy")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout = read_layout(f, Layout())
+
+    if args.scale is not None:
+        scale(layout, args.scale)
+    if args.mirror:
+        mirror(layout, args.mirror)
+    if args.rotate is not None:
+        rotate(layout, math.radians(args.rotate))
+    if args.translate:
+        translate(layout, *args.translate)
+    if args.floors:
+        layout = stamp(layout, [(0.0, 0.0, args.floor_height * k) for k in range(args.floors)])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            write_layout(layout, f)
+    else:
+        write_layout(layout, sys.stdout)
+        print()
+
+
+if __name__ == "__main__":
+    main()
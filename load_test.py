@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Load Generator for the Arc LLM Web Interface
+
+This script drives the `/generate` endpoint at a target request rate and
+reports latency percentiles, throughput and error rates. Run it against a web
+interface backed by mock_claude_server to measure the web tier and client
+without any outside services.
+
+Requests are sent open-loop: each one is scheduled at a fixed time and its
+latency is measured from that time, so a slow server cannot hide queueing
+delay by slowing the load generator down.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Get a percentile of a list of values by the nearest-rank method.
+
+    Args:
+        values: Values to summarize.
+        q: Percentile between 0 and 100.
+
+    Returns:
+        The percentile, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_texts(examples_dir: str) -> List[str]:
+    """Load the example text descriptions (not the structured ones)."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(examples_dir, "*.txt"))):
+        if path.endswith(("_description.txt", "_layout.txt")):
+            continue
+        with open(path, "r") as f:
+            texts.append(f.read())
+    return texts
+
+
+def run_load_test(
+    base_url: str,
+    texts: List[str],
+    rps: float = 5.0,
+    duration: float = 30.0,
+    mode: str = "full",
+    unique: bool = False,
+    timeout: float = 120.0,
+    max_workers: int = 256,
+) -> Dict[str, Any]:
+    """
+    Send `/generate` requests at a fixed rate and summarize the results.
+
+    Args:
+        base_url: Base URL of the web interface, e.g. "http://127.0.0.1:5000".
+        texts: Text descriptions to cycle through.
+        rps: Target requests per second.
+        duration: Seconds to keep sending requests.
+        mode: "full", "chunked" or "preview_only", as on the form.
+        unique: If True, number each text so identical requests are not
+                coalesced by the server.
+        timeout: Per-request timeout in seconds.
+        max_workers: Maximum number of requests in flight.
+
+    Returns:
+        Report with request counts, status counts, error rate, throughput
+        and latency percentiles in milliseconds.
+    """
+    url = base_url.rstrip("/") + "/generate"
+    total = max(1, int(rps * duration))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def send(index: int, scheduled: float):
+        text = texts[index % len(texts)]
+        if unique:
+            text = f"{text}\n(Request {index})"
+        form = {"text": text}
+        if mode != "full":
+            form[mode] = "1"
+        try:
+            response = session.post(url, data=form, timeout=timeout)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        latency = time.perf_counter() - scheduled
+        with lock:
+            statuses[status] += 1
+            if status == "200":
+                latencies.append(latency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for index in range(total):
+            scheduled = start + index / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, index, scheduled)
+    elapsed = time.perf_counter() - start
+
+    errors = total - statuses["200"]
+    return {
+        "requests": total,
+        "succeeded": statuses["200"],
+        "statuses": dict(statuses),
+        "error_rate": errors / total,
+        "elapsed_seconds": elapsed,
+        "target_rps": rps,
+        "throughput_rps": statuses["200"] / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": 1000 * percentile(latencies, 50),
+            "p90": 1000 * percentile(latencies, 90),
+            "p95": 1000 * percentile(latencies, 95),
+            "p99": 1000 * percentile(latencies, 99),
+            "max": 1000 * max(latencies) if latencies else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Arc LLM web interface")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:5000", help="Base URL of the web interface")
+    parser.add_argument("--rps", type=float, default=5.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send requests for")
+    parser.add_argument("--mode", type=str, default="full", choices=["full", "chunked", "preview_only"], help="Generation mode")
+    parser.add_argument("--unique", action="store_true", help="Make every request text distinct")
+    parser.add_argument("--examples-dir", type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples"), help="Directory of example texts")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-error-rate", type=float, help="Exit with status 1 if the error rate exceeds this")
+
+    args = parser.parse_args()
+
+    texts = load_texts(args.examples_dir)
+    if not texts:
+        print(f"No example texts found in {args.examples_dir}")
+        sys.exit(1)
+
+    report = run_load_test(
+        args.url,
+        texts,
+        rps=args.rps,
+        duration=args.duration,
+        mode=args.mode,
+        unique=args.unique,
+        timeout=args.timeout,
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Requests:   {report['requests']} ({report['succeeded']} succeeded)")
+        print(f"Statuses:   {report['statuses']}")
+        print(f"Error rate: {report['error_rate']:.2%}")
+        print(f"Throughput: {report['throughput_rps']:.2f} req/s (target {report['target_rps']:.2f})")
+        latency = report["latency_ms"]
+        print(
+            "Latency:    "
+            f"p50 {latency['p50']:.0f} ms, p90 {latency['p90']:.0f} ms, "
+            f"p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms, max {latency['max']:.0f} ms"
+        )
+
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
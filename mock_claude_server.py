@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Mock Claude Messages API Server for Arc LLM
+
+This module serves a local stand-in for the Claude Messages API so the client
+and web interface can be exercised and load-tested without an API key or
+network access. Responses are replayed from canned structured descriptions
+(the `examples/*_description.txt` files by default), with configurable
+latency, streaming speed, server errors and rate limiting.
+
+Point Arc LLM at it with the CLAUDE_API_URL environment variable:
+
+    python mock_claude_server.py --port 8089
+    CLAUDE_API_URL=http://127.0.0.1:8089/v1/messages CLAUDE_API_KEY=mock python web_interface.py
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from claude_api import (
+    FLOOR_LINE_PATTERN,
+    ROOM_LINE_PATTERN,
+    STAIRCASE_LINE_PATTERN,
+)
+
+# Rough number of characters per token, used for max_tokens and usage counts
+CHARS_PER_TOKEN = 4
+
+# Characters sent in each streamed text delta
+STREAM_CHUNK_CHARS = 16
+
+ONLY_FLOOR_PATTERN = re.compile(r"Only describe floor\s+(\d+)", re.IGNORECASE)
+
+
+def _words(text: str) -> set:
+    """Lowercase words of a text, for matching prompts against examples."""
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def _is_skeleton_line(line: str) -> bool:
+    """Whether a line is a floor, room or staircase line."""
+    return any(
+        pattern.match(line)
+        for pattern in (FLOOR_LINE_PATTERN, ROOM_LINE_PATTERN, STAIRCASE_LINE_PATTERN)
+    )
+
+
+def skeleton_lines(description: str) -> str:
+    """Get the floor, room and staircase lines of a structured description."""
+    return "\n".join(
+        line.strip() for line in description.split("\n") if _is_skeleton_line(line.strip())
+    )
+
+
+def floor_detail(description: str, floor_num: int) -> str:
+    """
+    Get the walls, openings and objects of one floor of a description.
+
+    Wall references are returned unchanged, so the result only round-trips
+    through `claude_api.merge_floor_descriptions` for descriptions whose
+    floors number their walls from 0.
+
+    Args:
+        description: Structured layout description.
+        floor_num: Floor to extract.
+
+    Returns:
+        The floor's detail lines.
+    """
+    current_floor = 0
+    detail = []
+    for line in description.split("\n"):
+        line = line.strip()
+        floor_match = FLOOR_LINE_PATTERN.match(line)
+        if floor_match:
+            current_floor = int(floor_match.group(1))
+            continue
+        if not line or line.startswith("#") or _is_skeleton_line(line):
+            continue
+        if current_floor == floor_num:
+            detail.append(line)
+    return "\n".join(detail)
+
+
+class MockClaudeServer:
+    """
+    Threaded HTTP server answering Messages API requests with canned text.
+
+    Each request is answered with the canned description whose source text
+    shares the most words with the prompt. Planning and per-floor prompts of
+    `ClaudeAPI.generate_layout_description_parallel` receive the matching
+    part of that description, and assistant prefills are continued from the
+    end of the prefill, so truncation and continuation can be exercised too.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8089,
+        examples_dir: Optional[str] = None,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_concurrent: Optional[int] = None,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            host: Address to listen on.
+            port: Port to listen on; 0 picks a free port.
+            examples_dir: Directory of `*_description.txt` files to replay,
+                          each optionally next to the `*.txt` text it was
+                          generated from. Defaults to the bundled examples.
+            latency: Seconds before the first token of each response.
+            jitter: Maximum random extra latency in seconds.
+            tokens_per_second: Generation speed after the first token; 0
+                               sends the whole response at once.
+            error_rate: Fraction of requests answered with a 500 error.
+            rate_limit_rate: Fraction of requests answered with a 429 error.
+            max_concurrent: Optional number of concurrent requests beyond
+                            which requests are answered with a 429 error.
+            retry_after: Value of the retry-after header on 429 responses.
+            seed: Optional seed for the random latency and errors.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.examples = self._load_examples(
+            examples_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+        )
+
+        self._lock = threading.Lock()
+        self.active = 0
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _load_examples(examples_dir: str) -> List[Tuple[set, str]]:
+        """Load (source words, description) pairs from a directory."""
+        examples = []
+        for path in sorted(glob.glob(os.path.join(examples_dir, "*_description.txt"))):
+            with open(path, "r") as f:
+                description = f.read().strip()
+            source_path = path[:-len("_description.txt")] + ".txt"
+            source = ""
+            if os.path.exists(source_path):
+                with open(source_path, "r") as f:
+                    source = f.read()
+            examples.append((_words(source), description))
+        if not examples:
+            raise ValueError(f"No *_description.txt files found in {examples_dir}")
+        return examples
+
+    @property
+    def url(self) -> str:
+        """URL of the Messages endpoint, for CLAUDE_API_URL."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/messages"
+
+    def start(self) -> "MockClaudeServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until interrupted."""
+        self.httpd.serve_forever()
+
+    def admit(self) -> Optional[Tuple[int, str, str]]:
+        """
+        Decide whether a request fails before it is answered.
+
+        Returns:
+            (status, error type, message) for a failing request, or None.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self.random.random()
+            if self.max_concurrent is not None and self.active >= self.max_concurrent:
+                self.stats["rate_limited"] += 1
+                return 429, "rate_limit_error", "Too many concurrent requests"
+            if roll < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return 429, "rate_limit_error", "Rate limit exceeded"
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return 500, "api_error", "Internal server error"
+            self.active += 1
+            return None
+
+    def release(self) -> None:
+        """Mark an admitted request as finished."""
+        with self._lock:
+            self.active -= 1
+
+    def first_token_delay(self) -> float:
+        """Seconds to wait before the first token of a response."""
+        with self._lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Build the text of a response to a Messages API request.
+
+        Args:
+            body: Parsed JSON request body.
+
+        Returns:
+            Tuple of the generated text and the stop reason.
+        """
+        messages = body.get("messages", [])
+        prompt = next(
+            (m["content"] for m in messages if m.get("role") == "user"), ""
+        )
+        if not isinstance(prompt, str):
+            prompt = " ".join(block.get("text", "") for block in prompt)
+        prefill = ""
+        if messages and messages[-1].get("role") == "assistant":
+            prefill = messages[-1]["content"]
+
+        prompt_words = _words(prompt)
+        _, description = max(
+            self.examples, key=lambda example: len(example[0] & prompt_words)
+        )
+
+        system = body.get("system") or ""
+        floor_match = ONLY_FLOOR_PATTERN.search(prompt)
+        if "plans the floors and rooms" in system:
+            text = skeleton_lines(description)
+        elif floor_match:
+            text = floor_detail(description, int(floor_match.group(1)))
+        else:
+            text = description
+
+        if prefill and text.startswith(prefill):
+            text = text[len(prefill):]
+
+        max_chars = int(body.get("max_tokens", 4096)) * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            return text[:max_chars], "max_tokens"
+        return text, "end_turn"
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Request handler for MockClaudeServer."""
+
+    def log_message(self, format, *args):
+        # Load tests produce far too many requests to log each one
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, event: Dict[str, Any]):
+        self.wfile.write(
+            f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+        )
+        self.wfile.flush()
+
+    def do_POST(self):
+        mock = self.server.mock
+        if self.path.rstrip("/") != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": "Not found"}})
+            return
+
+        try:
+            length = int(self.headers.get("content-length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "Invalid JSON"}})
+            return
+
+        if not self.headers.get("x-api-key"):
+            self._send_json(401, {"type": "error", "error": {"type": "authentication_error", "message": "Missing x-api-key"}})
+            return
+
+        failure = mock.admit()
+        if failure is not None:
+            status, error_type, message = failure
+            headers = {"retry-after": str(mock.retry_after)} if status == 429 else None
+            self._send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+            return
+
+        try:
+            text, stop_reason = mock.respond(body)
+            time.sleep(mock.first_token_delay())
+            if body.get("stream"):
+                self._stream(body, text, stop_reason)
+            else:
+                self._complete(body, text, stop_reason)
+        finally:
+            mock.release()
+
+    def _message(self, body: Dict[str, Any], content: List, stop_reason: Optional[str], output_tokens: int):
+        """Build a Messages API message object."""
+        input_chars = len(body.get("system") or "") + sum(
+            len(str(m.get("content", ""))) for m in body.get("messages", [])
+        )
+        return {
+            "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": input_chars // CHARS_PER_TOKEN,
+                "output_tokens": output_tokens,
+            },
+        }
+
+    def _complete(self, body: Dict[str, Any], text: str, stop_reason: str):
+        """Answer a non-streaming request after the full generation time."""
+        mock = self.server.mock
+        output_tokens = len(text) // CHARS_PER_TOKEN
+        if mock.tokens_per_second:
+            time.sleep(output_tokens / mock.tokens_per_second)
+        self._send_json(200, self._message(body, [{"type": "text", "text": text}], stop_reason, output_tokens))
+
+    def _stream(self, body: Dict[str, Any], text: str, stop_reason: str):
+        """Answer a streaming request with server-sent events."""
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.end_headers()
+
+        output_tokens = len(text) // CHARS_PER_TOKEN
+        self._send_event({"type": "message_start", "message": self._message(body, [], None, 1)})
+        self._send_event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            chunk = text[start:start + STREAM_CHUNK_CHARS]
+            if mock.tokens_per_second:
+                time.sleep(len(chunk) / CHARS_PER_TOKEN / mock.tokens_per_second)
+            self._send_event({
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": chunk},
+            })
+        self._send_event({"type": "content_block_stop", "index": 0})
+        self._send_event({
+            "type": "message_delta",
+            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        })
+        self._send_event({"type": "message_stop"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Claude Messages API server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--examples-dir", type=str, help="Directory of *_description.txt files to replay")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random extra latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation speed (0 for instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--max-concurrent", type=int, help="Concurrent requests beyond which 429 is returned")
+    parser.add_argument("--seed", type=int, help="Seed for random latency and errors")
+
+    args = parser.parse_args()
+
+    server = MockClaudeServer(
+        host=args.host,
+        port=args.port,
+        examples_dir=args.examples_dir,
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_concurrent=args.max_concurrent,
+        seed=args.seed,
+    )
+    print(f"Mock Claude API listening on {server.url}")
+    print(f"Set CLAUDE_API_URL={server.url} to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Model Router for Arc LLM
+
+This module picks the Claude model for a text description from a ladder of
+models ordered from fastest and cheapest to strongest. Descriptions are
+scored by how many floors and rooms they mention, small ones go to the
+fast end of the ladder and large multi-floor buildings to the strong end.
+When a model's output does not parse into a usable layout, the caller
+escalates to the next model up the ladder.
+"""
+
+import argparse
+import re
+from typing import List, Optional, Sequence
+
+from template_router import NUMBER_WORDS
+
+# Models from fastest and cheapest to strongest
+DEFAULT_MODELS = (
+    "claude-3-haiku-20240307",
+    "claude-3-5-sonnet-20240620",
+    "claude-3-opus-20240229",
+)
+
+# Highest complexity each model but the last is chosen for
+DEFAULT_THRESHOLDS = (2.0, 10.0)
+
+# Rooms an extra floor is worth, since every floor repeats walls and stairs
+FLOOR_WEIGHT = 4.0
+
+COUNT = r"(?:\b(a|an|one|two|three|four|five|six|\d+)\s+(?:\w+\s+)?)?"
+STOREY_PATTERN = re.compile(
+    r"\b(single|one|two|three|four|five|six|\d+)[\s-]+(?:stor(?:e?y|ies|eys)|floors?|levels?)\b",
+    re.IGNORECASE,
+)
+FLOOR_HEADING_PATTERN = re.compile(
+    r"\b(ground|first|second|third|fourth|fifth|top)\s+floor\b|\b(basement|attic)\b",
+    re.IGNORECASE,
+)
+ROOM_PATTERN = re.compile(
+    COUNT + r"((?:living|dining|guest|family|laundry|utility)\s+(?:room|area)s?"
+    r"|bedrooms?|bathrooms?|kitchens?|offices?|stud(?:y|ies)|hallways?|garages?"
+    r"|closets?|dens?|lounges?|pantr(?:y|ies)|foyers?|ensuites?|basements?|attics?)\b",
+    re.IGNORECASE,
+)
+
+
+def _count(word: Optional[str]) -> int:
+    """Turn a count word or number into an integer, defaulting to 1."""
+    if word is None:
+        return 1
+    word = word.lower()
+    if word == "single":
+        return 1
+    return int(word) if word.isdigit() else NUMBER_WORDS.get(word, 1)
+
+
+def count_floors(text: str) -> int:
+    """Estimate the number of floors a description mentions, at least 1."""
+    stated = [_count(match.group(1)) for match in STOREY_PATTERN.finditer(text)]
+    if stated:
+        return max(stated)
+    # Otherwise count the distinct floors named, e.g. "ground floor", "attic"
+    headings = {match.group(0).lower() for match in FLOOR_HEADING_PATTERN.finditer(text)}
+    return max(len(headings), 1)
+
+
+def count_rooms(text: str) -> int:
+    """Estimate the number of rooms a description mentions."""
+    return sum(_count(match.group(1)) for match in ROOM_PATTERN.finditer(text))
+
+
+def estimate_complexity(text: str) -> float:
+    """
+    Score how large a layout a description asks for.
+
+    The score is the number of rooms mentioned plus `FLOOR_WEIGHT` for
+    every floor beyond the first.
+    """
+    return count_rooms(text) + FLOOR_WEIGHT * (count_floors(text) - 1)
+
+
+class ModelRouter:
+    """
+    Policy choosing a model per description, with escalation.
+
+    `models` is a ladder from fastest to strongest. A description with a
+    complexity up to `thresholds[i]` starts at model i, and more complex
+    ones start at the last model.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str] = DEFAULT_MODELS,
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+        max_escalations: int = 2,
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            models: Model names from fastest and cheapest to strongest.
+            thresholds: Highest complexity routed to each model but the last;
+                        one fewer than `models`, in increasing order.
+            max_escalations: Maximum number of stronger models to retry with
+                             when an output does not parse.
+        """
+        if not models:
+            raise ValueError("At least one model is required")
+        if len(thresholds) != len(models) - 1:
+            raise ValueError("thresholds must have one value fewer than models")
+
+        self.models = list(models)
+        self.thresholds = list(thresholds)
+        self.max_escalations = max_escalations
+
+    def select(self, text: str) -> str:
+        """Get the model a description starts at."""
+        return self.candidates(text)[0]
+
+    def candidates(self, text: str) -> List[str]:
+        """
+        Get the models to try for a description, in order.
+
+        Returns:
+            The starting model followed by up to `max_escalations` stronger
+            models.
+        """
+        complexity = estimate_complexity(text)
+        start = next(
+            (i for i, threshold in enumerate(self.thresholds) if complexity <= threshold),
+            len(self.models) - 1,
+        )
+        return self.models[start:start + 1 + self.max_escalations]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the model a description would be routed to")
+    parser.add_argument("--text", type=str, help="Text description of the scene")
+    parser.add_argument("--text-file", type=str, help="File containing text description")
+
+    args = parser.parse_args()
+
+    if args.text_file:
+        with open(args.text_file, "r") as f:
+            text = f.read()
+    else:
+        text = args.text or ""
+
+    router = ModelRouter()
+    print(f"Floors: {count_floors(text)}, rooms: {count_rooms(text)}, complexity: {estimate_complexity(text)}")
+    print(f"Models: {' -> '.join(router.candidates(text))}")
+
+
+if __name__ == "__main__":
+    main()
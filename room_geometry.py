@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Room Extraction and Space Analytics for Arc LLM
+
+This module recovers room polygons from the walls of a layout by treating
+each floor's walls as a planar graph and tracing its faces. The rooms can
+then be measured (area, perimeter, volume) and the objects of the layout
+assigned to the room containing them, all with vectorized NumPy code.
+
+Polygons follow wall centerlines, so areas include half of each bounding
+wall's thickness.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+
+from layout_geometry import floor_index, floor_levels
+
+
+class Room:
+    """A room polygon traced from the walls of one floor."""
+
+    def __init__(
+        self,
+        index: int,
+        floor: int,
+        elevation: float,
+        polygon: np.ndarray,
+        height: float,
+        wall_ids: List[int],
+    ):
+        """
+        Initialize a room.
+
+        Args:
+            index: Index of the room within the layout.
+            floor: Index of the floor the room is on.
+            elevation: Base height of the floor in meters.
+            polygon: Counter-clockwise XY corners, shape (N, 2).
+            height: Height of the room, taken from its tallest bounding wall.
+            wall_ids: IDs of the walls bounding the room.
+        """
+        self.index = index
+        self.floor = floor
+        self.elevation = elevation
+        self.polygon = polygon
+        self.height = height
+        self.wall_ids = wall_ids
+        self.area = 0.0
+        self.perimeter = 0.0
+
+    @property
+    def volume(self) -> float:
+        """Volume of the room in cubic meters."""
+        return self.area * self.height
+
+
+def polygon_metrics(polygons: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the signed areas and perimeters of many polygons at once.
+
+    Args:
+        polygons: Polygons as (N, 2) corner arrays.
+
+    Returns:
+        Tuple of signed areas (positive for counter-clockwise polygons) and
+        perimeters, one entry per polygon.
+    """
+    if not polygons:
+        return np.zeros(0), np.zeros(0)
+    points = np.concatenate(polygons)
+    following = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in polygons])
+    starts = np.cumsum([0] + [len(polygon) for polygon in polygons[:-1]])
+
+    cross = points[:, 0] * following[:, 1] - following[:, 0] * points[:, 1]
+    lengths = np.hypot(*(following - points).T)
+    return 0.5 * np.add.reduceat(cross, starts), np.add.reduceat(lengths, starts)
+
+
+def _candidate_pairs(segments: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the pairs of segments that may touch, using a uniform grid.
+
+    Cells are about as long as a typical segment, so each segment covers a
+    few cells and only segments sharing a cell are paired.
+
+    Returns:
+        Arrays I and J of segment indices with I < J, without duplicates.
+    """
+    starts, ends = segments[:, :2], segments[:, 2:]
+    lengths = np.hypot(*(ends - starts).T)
+    cell = max(float(np.median(lengths)), 10 * tolerance)
+
+    low = np.floor((np.minimum(starts, ends) - tolerance) / cell).astype(np.int64)
+    high = np.floor((np.maximum(starts, ends) + tolerance) / cell).astype(np.int64)
+    grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for i, (lx, ly, hx, hy) in enumerate(np.hstack([low, high]).tolist()):
+        for cx in range(lx, hx + 1):
+            for cy in range(ly, hy + 1):
+                grid[(cx, cy)].append(i)
+
+    firsts, seconds = [], []
+    for members in grid.values():
+        if len(members) < 2:
+            continue
+        members = np.array(members)
+        a, b = np.triu_indices(len(members), k=1)
+        firsts.append(members[a])
+        seconds.append(members[b])
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Segments sharing several cells are paired once
+    keys = np.unique(np.concatenate(firsts) * len(segments) + np.concatenate(seconds))
+    return keys // len(segments), keys % len(segments)
+
+
+def split_segments(segments: np.ndarray, tolerance: float = 0.05) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split segments wherever they cross or touch another segment.
+
+    Candidate pairs come from a uniform grid (see `_candidate_pairs`); the
+    touch and crossing tests then run over all pairs at once.
+
+    Args:
+        segments: Array of shape (N, 4) with rows (ax, ay, bx, by).
+        tolerance: Distance in meters within which points count as touching.
+
+    Returns:
+        Tuple of piece start points (M, 2), end points (M, 2) and the index
+        of the segment each piece came from (M,).
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    count = len(segments)
+    starts, ends = segments[:, :2], segments[:, 2:]
+    directions = ends - starts
+    lengths = np.hypot(*directions.T)
+    I, J = _candidate_pairs(segments, tolerance) if count else (np.zeros(0, int), np.zeros(0, int))
+
+    # Every segment is cut at its own ends
+    cut_segments = [np.arange(count), np.arange(count)]
+    cut_params = [np.zeros(count), np.ones(count)]
+
+    def cut_at(target: np.ndarray, points: np.ndarray) -> None:
+        """Cut the target segments at the points lying inside them."""
+        d = directions[target]
+        length = lengths[target]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.einsum("ij,ij->i", points - starts[target], d) / length ** 2
+        closest = starts[target] + t[:, np.newaxis] * d
+        keep = (
+            (length > 0)
+            & (t * length > tolerance)
+            & ((1 - t) * length > tolerance)
+            & (np.hypot(*(closest - points).T) <= tolerance)
+        )
+        cut_segments.append(target[keep])
+        cut_params.append(t[keep])
+
+    # Endpoints touching the other segment (T-junctions, overlaps)
+    for target, other in ((I, J), (J, I)):
+        cut_at(target, starts[other])
+        cut_at(target, ends[other])
+
+    # Proper crossings
+    r, s = directions[I], directions[J]
+    q = starts[J] - starts[I]
+    denom = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (q[:, 0] * s[:, 1] - q[:, 1] * s[:, 0]) / denom
+        u = (q[:, 0] * r[:, 1] - q[:, 1] * r[:, 0]) / denom
+    crossing = (np.abs(denom) > 1e-12) & (t > 0) & (t < 1) & (u > 0) & (u < 1)
+    points = starts[I[crossing]] + t[crossing, np.newaxis] * r[crossing]
+    cut_at(I[crossing], points)
+    cut_at(J[crossing], points)
+
+    # Consecutive cuts along the same segment bound one piece
+    segment_ids = np.concatenate(cut_segments)
+    params = np.concatenate(cut_params)
+    order = np.lexsort((params, segment_ids))
+    segment_ids, params = segment_ids[order], params[order]
+    same = (segment_ids[1:] == segment_ids[:-1]) & (params[1:] > params[:-1])
+    pieces = segment_ids[:-1][same]
+    piece_starts = starts[pieces] + params[:-1][same, np.newaxis] * directions[pieces]
+    piece_ends = starts[pieces] + params[1:][same, np.newaxis] * directions[pieces]
+    return piece_starts, piece_ends, pieces
+
+
+def trace_faces(
+    segments: np.ndarray,
+    tolerance: float = 0.05,
+    min_area: float = 0.5,
+) -> List[Tuple[np.ndarray, List[int]]]:
+    """
+    Find the bounded faces of the planar graph formed by segments.
+
+    Segments are split at their intersections, endpoints within the
+    tolerance are merged into graph vertices, and the half-edges around each
+    vertex are sorted by angle. Following, from each half-edge, the next
+    half-edge clockwise at its end vertex walks each face once with the face
+    on its left, in O(n log n) time overall.
+
+    Args:
+        segments: Array of shape (N, 4) with rows (ax, ay, bx, by).
+        tolerance: Distance in meters within which points are merged.
+        min_area: Faces smaller than this (in square meters) are dropped.
+
+    Returns:
+        List of (polygon, segment indices) pairs, one per bounded face, with
+        counter-clockwise (N, 2) polygons.
+    """
+    piece_starts, piece_ends, pieces = split_segments(segments, tolerance)
+    if not len(pieces):
+        return []
+
+    # Points within the tolerance grid cell become one vertex
+    keys = np.round(np.vstack([piece_starts, piece_ends]) / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    coords = np.vstack([piece_starts, piece_ends])[first]
+    inverse = inverse.reshape(-1)
+    u_ids, v_ids = inverse[:len(pieces)], inverse[len(pieces):]
+
+    # Undirected edges, deduplicated so overlapping walls give one edge
+    edges: Dict[Tuple[int, int], int] = {}
+    for u, v, segment in zip(u_ids.tolist(), v_ids.tolist(), pieces.tolist()):
+        if u != v:
+            edges.setdefault((min(u, v), max(u, v)), segment)
+
+    if not edges:
+        return []
+
+    # Outgoing half-edges of every vertex, sorted counter-clockwise
+    outgoing: Dict[int, List[int]] = defaultdict(list)
+    for u, v in edges:
+        outgoing[u].append(v)
+        outgoing[v].append(u)
+    position: Dict[Tuple[int, int], int] = {}
+    for u, neighbours in outgoing.items():
+        delta = coords[neighbours] - coords[u]
+        order = np.argsort(np.arctan2(delta[:, 1], delta[:, 0]), kind="stable")
+        outgoing[u] = [neighbours[k] for k in order]
+        for k, v in enumerate(outgoing[u]):
+            position[(u, v)] = k
+
+    visited = set()
+    faces = []
+    for u, v in position:
+        if (u, v) in visited:
+            continue
+        cycle = []
+        a, b = u, v
+        while (a, b) not in visited:
+            visited.add((a, b))
+            cycle.append((a, b))
+            # Next edge: the one just clockwise of the way back at b
+            around = outgoing[b]
+            b, a = around[(position[(b, a)] - 1) % len(around)], b
+        faces.append(cycle)
+
+    polygons = [coords[[a for a, _ in cycle]] for cycle in faces]
+    areas, _ = polygon_metrics(polygons)
+    result = []
+    for cycle, polygon, area in zip(faces, polygons, areas):
+        # The unbounded face around each connected component runs clockwise
+        if area < min_area:
+            continue
+        segment_ids = sorted({edges[(min(a, b), max(a, b))] for a, b in cycle})
+        result.append((polygon, segment_ids))
+    return result
+
+
+def extract_rooms(
+    layout: Union[Layout, str],
+    tolerance: float = 0.05,
+    min_area: float = 0.5,
+) -> List[Room]:
+    """
+    Extract the room polygons of every floor of a layout.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        tolerance: Distance in meters within which wall endpoints meet.
+        min_area: Rooms smaller than this (in square meters) are dropped.
+
+    Returns:
+        Rooms of all floors, ordered by floor.
+    """
+    if isinstance(layout, str):
+        layout = Layout(layout)
+
+    levels = floor_levels(layout)
+    walls_by_floor: Dict[int, List] = defaultdict(list)
+    for wall in layout.walls:
+        walls_by_floor[floor_index(levels, min(wall.az, wall.bz))].append(wall)
+
+    rooms: List[Room] = []
+    for floor in sorted(walls_by_floor):
+        walls = walls_by_floor[floor]
+        segments = np.array([[w.ax, w.ay, w.bx, w.by] for w in walls], dtype=np.float64)
+        for polygon, segment_ids in trace_faces(segments, tolerance, min_area):
+            bounding = [walls[i] for i in segment_ids]
+            rooms.append(Room(
+                index=len(rooms),
+                floor=floor,
+                elevation=levels[floor],
+                polygon=polygon,
+                height=max(wall.height for wall in bounding),
+                wall_ids=[wall.id for wall in bounding],
+            ))
+
+    areas, perimeters = polygon_metrics([room.polygon for room in rooms])
+    for room, area, perimeter in zip(rooms, areas, perimeters):
+        room.area = float(area)
+        room.perimeter = float(perimeter)
+    return rooms
+
+
+def points_in_polygons(
+    points: np.ndarray,
+    polygons: List[np.ndarray],
+    chunk_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Test many points against many polygons with the even-odd rule.
+
+    Points are sorted by x once, so each polygon only tests the points
+    inside its bounding box, found with a binary search on x and a filter
+    on y. Those points are tested against the polygon's edges in a single
+    broadcast, in chunks of points to bound memory use.
+
+    Args:
+        points: Array of shape (M, 2).
+        polygons: Polygons as (N, 2) corner arrays.
+        chunk_size: Number of points tested per broadcast; by default
+                    chosen to keep each broadcast around 4M elements.
+
+    Returns:
+        Boolean array of shape (M, len(polygons)).
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    inside = np.zeros((len(points), len(polygons)), dtype=bool)
+    if not polygons or not len(points):
+        return inside
+
+    order = np.argsort(points[:, 0], kind="stable")
+    sorted_x = points[order, 0]
+    for index, polygon in enumerate(polygons):
+        low, high = polygon.min(axis=0), polygon.max(axis=0)
+        candidates = order[
+            np.searchsorted(sorted_x, low[0], side="left"):np.searchsorted(sorted_x, high[0], side="right")
+        ]
+        y = points[candidates, 1]
+        candidates = candidates[(y >= low[1]) & (y <= high[1])]
+        if not len(candidates):
+            continue
+
+        a = polygon
+        b = np.roll(polygon, -1, axis=0)
+        step = chunk_size or max(1, (1 << 22) // len(a))
+        for first in range(0, len(candidates), step):
+            chunk = candidates[first:first + step]
+            x = points[chunk, 0:1]
+            y = points[chunk, 1:2]
+            # Edges straddling the point's horizontal line, crossed to its right
+            straddles = (a[:, 1] > y) != (b[:, 1] > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+            crossings = straddles & (x < crossing_x)
+            inside[chunk, index] = np.count_nonzero(crossings, axis=1) % 2 == 1
+    return inside
+
+
+def assign_bboxes(layout: Layout, rooms: List[Room]) -> np.ndarray:
+    """
+    Find the room containing each object of a layout.
+
+    An object belongs to the smallest room on its floor that contains its
+    center, so objects in a room nested inside another go to the inner one.
+
+    Args:
+        layout: Layout whose bboxes are assigned.
+        rooms: Rooms extracted from the same layout.
+
+    Returns:
+        Array with the index of each bbox's room, or -1 where no room
+        contains it.
+    """
+    assignment = np.full(len(layout.bboxes), -1, dtype=np.int64)
+    if not layout.bboxes or not rooms:
+        return assignment
+
+    levels = floor_levels(layout)
+    centers = np.array([[b.position_x, b.position_y] for b in layout.bboxes], dtype=np.float64)
+    floors = np.array([floor_index(levels, b.position_z) for b in layout.bboxes])
+    inside = points_in_polygons(centers, [room.polygon for room in rooms])
+
+    room_floors = np.array([room.floor for room in rooms])
+    inside &= floors[:, np.newaxis] == room_floors[np.newaxis, :]
+    areas = np.array([room.area for room in rooms])
+    candidates = np.where(inside, areas[np.newaxis, :], np.inf)
+    best = np.argmin(candidates, axis=1)
+    contained = inside.any(axis=1)
+    assignment[contained] = best[contained]
+    return assignment
+
+
+def room_report(
+    layout: Union[Layout, str],
+    tolerance: float = 0.05,
+    min_area: float = 0.5,
+) -> List[Dict]:
+    """
+    Measure every room of a layout and list the objects it contains.
+
+    Args:
+        layout: Layout or layout string in SpatialLM format.
+        tolerance: Distance in meters within which wall endpoints meet.
+        min_area: Rooms smaller than this (in square meters) are dropped.
+
+    Returns:
+        One dictionary per room with its floor, area, perimeter, height,
+        volume, polygon, bounding wall IDs and contained object classes.
+    """
+    if isinstance(layout, str):
+        layout = Layout(layout)
+    rooms = extract_rooms(layout, tolerance, min_area)
+    assignment = assign_bboxes(layout, rooms)
+
+    objects: Dict[int, List[str]] = defaultdict(list)
+    for bbox, room_index in zip(layout.bboxes, assignment):
+        if room_index >= 0:
+            objects[int(room_index)].append(bbox.class_name)
+
+    return [
+        {
+            "room": room.index,
+            "floor": room.floor,
+            "area": round(room.area, 3),
+            "perimeter": round(room.perimeter, 3),
+            "height": room.height,
+            "volume": round(room.volume, 3),
+            "polygon": room.polygon.round(3).tolist(),
+            "walls": room.wall_ids,
+            "objects": objects[room.index],
+        }
+        for room in rooms
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and measure the rooms of a SpatialLM layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Distance within which wall endpoints meet")
+    parser.add_argument("--min-area", type=float, default=0.5, help="Smallest room area in square meters")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout_str = f.read()
+
+    report = room_report(layout_str, tolerance=args.tolerance, min_area=args.min_area)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for room in report:
+        print(
+            f"room {room['room']} on floor {room['floor']}: "
+            f"area {room['area']:.2f} m2, perimeter {room['perimeter']:.2f} m, "
+            f"volume {room['volume']:.2f} m3, {len(room['objects'])} objects"
+        )
+    print(f"Total area: {sum(room['area'] for room in report):.2f} m2")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Near-Duplicate Description Cache for Arc LLM
+
+This module caches generated structured descriptions keyed by the similarity
+of the text that produced them. Descriptions are reduced to word shingles,
+summarized with MinHash signatures and indexed with locality-sensitive
+hashing (LSH), so lookups only compare against a handful of candidates no
+matter how many entries are cached. Numbers, counts and directions must
+match exactly, since changing one of them changes the building even though
+the texts stay similar.
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Mersenne prime modulus for the universal hash family; every product of a
+# coefficient (< 2^31) and a 32-bit shingle hash fits in 64 bits
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+# Words that change a layout however similar the rest of the text is
+SPECIFIC_WORDS = (
+    r"\d+(?:\.\d+)?|single|double|triple|one|two|three|four|five|six|seven|eight|nine|ten"
+    r"|eleven|twelve|first|second|third|fourth|fifth|north|south|east|west"
+    r"|northeast|northwest|southeast|southwest|left|right"
+)
+SPECIFIC_PATTERN = re.compile(rf"\b(?:{SPECIFIC_WORDS})\b")
+
+
+def specifics(text: str) -> Tuple[str, ...]:
+    """
+    Extract the numbers, count words and directions of a text, in order.
+
+    Two texts only share a cache entry if these are identical, so "three
+    bedrooms" never answers "four bedrooms".
+    """
+    return tuple(SPECIFIC_PATTERN.findall(text.lower()))
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Split text into overlapping word n-grams after normalization.
+
+    Case, punctuation and whitespace are normalized away, so these changes do
+    not affect similarity.
+
+    Args:
+        text: Text to shingle.
+        size: Number of words per shingle.
+
+    Returns:
+        Set of shingles. Texts shorter than `size` words yield one shingle.
+    """
+    words = re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class SemanticCache:
+    """
+    Cache returning values stored for texts similar to the one looked up.
+
+    Similarity is the Jaccard similarity of the texts' shingle sets,
+    estimated from MinHash signatures. The LSH index uses `bands` bands of
+    `num_perm // bands` rows each. Only entries with the same `specifics`
+    as the looked up text can hit.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 3,
+        max_entries: Optional[int] = None,
+        seed: int = 1,
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            threshold: Minimum estimated similarity for a lookup to hit.
+            num_perm: Number of hash functions in each MinHash signature.
+            bands: Number of LSH bands; must divide num_perm.
+            shingle_size: Number of words per shingle.
+            max_entries: Optional maximum number of entries; the least
+                         recently used entries are evicted beyond it.
+            seed: Seed for the hash family, so signatures are reproducible.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        # Signatures of all entries, one row per slot
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self._free_slots: List[int] = []
+        self._next_slot = 0
+        # Slot -> cached value, in least recently used order
+        self._values: "OrderedDict[int, Any]" = OrderedDict()
+        # Slot -> numbers, counts and directions of the cached text
+        self._specifics: Dict[int, Tuple[str, ...]] = {}
+        # One bucket table per band: band bytes -> slots
+        self._buckets: List[Dict[bytes, Set[int]]] = [{} for _ in range(bands)]
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text."""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        permuted = (self._a[:, np.newaxis] * hashes[np.newaxis, :] + self._b[:, np.newaxis]) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Split a signature into one hashable key per band."""
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, text: str) -> Tuple[Optional[Any], float]:
+        """
+        Find the cached value of the most similar text.
+
+        Args:
+            text: Text to look up.
+
+        Returns:
+            Tuple of the value (None on a miss) and its estimated similarity.
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        text_specifics = specifics(text)
+
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, key in enumerate(keys):
+                candidates.update(self._buckets[band].get(key, ()))
+            candidates = {slot for slot in candidates if self._specifics[slot] == text_specifics}
+            if not candidates:
+                return None, 0.0
+
+            slots = np.fromiter(candidates, dtype=np.int64)
+            similarity = (self._signatures[slots] == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                return None, float(similarity[best])
+
+            slot = int(slots[best])
+            self._values.move_to_end(slot)
+            return self._values[slot], float(similarity[best])
+
+    def get(self, text: str) -> Optional[Any]:
+        """Get the cached value for a similar text, or None on a miss."""
+        return self.lookup(text)[0]
+
+    def put(self, text: str, value: Any) -> None:
+        """
+        Cache a value for a text.
+
+        An entry with an identical signature and the same specifics, e.g.
+        from an earlier put of the same text, is overwritten in place, so
+        repeated puts do not push distinct entries out.
+
+        Args:
+            text: Text the value was generated from.
+            value: Value to return for similar texts.
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        text_specifics = specifics(text)
+
+        with self._lock:
+            # Identical signatures share every band key, so one band suffices
+            for slot in self._buckets[0].get(keys[0], ()):
+                if self._specifics[slot] == text_specifics and np.array_equal(self._signatures[slot], signature):
+                    self._values[slot] = value
+                    self._values.move_to_end(slot)
+                    return
+
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = self._next_slot
+                self._next_slot += 1
+                if slot >= len(self._signatures):
+                    grown = np.zeros((2 * len(self._signatures), self.num_perm), dtype=np.uint32)
+                    grown[:len(self._signatures)] = self._signatures
+                    self._signatures = grown
+
+            self._signatures[slot] = signature
+            self._values[slot] = value
+            self._specifics[slot] = text_specifics
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, set()).add(slot)
+
+            while self.max_entries is not None and len(self._values) > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entry. Caller holds the lock."""
+        slot, _ = self._values.popitem(last=False)
+        del self._specifics[slot]
+        for band, key in enumerate(self._band_keys(self._signatures[slot])):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del self._buckets[band][key]
+        self._free_slots.append(slot)
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -5,9 +5,9 @@ This module provides a simplified version of the SpatialLM Layout class
 that doesn't require torchsparse or other point cloud processing dependencies.
 """
 
+import io
+
 import numpy as np
-import rerun as rr
-import rerun.blueprint as rrb
 
 
 class Wall:
@@ -66,6 +66,148 @@ class Bbox:
         self.scale_z = scale_z
 
 
+def parse_layout_line(line):
+    """
+    Parse one line of a layout string.
+
+    Args:
+        line: A line such as `wall_0=Wall(0.0,0.0,0.0,5.0,0.0,0.0,2.8,0.2)`.
+
+    Returns:
+        The Wall, Door, Window or Bbox it describes, or None for comments,
+        blank lines and unknown or incomplete entities.
+    """
+    line = line.strip()
+    if not line or line.startswith('#') or '=' not in line:
+        return None
+    
+    entity_id, entity_str = line.split('=', 1)
+    entity_id = entity_id.strip()
+    entity_type = entity_id.split('_')[0]
+    
+    if entity_type == 'wall':
+        # Example: Wall(0.0,0.0,0.0,5.0,0.0,0.0,2.8,0.2)
+        params = entity_str.strip('Wall()').split(',')
+        if len(params) >= 8:
+            return Wall(
+                id=int(entity_id.split('_')[1]),
+                ax=float(params[0]),
+                ay=float(params[1]),
+                az=float(params[2]),
+                bx=float(params[3]),
+                by=float(params[4]),
+                bz=float(params[5]),
+                height=float(params[6]),
+                thickness=float(params[7]),
+            )
+        
+    elif entity_type in ('door', 'window'):
+        # Example: Door(wall_0,2.5,0.0,0.0,1.0,2.0)
+        entity_class = Door if entity_type == 'door' else Window
+        params = entity_str.strip(f'{entity_class.__name__}()').split(',')
+        if len(params) >= 6:
+            return entity_class(
+                id=int(entity_id.split('_')[1]),
+                wall_id=int(params[0].split('_')[1]),
+                position_x=float(params[1]),
+                position_y=float(params[2]),
+                position_z=float(params[3]),
+                width=float(params[4]),
+                height=float(params[5]),
+            )
+        
+    elif entity_type == 'bbox':
+        # Example: Bbox(sofa,2.5,0.5,0.0,0.0,2.0,0.8,0.8)
+        params = entity_str.strip('Bbox()').split(',')
+        if len(params) >= 8:
+            return Bbox(
+                id=int(entity_id.split('_')[1]),
+                class_name=params[0],
+                position_x=float(params[1]),
+                position_y=float(params[2]),
+                position_z=float(params[3]),
+                angle_z=float(params[4]),
+                scale_x=float(params[5]),
+                scale_y=float(params[6]),
+                scale_z=float(params[7]),
+            )
+    return None
+
+
+def iter_layout_entities(fp):
+    """
+    Lazily parse the entities of a layout file.
+
+    Lines are read one at a time, so memory use does not grow with the size
+    of the file.
+
+    Args:
+        fp: A text file object, or any iterable of lines.
+
+    Yields:
+        Wall, Door, Window and Bbox entities in file order.
+    """
+    for line in fp:
+        entity = parse_layout_line(line)
+        if entity is not None:
+            yield entity
+
+
+def iter_layout_lines(layout):
+    """
+    Yield the language string lines of a layout one entity at a time.
+
+    Works with any layout that has `walls`, `doors`, `windows` and `bboxes`
+    lists, including SpatialLM's own Layout.
+    """
+    for wall in layout.walls:
+        yield f"wall_{wall.id}=Wall({wall.ax},{wall.ay},{wall.az},{wall.bx},{wall.by},{wall.bz},{wall.height},{wall.thickness})"
+    for door in layout.doors:
+        yield f"door_{door.id}=Door(wall_{door.wall_id},{door.position_x},{door.position_y},{door.position_z},{door.width},{door.height})"
+    for window in layout.windows:
+        yield f"window_{window.id}=Window(wall_{window.wall_id},{window.position_x},{window.position_y},{window.position_z},{window.width},{window.height})"
+    for bbox in layout.bboxes:
+        yield f"bbox_{bbox.id}=Bbox({bbox.class_name},{bbox.position_x},{bbox.position_y},{bbox.position_z},{bbox.angle_z},{bbox.scale_x},{bbox.scale_y},{bbox.scale_z})"
+
+
+def write_layout(layout, fp):
+    """
+    Write the language string of a layout to a file object line by line.
+
+    The output is identical to `to_language_string`, without a trailing
+    newline.
+
+    Returns:
+        Number of lines written.
+    """
+    count = 0
+    for line in iter_layout_lines(layout):
+        fp.write(f"\n{line}" if count else line)
+        count += 1
+    return count
+
+
+def read_layout(fp, layout=None):
+    """
+    Fill a layout from a file object, parsing it line by line.
+
+    Args:
+        fp: A text file object, or any iterable of lines.
+        layout: Layout to fill, e.g. an empty SpatialLM Layout; a new
+                simplified Layout if None. Its entity lists are replaced.
+
+    Returns:
+        The filled layout.
+    """
+    if layout is None:
+        layout = Layout()
+    layout.walls, layout.doors, layout.windows, layout.bboxes = [], [], [], []
+    targets = {Wall: layout.walls, Door: layout.doors, Window: layout.windows, Bbox: layout.bboxes}
+    for entity in iter_layout_entities(fp):
+        targets[type(entity)].append(entity)
+    return layout
+
+
 class Layout:
     """Layout class for SpatialLM."""
     
@@ -81,110 +223,30 @@ class Layout:
     
     def _parse_layout_str(self, layout_str):
         """Parse layout string."""
-        lines = layout_str.strip().split('\n')
-        
-        for line in lines:
-            if not line or line.startswith('#'):
-                continue
-                
-            if '=' not in line:
-                continue
-                
-            entity_id, entity_str = line.split('=', 1)
-            entity_id = entity_id.strip()
-            entity_type = entity_id.split('_')[0]
-            
-            if entity_type == 'wall':
-                # Parse wall
-                # Example: Wall(0.0,0.0,0.0,5.0,0.0,0.0,2.8,0.2)
-                params = entity_str.strip('Wall()').split(',')
-                if len(params) >= 8:
-                    wall = Wall(
-                        id=int(entity_id.split('_')[1]),
-                        ax=float(params[0]),
-                        ay=float(params[1]),
-                        az=float(params[2]),
-                        bx=float(params[3]),
-                        by=float(params[4]),
-                        bz=float(params[5]),
-                        height=float(params[6]),
-                        thickness=float(params[7]),
-                    )
-                    self.walls.append(wall)
-            
-            elif entity_type == 'door':
-                # Parse door
-                # Example: Door(wall_0,2.5,0.0,0.0,1.0,2.0)
-                params = entity_str.strip('Door()').split(',')
-                if len(params) >= 6:
-                    wall_id = int(params[0].split('_')[1])
-                    door = Door(
-                        id=int(entity_id.split('_')[1]),
-                        wall_id=wall_id,
-                        position_x=float(params[1]),
-                        position_y=float(params[2]),
-                        position_z=float(params[3]),
-                        width=float(params[4]),
-                        height=float(params[5]),
-                    )
-                    self.doors.append(door)
-            
-            elif entity_type == 'window':
-                # Parse window
-                # Example: Window(wall_1,2.5,0.0,1.0,1.5,1.0)
-                params = entity_str.strip('Window()').split(',')
-                if len(params) >= 6:
-                    wall_id = int(params[0].split('_')[1])
-                    window = Window(
-                        id=int(entity_id.split('_')[1]),
-                        wall_id=wall_id,
-                        position_x=float(params[1]),
-                        position_y=float(params[2]),
-                        position_z=float(params[3]),
-                        width=float(params[4]),
-                        height=float(params[5]),
-                    )
-                    self.windows.append(window)
-            
-            elif entity_type == 'bbox':
-                # Parse bbox
-                # Example: Bbox(sofa,2.5,0.5,0.0,0.0,2.0,0.8,0.8)
-                params = entity_str.strip('Bbox()').split(',')
-                if len(params) >= 8:
-                    bbox = Bbox(
-                        id=int(entity_id.split('_')[1]),
-                        class_name=params[0],
-                        position_x=float(params[1]),
-                        position_y=float(params[2]),
-                        position_z=float(params[3]),
-                        angle_z=float(params[4]),
-                        scale_x=float(params[5]),
-                        scale_y=float(params[6]),
-                        scale_z=float(params[7]),
-                    )
-                    self.bboxes.append(bbox)
+        # Iterating a StringIO walks the lines without splitting a copy
+        read_layout(io.StringIO(layout_str), self)
+    
+    @classmethod
+    def read(cls, fp):
+        """Build a layout from a file object, parsing it line by line."""
+        return read_layout(fp, cls())
+    
+    @staticmethod
+    def iter_entities(fp):
+        """Lazily parse the entities of a layout file object (see `iter_layout_entities`)."""
+        return iter_layout_entities(fp)
+    
+    def iter_lines(self):
+        """Yield the lines of the language string one entity at a time."""
+        return iter_layout_lines(self)
+    
+    def write(self, fp):
+        """Write the language string to a file object without building it in memory."""
+        return write_layout(self, fp)
     
     def to_language_string(self):
         """Convert layout to language string."""
-        lines = []
-        
-        # Add walls
-        for wall in self.walls:
-            lines.append(f"wall_{wall.id}=Wall({wall.ax},{wall.ay},{wall.az},{wall.bx},{wall.by},{wall.bz},{wall.height},{wall.thickness})")
-        
-        # Add doors
-        for door in self.doors:
-            lines.append(f"door_{door.id}=Door(wall_{door.wall_id},{door.position_x},{door.position_y},{door.position_z},{door.width},{door.height})")
-        
-        # Add windows
-        for window in self.windows:
-            lines.append(f"window_{window.id}=Window(wall_{window.wall_id},{window.position_x},{window.position_y},{window.position_z},{window.width},{window.height})")
-        
-        # Add bboxes
-        for bbox in self.bboxes:
-            lines.append(f"bbox_{bbox.id}=Bbox({bbox.class_name},{bbox.position_x},{bbox.position_y},{bbox.position_z},{bbox.angle_z},{bbox.scale_x},{bbox.scale_y},{bbox.scale_z})")
-        
-        return '\n'.join(lines)
+        return '\n'.join(self.iter_lines())
     
     def to_boxes(self):
         """Convert layout to boxes for visualization."""
@@ -298,6 +360,10 @@ class Layout:
 
 def visualize_layout(layout_str, output_file=None):
     """Visualize layout using rerun."""
+    # Imported lazily so the layout classes can be used without rerun
+    import rerun as rr
+    import rerun.blueprint as rrb
+
     # Parse layout
     layout = Layout(layout_str)
     floor_plan = layout.to_boxes()
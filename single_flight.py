@@ -0,0 +1,119 @@
+"""
+Request Coalescing for Arc LLM
+
+This module provides a single-flight helper: concurrent calls that share a key
+run the underlying function once, and every caller receives its result (or
+its exception). It works from threads and from asyncio coroutines alike.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+
+
+def description_key(text: str, *options: Any) -> str:
+    """
+    Build a coalescing key from a text description.
+
+    Case and whitespace differences are normalized away, so trivially
+    different submissions of the same description share a key.
+
+    Args:
+        text: Text description of the scene.
+        options: Extra values that change the result, such as generation
+                 flags, and so must be part of the key.
+
+    Returns:
+        Hex digest identifying the request.
+    """
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    payload = "\x00".join([normalized] + [repr(option) for option in options])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Only calls that overlap in time are coalesced; once a call finishes, the
+    next call with its key runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def _join(self, key: str):
+        """Get the in-flight future for a key and whether the caller leads it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _run(self, key: str, future: Future, fn: Callable, args, kwargs) -> None:
+        """Run the function for a key and publish its outcome to all waiters."""
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call with this key is currently running."""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Call fn, or wait for the identical call already in flight.
+
+        Args:
+            key: Key identifying identical calls.
+            fn: Function to call.
+            args: Positional arguments for fn.
+            kwargs: Keyword arguments for fn.
+
+        Returns:
+            The result of the shared call.
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, args, kwargs)
+        return future.result()
+
+    async def do_async(
+        self,
+        key: str,
+        fn: Callable,
+        *args,
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Awaitable version of `do`; the function runs in an executor thread.
+
+        Async and threaded callers share the same in-flight calls.
+
+        Args:
+            key: Key identifying identical calls.
+            fn: Blocking function to call.
+            args: Positional arguments for fn.
+            executor: Executor to run fn in; the loop's default if None.
+            kwargs: Keyword arguments for fn.
+
+        Returns:
+            The result of the shared call.
+        """
+        future, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(executor, self._run, key, future, fn, args, kwargs)
+        return await asyncio.wrap_future(future)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Local Template Router for Arc LLM
+
+This module recognizes simple single-room descriptions, such as "a 5x5 room
+with a sofa and a window on the east wall", and writes the structured layout
+description for them directly, without calling the Claude API. Anything it
+does not fully understand is left to the LLM.
+"""
+
+import argparse
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Default (width, depth, height) in meters of the furniture the router knows
+FURNITURE_SIZES = {
+    "sofa": (2.0, 0.9, 0.8),
+    "couch": (2.0, 0.9, 0.8),
+    "armchair": (0.9, 0.9, 0.9),
+    "chair": (0.5, 0.5, 0.9),
+    "coffee table": (1.2, 0.6, 0.45),
+    "dining table": (1.8, 1.0, 0.75),
+    "table": (1.2, 0.8, 0.75),
+    "desk": (1.4, 0.7, 0.75),
+    "bed": (2.0, 1.6, 0.5),
+    "nightstand": (0.5, 0.4, 0.55),
+    "wardrobe": (1.5, 0.6, 2.0),
+    "dresser": (1.2, 0.5, 0.9),
+    "bookshelf": (1.0, 0.35, 1.8),
+    "tv": (1.5, 0.2, 0.8),
+    "tv stand": (1.6, 0.45, 0.5),
+    "lamp": (0.4, 0.4, 1.6),
+    "rug": (2.0, 1.4, 0.02),
+    "plant": (0.5, 0.5, 1.2),
+}
+
+# Walls are numbered south, east, north, west: (start, end) as room fractions
+CARDINAL_WALLS = {
+    "south": (0, (0.0, 0.0), (1.0, 0.0)),
+    "east": (1, (1.0, 0.0), (1.0, 1.0)),
+    "north": (2, (1.0, 1.0), (0.0, 1.0)),
+    "west": (3, (0.0, 1.0), (0.0, 0.0)),
+}
+
+# Angle that turns an object's width along each wall, facing into the room
+WALL_ANGLES = {"south": 0.0, "east": 1.57, "north": 3.14, "west": 4.71}
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+
+# Words that may remain once every recognized phrase has been removed
+FILLER_WORDS = {
+    "a", "an", "the", "with", "and", "room", "of", "in", "on", "there", "is",
+    "are", "has", "have", "it", "its", "which", "that", "contains", "containing",
+    "plus", "also", "simple", "small", "large", "big", "rectangular", "square",
+    "space", "some", "living", "bedroom", "office", "study", "den", "lounge",
+    "dining", "guest", "meters", "meter", "metres", "metre", "m",
+    "measuring", "size", "sized", "about", "approximately", "roughly",
+}
+
+ROOM_TYPES = ["living room", "dining room", "guest room", "bedroom", "office", "study", "den", "lounge"]
+
+NUMBER = r"(\d+(?:\.\d+)?)"
+UNIT = r"(?:\s*(?:meters?|metres?|m)\b)?"
+DIMENSIONS_PATTERN = re.compile(
+    rf"{NUMBER}{UNIT}\s*(?:x|by|×)\s*{NUMBER}{UNIT}", re.IGNORECASE
+)
+COUNT = r"(?:(a|an|one|two|three|four|five|six|\d+)\s+)?"
+DIRECTION = r"(north|south|east|west)(?:ern)?"
+OPENING_PATTERN = re.compile(
+    rf"\b{COUNT}(door|window)s?\s+(?:on|in)\s+the\s+{DIRECTION}\s+wall\b", re.IGNORECASE
+)
+_FURNITURE_NAMES = "|".join(
+    re.escape(name) for name in sorted(FURNITURE_SIZES, key=len, reverse=True)
+)
+FURNITURE_PATTERN = re.compile(
+    rf"\b{COUNT}({_FURNITURE_NAMES})(?:e?s)?\b"
+    rf"(?:\s+(?:against|along|on|by|facing|next\s+to)\s+the\s+{DIRECTION}\s+wall"
+    rf"|\s+in\s+the\s+(?:center|centre|middle)(?:\s+of\s+the\s+room)?)?",
+    re.IGNORECASE,
+)
+
+
+def _count(word: Optional[str]) -> int:
+    """Convert a count word or number to an integer (1 if absent)."""
+    if not word:
+        return 1
+    word = word.lower()
+    return NUMBER_WORDS.get(word) or int(word)
+
+
+def _fmt(value: float) -> str:
+    """Format a coordinate compactly."""
+    return f"{round(value, 3):g}"
+
+
+def route_simple_description(text: str) -> Optional[str]:
+    """
+    Write the structured description for a simple single-room text.
+
+    Only rectangular rooms with explicit dimensions, known furniture and
+    doors or windows on cardinal walls are handled. If any part of the text
+    is not recognized, None is returned so the caller falls back to the LLM.
+
+    Args:
+        text: Text description of the scene.
+
+    Returns:
+        Structured layout description, or None if the text is not simple.
+    """
+    dimensions = DIMENSIONS_PATTERN.findall(text)
+    if len(dimensions) != 1:
+        return None
+    width, length = float(dimensions[0][0]), float(dimensions[0][1])
+    if not (0 < width <= 50 and 0 < length <= 50):
+        return None
+
+    remainder = DIMENSIONS_PATTERN.sub(" ", text)
+
+    openings: Dict[str, List[str]] = {}
+    for match in OPENING_PATTERN.finditer(remainder):
+        direction = match.group(3).lower()
+        openings.setdefault(direction, []).extend([match.group(2).lower()] * _count(match.group(1)))
+    remainder = OPENING_PATTERN.sub(" ", remainder)
+
+    placed: Dict[str, List[str]] = {}
+    for match in FURNITURE_PATTERN.finditer(remainder):
+        name = match.group(2).lower()
+        location = match.group(3).lower() if match.group(3) else "center"
+        placed.setdefault(location, []).extend([name] * _count(match.group(1)))
+    remainder = FURNITURE_PATTERN.sub(" ", remainder)
+
+    room_name = "room"
+    for room_type in ROOM_TYPES:
+        if re.search(rf"\b{room_type}\b", text, re.IGNORECASE):
+            room_name = room_type.replace(" ", "_")
+            break
+
+    # Anything left that is not filler means the text says more than we handle
+    leftover = re.findall(r"[a-z0-9]+", remainder.lower())
+    if any(word not in FILLER_WORDS for word in leftover):
+        return None
+
+    lines = [f"room {room_name} on floor 0 with dimensions ({_fmt(width)}, {_fmt(length)})"]
+
+    def wall_point(direction: str, t: float) -> Tuple[float, float]:
+        """Point at fraction t along a cardinal wall."""
+        _, (sx, sy), (ex, ey) = CARDINAL_WALLS[direction]
+        return ((sx + (ex - sx) * t) * width, (sy + (ey - sy) * t) * length)
+
+    for direction in ("south", "east", "north", "west"):
+        (ax, ay), (bx, by) = wall_point(direction, 0.0), wall_point(direction, 1.0)
+        lines.append(
+            f"wall from ({_fmt(ax)},{_fmt(ay)},0) to ({_fmt(bx)},{_fmt(by)},0) "
+            "with height 2.8 and thickness 0.2"
+        )
+
+    for direction, kinds in openings.items():
+        index = CARDINAL_WALLS[direction][0]
+        for i, kind in enumerate(kinds):
+            x, y = wall_point(direction, (i + 1) / (len(kinds) + 1))
+            if kind == "door":
+                lines.append(f"door on wall {index} at position ({_fmt(x)},{_fmt(y)},0) with width 1.0 and height 2.0")
+            else:
+                lines.append(f"window on wall {index} at position ({_fmt(x)},{_fmt(y)},1.0) with width 1.5 and height 1.0")
+
+    inward = {"south": (0, 1), "east": (-1, 0), "north": (0, -1), "west": (1, 0)}
+    for location, names in placed.items():
+        for i, name in enumerate(names):
+            sx, sy, sz = FURNITURE_SIZES[name]
+            class_name = name.replace(" ", "_")
+            if location == "center":
+                # Spread center pieces along the room's x axis
+                x = width * (i + 1) / (len(names) + 1)
+                y = length / 2
+                angle = 0.0
+            else:
+                x, y = wall_point(location, (i + 1) / (len(names) + 1))
+                dx, dy = inward[location]
+                offset = sy / 2 + 0.1
+                x, y = x + dx * offset, y + dy * offset
+                angle = WALL_ANGLES[location]
+            lines.append(
+                f"a {class_name} at position ({_fmt(x)},{_fmt(y)},0) with angle {_fmt(angle)} "
+                f"and scale ({_fmt(sx)},{_fmt(sy)},{_fmt(sz)})"
+            )
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route simple descriptions to a local template")
+    parser.add_argument("--text", type=str, required=True, help="Text description of the scene")
+
+    args = parser.parse_args()
+
+    description = route_simple_description(args.text)
+    if description is None:
+        print("Description is not simple enough for a local template")
+    else:
+        print(description)
+
+
+if __name__ == "__main__":
+    main()
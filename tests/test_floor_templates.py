@@ -0,0 +1,49 @@
+from spatiallm import Layout
+
+from floor_templates import TemplatedLayout
+
+FLOOR = """wall_0=Wall(0.0,0.0,0.0,4.0,0.0,0.0,2.8,0.2)
+wall_1=Wall(4.0,0.0,0.0,4.0,4.0,0.0,2.8,0.2)
+wall_2=Wall(4.0,4.0,0.0,0.0,4.0,0.0,2.8,0.2)
+wall_3=Wall(0.0,4.0,0.0,0.0,0.0,0.0,2.8,0.2)
+door_0=Door(wall_3,0.0,2.0,0.0,1.0,2.0)
+window_0=Window(wall_1,4.0,2.0,1.0,1.5,1.0)
+bbox_0=Bbox(bed,2.0,2.0,0.0,0.0,2.0,1.6,0.5)"""
+
+
+def _assert_consistent(layout, floors, floor_height):
+    for entities in (layout.walls, layout.doors, layout.windows, layout.bboxes):
+        ids = [entity.id for entity in entities]
+        assert len(ids) == len(set(ids))
+
+    walls = {wall.id: wall for wall in layout.walls}
+    for opening in layout.doors + layout.windows:
+        wall = walls[opening.wall_id]
+        # Each opening stays on a wall of its own floor
+        assert int(wall.az // floor_height) == int(opening.position_z // floor_height)
+    assert {int(wall.az // floor_height) for wall in layout.walls} == set(range(floors))
+
+
+def test_materialize_shared_floors():
+    templated = TemplatedLayout.stack(Layout(FLOOR), 3, 3.0)
+    layout = templated.materialize()
+
+    assert len(layout.walls) == 12
+    _assert_consistent(layout, 3, 3.0)
+
+
+def test_materialize_after_deleting_from_a_floor():
+    templated = TemplatedLayout.stack(Layout(FLOOR), 3, 3.0)
+    floor = templated.edit_floor(0)
+    del floor.walls[0]
+
+    assert templated.users("typical") == 2
+    layout = templated.materialize()
+
+    assert len(layout.walls) == 11
+    assert len(layout.doors) == 3
+    _assert_consistent(layout, 3, 3.0)
+    # The plain string round-trips without ambiguous wall references
+    reparsed = Layout(layout.to_language_string())
+    assert len(reparsed.walls) == 11
+    assert len(reparsed.doors) == 3
@@ -0,0 +1,39 @@
+import math
+
+from spatiallm import Layout
+
+from wall_topology import merge_walls
+
+
+def _layout(*walls):
+    lines = [
+        f"wall_{index}=Wall({ax},{ay},0.0,{bx},{by},0.0,2.8,0.2)"
+        for index, (ax, ay, bx, by) in enumerate(walls)
+    ]
+    return Layout("\n".join(lines))
+
+
+def test_merges_walls_on_either_side_of_a_tolerance_boundary():
+    # 0.025 / 0.05 rounds to either side of a bucket boundary
+    layout = _layout((0.0, 0.024, 2.0, 0.024), (1.0, 0.026, 3.0, 0.026))
+    assert merge_walls(layout) == {1: 0}
+    assert len(layout.walls) == 1
+    assert math.isclose(layout.walls[0].bx, 3.0)
+
+
+def test_merges_walls_within_tolerance_across_buckets():
+    layout = _layout((0.0, 0.0, 2.0, 0.0), (1.0, 0.024, 3.0, 0.024))
+    assert merge_walls(layout) == {1: 0}
+    assert len(layout.walls) == 1
+
+
+def test_merges_walls_drawn_on_either_side_of_pi():
+    # Angles just above 0 and just below pi describe the same line
+    layout = _layout((0.0, 0.0, 2.0, 0.005), (3.0, 0.0, 1.0, 0.005))
+    assert merge_walls(layout) == {1: 0}
+
+
+def test_keeps_parallel_walls_beyond_tolerance():
+    layout = _layout((0.0, 0.0, 2.0, 0.0), (0.0, 0.2, 2.0, 0.2))
+    assert merge_walls(layout) == {}
+    assert len(layout.walls) == 2
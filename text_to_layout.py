@@ -11,6 +11,7 @@ import os
 import re
 import sys
 import json
+import uuid
 from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
@@ -23,21 +24,44 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
 from spatiallm import Layout
 from spatiallm.layout.entity import Wall, Door, Window, Bbox
 
+from layout_geometry import floor_index, floor_levels
+from simplified_spatiallm import write_layout
+from wall_topology import merge_walls
 
-class TextToLayout:
-    """
-    Converts text descriptions to SpatialLM layout format.
+# Classes logged in the "structure" level of detail; everything else is furniture
+STRUCTURE_CLASSES = ("wall", "door", "window")
+LOD_LEVELS = ["structure", "furniture"]
+
+# Defaults for trailing values left out of compact records, by record type
+COMPACT_DEFAULTS = {
+    "w": [2.8, 0.2],
+    "d": [1.0, 2.0],
+    "wi": [1.5, 1.0],
+    "b": [0.0, 1.0, 1.0, 1.0],
+    "bi": [2.0],
+}
+# Class names of compact records must be single words, like the names the
+# English grammar matches with \w+, so they survive `to_language_string`
+COMPACT_CLASS_NAME = re.compile(r"\w+")
+
+
+def _compact_class_name(value) -> str:
+    """Get the class name of a compact record, raising ValueError if it is not a single word."""
+    name = str(value)
+    if not COMPACT_CLASS_NAME.fullmatch(name):
+        raise ValueError(f"Invalid class name: {name!r}")
+    return name
+
+
+class ParseContext:
     """
+    Per-parse state for TextToLayout.
 
-    def __init__(self, claude_api_key: Optional[str] = None):
-        """
-        Initialize the TextToLayout converter.
+    Every parse gets its own context, so a single TextToLayout instance can
+    serve many threads at once without sharing mutable state.
+    """
 
-        Args:
-            claude_api_key: Optional API key for Claude API. If not provided,
-                            the converter will use rule-based parsing.
-        """
-        self.claude_api_key = claude_api_key
+    def __init__(self):
         self.entity_id_counter = {
             "wall": 0,
             "door": 0,
@@ -45,19 +69,46 @@ class TextToLayout:
             "bbox": 0,
         }
 
-    def _get_next_id(self, entity_type: str) -> int:
+    def next_id(self, entity_type: str) -> int:
         """Get the next available ID for an entity type."""
         entity_id = self.entity_id_counter[entity_type]
         self.entity_id_counter[entity_type] += 1
         return entity_id
 
-    def _parse_wall(self, description: str, floor_height: float = 0.0) -> List[Wall]:
+
+class TextToLayout:
+    """
+    Converts text descriptions to SpatialLM layout format.
+
+    Instances hold configuration only; all parsing state lives in a
+    ParseContext created per call, so one instance is safe to share between
+    threads.
+    """
+
+    def __init__(self, claude_api_key: Optional[str] = None, merge_walls: bool = True):
+        """
+        Initialize the TextToLayout converter.
+
+        Args:
+            claude_api_key: Optional API key for Claude API. If not provided,
+                            the converter will use rule-based parsing.
+            merge_walls: If True, walls shared by adjacent rooms are
+                         deduplicated and collinear wall pieces merged after
+                         parsing.
+        """
+        self.claude_api_key = claude_api_key
+        self.merge_walls = merge_walls
+
+    def _parse_wall(
+        self, context: ParseContext, description: str, floor_height: float = 0.0
+    ) -> List[Wall]:
         """
         Parse wall descriptions from text.
         
         Example: "wall from (0,0,0) to (5,0,0) with height 3 and thickness 0.2"
         
         Args:
+            context: Per-parse state used to allocate entity IDs
             description: Text description to parse
             floor_height: Height offset for the floor (default: 0.0)
         """
@@ -77,7 +128,7 @@ class TextToLayout:
             end_z = float(end_point[2]) if len(end_point) > 2 else floor_height
             
             wall = Wall(
-                id=self._get_next_id("wall"),
+                id=context.next_id("wall"),
                 ax=float(start_point[0]),
                 ay=float(start_point[1]),
                 az=start_z,
@@ -91,7 +142,9 @@ class TextToLayout:
         
         return walls
 
-    def _parse_door(self, description: str, walls: List[Wall]) -> List[Door]:
+    def _parse_door(
+        self, context: ParseContext, description: str, walls: List[Wall]
+    ) -> List[Door]:
         """
         Parse door descriptions from text.
         
@@ -112,7 +165,7 @@ class TextToLayout:
             height = float(match.group(4) or 2.0)  # Default height
             
             door = Door(
-                id=self._get_next_id("door"),
+                id=context.next_id("door"),
                 wall_id=walls[wall_id].id,
                 position_x=float(position[0]),
                 position_y=float(position[1]),
@@ -124,7 +177,9 @@ class TextToLayout:
         
         return doors
 
-    def _parse_window(self, description: str, walls: List[Wall]) -> List[Window]:
+    def _parse_window(
+        self, context: ParseContext, description: str, walls: List[Wall]
+    ) -> List[Window]:
         """
         Parse window descriptions from text.
         
@@ -145,7 +200,7 @@ class TextToLayout:
             height = float(match.group(4) or 1.0)  # Default height
             
             window = Window(
-                id=self._get_next_id("window"),
+                id=context.next_id("window"),
                 wall_id=walls[wall_id].id,
                 position_x=float(position[0]),
                 position_y=float(position[1]),
@@ -157,7 +212,7 @@ class TextToLayout:
         
         return windows
 
-    def _parse_bbox(self, description: str) -> List[Bbox]:
+    def _parse_bbox(self, context: ParseContext, description: str) -> List[Bbox]:
         """
         Parse bounding box descriptions from text.
         
@@ -183,7 +238,7 @@ class TextToLayout:
                     scale[2] = float(scale_parts[2])
             
             bbox = Bbox(
-                id=self._get_next_id("bbox"),
+                id=context.next_id("bbox"),
                 class_name=class_name,
                 position_x=float(position[0]),
                 position_y=float(position[1]),
@@ -197,7 +252,7 @@ class TextToLayout:
         
         return bboxes
     
-    def _parse_fixtures(self, description: str) -> List[Bbox]:
+    def _parse_fixtures(self, context: ParseContext, description: str) -> List[Bbox]:
         """
         Parse fixture descriptions from text.
         
@@ -231,7 +286,7 @@ class TextToLayout:
                     angle = 0.0
             
             fixture = Bbox(
-                id=self._get_next_id("bbox"),
+                id=context.next_id("bbox"),
                 class_name=fixture_type,
                 position_x=float(position[0]),
                 position_y=float(position[1]),
@@ -245,7 +300,9 @@ class TextToLayout:
         
         return fixtures
     
-    def _parse_built_ins(self, description: str, walls: List[Wall]) -> List[Bbox]:
+    def _parse_built_ins(
+        self, context: ParseContext, description: str, walls: List[Wall]
+    ) -> List[Bbox]:
         """
         Parse built-in furniture descriptions from text.
         
@@ -281,7 +338,7 @@ class TextToLayout:
             wall_direction = np.arctan2(wall.by - wall.ay, wall.bx - wall.ax)
             
             built_in = Bbox(
-                id=self._get_next_id("bbox"),
+                id=context.next_id("bbox"),
                 class_name=built_in_type,
                 position_x=center_x,
                 position_y=center_y,
@@ -295,7 +352,9 @@ class TextToLayout:
         
         return built_ins
     
-    def _parse_architectural_features(self, description: str) -> List[Bbox]:
+    def _parse_architectural_features(
+        self, context: ParseContext, description: str
+    ) -> List[Bbox]:
         """
         Parse architectural feature descriptions from text.
         
@@ -316,7 +375,7 @@ class TextToLayout:
             class_name = f"{feature_type}_{style}"
             
             feature = Bbox(
-                id=self._get_next_id("bbox"),
+                id=context.next_id("bbox"),
                 class_name=class_name,
                 position_x=float(position[0]),
                 position_y=float(position[1]),
@@ -419,6 +478,98 @@ class TextToLayout:
         
         return floors
     
+    def _parse_compact(self, context: ParseContext, description: str) -> Layout:
+        """
+        Parse a compact description with one JSON array per line.
+        
+        Example: '["w",0,0,0,5,0,0]' or '["b","sofa",2.5,6,0,3.14,2.0,0.8,0.8]'
+        
+        Trailing values that are left out take the same defaults as the
+        English grammar. Floor, room and staircase records carry no geometry
+        and are skipped, as are lines that are not valid records, including
+        class names that are not a single word and out-of-range wall indices.
+        """
+        layout = Layout()
+        layout.walls = []
+        layout.doors = []
+        layout.windows = []
+        layout.bboxes = []
+        
+        for line in description.split("\n"):
+            line = line.strip()
+            if not line.startswith("["):
+                continue
+            try:
+                record = json.loads(line)
+                kind = record[0]
+                
+                if kind == "w":
+                    ax, ay, az, bx, by, bz = (float(v) for v in record[1:7])
+                    values = record[7:] + COMPACT_DEFAULTS["w"][len(record) - 7:]
+                    layout.walls.append(Wall(
+                        id=context.next_id("wall"),
+                        ax=ax, ay=ay, az=az, bx=bx, by=by, bz=bz,
+                        height=float(values[0]),
+                        thickness=float(values[1]),
+                    ))
+                
+                elif kind in ("d", "wi"):
+                    wall_index = int(record[1])
+                    if not 0 <= wall_index < len(layout.walls):
+                        continue  # Skip if wall index is invalid
+                    x, y, z = (float(v) for v in record[2:5])
+                    values = record[5:] + COMPACT_DEFAULTS[kind][len(record) - 5:]
+                    entity_type, entity_class = (
+                        ("door", Door) if kind == "d" else ("window", Window)
+                    )
+                    opening = entity_class(
+                        id=context.next_id(entity_type),
+                        wall_id=layout.walls[wall_index].id,
+                        position_x=x, position_y=y, position_z=z,
+                        width=float(values[0]),
+                        height=float(values[1]),
+                    )
+                    if kind == "d":
+                        layout.doors.append(opening)
+                    else:
+                        layout.windows.append(opening)
+                
+                elif kind == "b":
+                    x, y, z = (float(v) for v in record[2:5])
+                    values = record[5:] + COMPACT_DEFAULTS["b"][len(record) - 5:]
+                    layout.bboxes.append(Bbox(
+                        id=context.next_id("bbox"),
+                        class_name=_compact_class_name(record[1]),
+                        position_x=x, position_y=y, position_z=z,
+                        angle_z=float(values[0]),
+                        scale_x=float(values[1]),
+                        scale_y=float(values[2]),
+                        scale_z=float(values[3]),
+                    ))
+                
+                elif kind == "bi":
+                    wall_index = int(record[2])
+                    if not 0 <= wall_index < len(layout.walls):
+                        continue  # Skip if wall index is invalid
+                    x1, y1, z1, x2, y2, z2 = (float(v) for v in record[3:9])
+                    values = record[9:] + COMPACT_DEFAULTS["bi"][len(record) - 9:]
+                    wall = layout.walls[wall_index]
+                    layout.bboxes.append(Bbox(
+                        id=context.next_id("bbox"),
+                        class_name=_compact_class_name(record[1]),
+                        position_x=(x1 + x2) / 2,
+                        position_y=(y1 + y2) / 2,
+                        position_z=(z1 + z2) / 2,
+                        angle_z=float(np.arctan2(wall.by - wall.ay, wall.bx - wall.ax)),
+                        scale_x=float(np.hypot(x2 - x1, y2 - y1)),
+                        scale_y=0.6,  # Default depth
+                        scale_z=float(values[0]),
+                    ))
+            except (ValueError, TypeError, IndexError):
+                continue  # Skip malformed records
+        
+        return layout
+
     def _generate_layout_rule_based(self, text: str) -> str:
         """
         Generate layout using rule-based parsing.
@@ -429,13 +580,31 @@ class TextToLayout:
         Returns:
             Layout string in SpatialLM format.
         """
-        # Reset entity ID counters
-        self.entity_id_counter = {
-            "wall": 0,
-            "door": 0,
-            "window": 0,
-            "bbox": 0,
-        }
+        return self.build_layout(text).to_language_string()
+
+    def build_layout(self, text: str) -> Layout:
+        """
+        Parse a structured description into a Layout object.
+        
+        Unlike `generate_layout`, the layout is not serialized, so large
+        layouts can be written out with `write_layout` without holding the
+        whole layout string in memory.
+        
+        Args:
+            text: Structured description, in English lines or compact records.
+            
+        Returns:
+            The parsed layout.
+        """
+        # Entity IDs are allocated from a context private to this call
+        context = ParseContext()
+        
+        # Compact JSON records skip the regular expression parsers entirely
+        if _is_compact(text):
+            layout = self._parse_compact(context, text)
+            if self.merge_walls:
+                merge_walls(layout)
+            return layout
         
         # Parse floors and rooms
         floors = self._parse_floors_and_rooms(text)
@@ -452,32 +621,36 @@ class TextToLayout:
             floor_height = floor_info["height"]
             
             # Parse entities for this floor
-            walls = self._parse_wall(text, floor_height)
+            walls = self._parse_wall(context, text, floor_height)
             layout.walls.extend(walls)
             
-            doors = self._parse_door(text, walls)
+            doors = self._parse_door(context, text, walls)
             layout.doors.extend(doors)
             
-            windows = self._parse_window(text, walls)
+            windows = self._parse_window(context, text, walls)
             layout.windows.extend(windows)
             
             # Parse furniture and objects
-            bboxes = self._parse_bbox(text)
+            bboxes = self._parse_bbox(context, text)
             layout.bboxes.extend(bboxes)
             
             # Parse fixtures (sinks, toilets, etc.)
-            fixtures = self._parse_fixtures(text)
+            fixtures = self._parse_fixtures(context, text)
             layout.bboxes.extend(fixtures)
             
             # Parse built-in furniture
-            built_ins = self._parse_built_ins(text, walls)
+            built_ins = self._parse_built_ins(context, text, walls)
             layout.bboxes.extend(built_ins)
             
             # Parse architectural features
-            features = self._parse_architectural_features(text)
+            features = self._parse_architectural_features(context, text)
             layout.bboxes.extend(features)
         
-        return layout.to_language_string()
+        # Collapse walls shared by adjacent rooms into one
+        if self.merge_walls:
+            merge_walls(layout)
+        
+        return layout
 
     def generate_layout(self, text: str) -> str:
         """
@@ -494,13 +667,20 @@ class TextToLayout:
         else:
             return self._generate_layout_rule_based(text)
 
-    def visualize_layout(self, layout_str: str, output_file: Optional[str] = None) -> None:
+    def visualize_layout(
+        self,
+        layout_str: str,
+        output_file: Optional[str] = None,
+        instanced: bool = False,
+    ) -> None:
         """
         Visualize layout using rerun.
         
         Args:
             layout_str: Layout string in SpatialLM format.
             output_file: Optional output file path for saving the visualization.
+            instanced: If True, log one box template per object class with
+                       per-instance poses instead of one entity per object.
         """
         # Parse layout
         layout = Layout(layout_str)
@@ -512,37 +692,176 @@ class TextToLayout:
             collapse_panels=True,
         )
         
+        # A recording per call keeps concurrent visualizations apart
+        recording = rr.new_recording("rerun_arcllm")
         if output_file:
-            rr.init("rerun_arcllm", save_to_file=output_file)
+            recording.save(output_file, default_blueprint=blueprint)
         else:
-            rr.init("rerun_arcllm", default_blueprint=blueprint)
+            recording.spawn(default_blueprint=blueprint)
         
-        rr.log("world", rr.ViewCoordinates.RIGHT_HAND_Z_UP, static=True)
+        rr.log("world", rr.ViewCoordinates.RIGHT_HAND_Z_UP, static=True, recording=recording)
         
-        num_entities = len(floor_plan)
-        seconds = 0.5
-        for ti in range(num_entities + 1):
-            sub_floor_plan = floor_plan[:ti]
+        if instanced:
+            self._log_instanced(floor_plan, recording=recording)
+        else:
+            num_entities = len(floor_plan)
+            seconds = 0.5
+            for ti in range(num_entities + 1):
+                sub_floor_plan = floor_plan[:ti]
+                
+                rr.set_time_seconds("time_sec", ti * seconds, recording=recording)
+                for box in sub_floor_plan:
+                    uid = box["id"]
+                    group = box["class"]
+                    label = box["label"]
+                    
+                    rr.log(
+                        f"world/pred/{group}/{uid}",
+                        rr.Boxes3D(
+                            centers=box["center"],
+                            half_sizes=0.5 * np.asarray(box["scale"]),
+                            labels=label,
+                        ),
+                        rr.InstancePoses3D(mat3x3=box["rotation"]),
+                        static=False,
+                        recording=recording,
+                    )
+        
+        recording.disconnect()
+
+    def _log_instanced(
+        self,
+        floor_plan: List[Dict],
+        seconds: float = 0.5,
+        prefix: str = "world/pred",
+        recording: Optional["rr.RecordingStream"] = None,
+    ) -> None:
+        """
+        Log boxes as one unit-box template per class with per-instance poses.
+
+        Each class becomes a single `<prefix>/<class>` entity whose instance
+        poses carry the translation, rotation and scale of every object, so the
+        entity tree grows with the number of classes rather than objects.
+        Classes are revealed one per time step, in order of first appearance.
+        """
+        groups: Dict[str, List[Dict]] = {}
+        for box in floor_plan:
+            groups.setdefault(box["class"], []).append(box)
+        
+        for ti, (group, boxes) in enumerate(groups.items()):
+            centers = np.array([box["center"] for box in boxes], dtype=np.float32)
+            scales = np.array([box["scale"] for box in boxes], dtype=np.float32)
+            rotations = np.array([box["rotation"] for box in boxes], dtype=np.float32)
+            # Bake the per-instance scale into the rotation matrix columns
+            mat3x3 = rotations * scales[:, np.newaxis, :]
             
-            rr.set_time_seconds("time_sec", ti * seconds)
-            for box in sub_floor_plan:
-                uid = box["id"]
-                group = box["class"]
-                label = box["label"]
+            rr.set_time_seconds("time_sec", (ti + 1) * seconds, recording=recording)
+            rr.log(
+                f"{prefix}/{group}",
+                rr.Boxes3D(half_sizes=[0.5, 0.5, 0.5], labels=boxes[0]["label"]),
+                rr.InstancePoses3D(translations=centers, mat3x3=mat3x3),
+                static=False,
+                recording=recording,
+            )
+
+    def visualize_layout_chunked(
+        self,
+        layout_str: str,
+        output_dir: str,
+        instanced: bool = False,
+    ) -> Dict:
+        """
+        Visualize layout as one `.rrd` file per floor and level of detail.
+
+        Every floor is split into a "structure" chunk (walls, doors and
+        windows) and a "furniture" chunk (everything else). All chunks share a
+        recording ID, so the viewer merges whichever subset it is given. A
+        `manifest.json` describing the chunks is written next to them.
+        
+        Args:
+            layout_str: Layout string in SpatialLM format.
+            output_dir: Directory to write the chunk files and manifest into.
+            instanced: If True, log one box template per object class within
+                       each chunk.
+            
+        Returns:
+            The manifest as a dictionary.
+        """
+        layout = Layout(layout_str)
+        floor_plan = layout.to_boxes()
+        levels = floor_levels(layout)
+        
+        # Bucket boxes by (floor, level of detail), structure before furniture
+        chunks: Dict[Tuple[int, str], List[Dict]] = {}
+        for box in floor_plan:
+            floor = floor_index(levels, box["center"][2])
+            lod = "structure" if box["class"] in STRUCTURE_CLASSES else "furniture"
+            chunks.setdefault((floor, lod), []).append(box)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        recording_id = str(uuid.uuid4())
+        manifest = {
+            "recording_id": recording_id,
+            "levels": LOD_LEVELS,
+            "floors": [],
+        }
+        
+        for floor, height in enumerate(levels):
+            floor_entry = {"index": floor, "height": height, "chunks": []}
+            for lod in LOD_LEVELS:
+                boxes = chunks.get((floor, lod))
+                if not boxes:
+                    continue
                 
+                file_name = f"floor_{floor}_{lod}.rrd"
+                recording = rr.new_recording("rerun_arcllm", recording_id=recording_id)
+                recording.save(os.path.join(output_dir, file_name))
                 rr.log(
-                    f"world/pred/{group}/{uid}",
-                    rr.Boxes3D(
-                        centers=box["center"],
-                        half_sizes=0.5 * box["scale"],
-                        labels=label,
-                    ),
-                    rr.InstancePoses3D(mat3x3=box["rotation"]),
-                    static=False,
+                    "world",
+                    rr.ViewCoordinates.RIGHT_HAND_Z_UP,
+                    static=True,
+                    recording=recording,
                 )
-        
-        if not output_file:
-            rr.script_main()
+                
+                prefix = f"world/pred/floor_{floor}"
+                if instanced:
+                    self._log_instanced(boxes, prefix=prefix, recording=recording)
+                else:
+                    for box in boxes:
+                        rr.log(
+                            f"{prefix}/{box['class']}/{box['id']}",
+                            rr.Boxes3D(
+                                centers=box["center"],
+                                half_sizes=0.5 * np.asarray(box["scale"]),
+                                labels=box["label"],
+                            ),
+                            rr.InstancePoses3D(mat3x3=box["rotation"]),
+                            static=True,
+                            recording=recording,
+                        )
+                recording.disconnect()
+                
+                floor_entry["chunks"].append({
+                    "lod": lod,
+                    "file": file_name,
+                    "entities": len(boxes),
+                    "bytes": os.path.getsize(os.path.join(output_dir, file_name)),
+                })
+            manifest["floors"].append(floor_entry)
+        
+        with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        
+        return manifest
+
+
+def _is_compact(description: str) -> bool:
+    """Whether a description uses compact JSON records rather than English lines."""
+    for line in description.split("\n"):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return line.startswith("[")
+    return False
 
 
 def main():
@@ -552,6 +871,8 @@ def main():
     parser.add_argument("--output", type=str, help="Output file path for layout")
     parser.add_argument("--visualize", action="store_true", help="Visualize the layout")
     parser.add_argument("--vis-output", type=str, help="Output file path for visualization")
+    parser.add_argument("--instanced", action="store_true", help="Log one box template per object class")
+    parser.add_argument("--chunk-dir", type=str, help="Output directory for per-floor .rrd chunks and manifest")
     parser.add_argument("--claude-api-key", type=str, help="Claude API key")
     
     args = parser.parse_args()
@@ -570,18 +891,25 @@ def main():
     converter = TextToLayout(claude_api_key=args.claude_api_key)
     
     # Generate layout
-    layout_str = converter.generate_layout(text)
+    layout = converter.build_layout(text)
     
-    # Save layout
+    # Save layout, streaming it line by line
     if args.output:
         with open(args.output, "w") as f:
-            f.write(layout_str)
+            write_layout(layout, f)
     
     # Visualize layout
-    if args.visualize:
-        converter.visualize_layout(layout_str, output_file=args.vis_output)
+    if args.chunk_dir:
+        converter.visualize_layout_chunked(
+            layout.to_language_string(), args.chunk_dir, instanced=args.instanced
+        )
+    elif args.visualize:
+        converter.visualize_layout(
+            layout.to_language_string(), output_file=args.vis_output, instanced=args.instanced
+        )
     
-    print(layout_str)
+    write_layout(layout, sys.stdout)
+    print()
 
 
 if __name__ == "__main__":
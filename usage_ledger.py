@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Token Usage Accounting for Arc LLM
+
+This module records the input and output tokens and the latency of every
+Claude API call, and sums them per model with an estimated cost, so spend
+and latency can be tracked per deployment and compared across models.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# USD per million (input, output) tokens, by model name prefix
+MODEL_PRICES = {
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-sonnet": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-3-opus": (15.0, 75.0),
+}
+
+
+def model_price(model: str) -> Optional[Tuple[float, float]]:
+    """Get the (input, output) USD price per million tokens of a model, if known."""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return None
+
+
+class CallUsage:
+    """Token counts and timings of one Claude API call."""
+
+    def __init__(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        latency: float,
+        first_token_latency: Optional[float] = None,
+        stop_reason: Optional[str] = None,
+    ):
+        self.model = model
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.latency = latency
+        self.first_token_latency = first_token_latency
+        self.stop_reason = stop_reason
+        self.time = time.time()
+
+    @property
+    def cost(self) -> Optional[float]:
+        """Estimated cost in USD, or None for models without a known price."""
+        price = model_price(self.model)
+        if price is None:
+            return None
+        return (self.input_tokens * price[0] + self.output_tokens * price[1]) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the record to a JSON-serializable dictionary."""
+        return {
+            "model": self.model,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency": self.latency,
+            "first_token_latency": self.first_token_latency,
+            "stop_reason": self.stop_reason,
+            "cost": self.cost,
+            "time": self.time,
+        }
+
+
+class UsageLedger:
+    """
+    Thread-safe log of Claude API calls.
+
+    Running totals cover every call ever recorded, while only the last
+    `max_calls` calls are kept for latency percentiles.
+    """
+
+    def __init__(self, max_calls: int = 10000):
+        """
+        Initialize an empty ledger.
+
+        Args:
+            max_calls: Number of recent calls to keep for latency percentiles.
+        """
+        self.calls: Deque[CallUsage] = deque(maxlen=max_calls)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, usage: CallUsage) -> None:
+        """Add a call to the ledger."""
+        with self._lock:
+            self.calls.append(usage)
+            totals = self._totals.setdefault(
+                usage.model,
+                {"calls": 0, "input_tokens": 0, "output_tokens": 0, "latency": 0.0, "cost": 0.0},
+            )
+            totals["calls"] += 1
+            totals["input_tokens"] += usage.input_tokens
+            totals["output_tokens"] += usage.output_tokens
+            totals["latency"] += usage.latency
+            totals["cost"] += usage.cost or 0.0
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get up to `limit` most recent calls, newest first."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            calls = list(self.calls)[-limit:]
+        return [call.to_dict() for call in reversed(calls)]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the recorded calls.
+
+        Returns:
+            Dictionary with overall and per-model call counts, token counts,
+            estimated cost in USD, and median and 95th percentile latency in
+            seconds over the recent calls.
+        """
+        with self._lock:
+            totals = {model: dict(values) for model, values in self._totals.items()}
+            latencies: Dict[str, List[float]] = {}
+            for call in self.calls:
+                latencies.setdefault(call.model, []).append(call.latency)
+
+        models = {}
+        for model, values in sorted(totals.items()):
+            model_latencies = latencies.get(model)
+            models[model] = {
+                "calls": int(values["calls"]),
+                "input_tokens": int(values["input_tokens"]),
+                "output_tokens": int(values["output_tokens"]),
+                "cost": round(values["cost"], 6),
+                "latency_p50": float(np.percentile(model_latencies, 50)) if model_latencies else None,
+                "latency_p95": float(np.percentile(model_latencies, 95)) if model_latencies else None,
+            }
+
+        all_latencies = [latency for values in latencies.values() for latency in values]
+        return {
+            "calls": sum(values["calls"] for values in models.values()),
+            "input_tokens": sum(values["input_tokens"] for values in models.values()),
+            "output_tokens": sum(values["output_tokens"] for values in models.values()),
+            "cost": round(sum(values["cost"] for values in models.values()), 6),
+            "latency_p50": float(np.percentile(all_latencies, 50)) if all_latencies else None,
+            "latency_p95": float(np.percentile(all_latencies, 95)) if all_latencies else None,
+            "models": models,
+        }
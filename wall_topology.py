@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Wall Topology Cleanup for Arc LLM
+
+Adjacent rooms each describe their own walls, so a shared partition comes out
+as two overlapping walls and a long wall is often split into collinear
+pieces. This module snaps wall endpoints together, merges overlapping and
+collinear walls into one and re-targets the doors and windows that referred
+to the merged walls.
+"""
+
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+# Add SpatialLM to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "SpatialLM"))
+
+from spatiallm import Layout
+from spatiallm.layout.entity import Wall
+
+from layout_geometry import NEIGHBOUR_OFFSETS
+from simplified_spatiallm import read_layout, write_layout
+
+T = TypeVar("T")
+
+
+def snap_endpoints(walls: List[Wall], tolerance: float = 0.05) -> int:
+    """
+    Snap wall endpoints that lie within a tolerance of each other.
+
+    Endpoints are bucketed in a hashed grid with cells the size of the
+    tolerance, so each endpoint is only compared with the points in its own
+    and neighbouring cells. The first endpoint seen in a neighbourhood
+    becomes the point the later ones snap to.
+
+    Args:
+        walls: Walls to modify in place.
+        tolerance: Maximum distance in meters between snapped endpoints.
+
+    Returns:
+        Number of endpoints that were moved.
+    """
+    grid: Dict[Tuple[int, int, int], List[Tuple[float, float, float]]] = defaultdict(list)
+    moved = 0
+
+    def snap(x: float, y: float, z: float) -> Tuple[float, float, float]:
+        nonlocal moved
+        cell = (math.floor(x / tolerance), math.floor(y / tolerance), math.floor(z / tolerance))
+        best, best_distance = None, None
+        for dx, dy, dz in NEIGHBOUR_OFFSETS:
+            for point in grid.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), ()):
+                distance = (point[0] - x) ** 2 + (point[1] - y) ** 2 + (point[2] - z) ** 2
+                if distance <= tolerance ** 2 and (best is None or distance < best_distance):
+                    best, best_distance = point, distance
+        if best is None:
+            grid[cell].append((x, y, z))
+            return x, y, z
+        if best != (x, y, z):
+            moved += 1
+        return best
+
+    for wall in walls:
+        wall.ax, wall.ay, wall.az = snap(wall.ax, wall.ay, wall.az)
+        wall.bx, wall.by, wall.bz = snap(wall.bx, wall.by, wall.bz)
+    return moved
+
+
+def _wall_angle(wall: Wall, tolerance: float) -> Optional[float]:
+    """
+    Get the direction of a wall folded into [0, pi).
+
+    Walls drawn in opposite directions share a line, so their angles fold
+    onto the same value.
+
+    Returns:
+        The angle, or None for walls that cannot be merged (zero length or
+        sloped).
+    """
+    dx, dy = wall.bx - wall.ax, wall.by - wall.ay
+    if math.hypot(dx, dy) <= tolerance or abs(wall.az - wall.bz) > tolerance:
+        return None
+    return math.atan2(dy, dx) % math.pi
+
+
+def _chains(items: List[T], value: Callable[[T], float], tolerance: float) -> List[List[T]]:
+    """
+    Split items into chains whose consecutive values differ by at most a tolerance.
+
+    Items are sorted by value and a chain ends at every gap larger than the
+    tolerance, so two items within the tolerance always share a chain.
+    """
+    chains: List[List[T]] = []
+    previous = None
+    for item in sorted(items, key=value):
+        if previous is None or value(item) - previous > tolerance:
+            chains.append([])
+        chains[-1].append(item)
+        previous = value(item)
+    return chains
+
+
+def _angle_groups(angled: List[Tuple[float, Wall]], angle_tolerance: float) -> List[List[Tuple[float, Wall]]]:
+    """
+    Group walls by direction, treating angles just below pi as close to 0.
+
+    Returns:
+        Groups of (angle, wall) pairs. Angles of walls that wrapped around
+        from just below pi are shifted by -pi, so each group's angles are
+        contiguous.
+    """
+    groups = _chains(angled, lambda item: item[0], angle_tolerance)
+    if len(groups) > 1 and groups[0][0][0] + math.pi - groups[-1][-1][0] <= angle_tolerance:
+        groups[0] = [(angle - math.pi, wall) for angle, wall in groups.pop()] + groups[0]
+    return groups
+
+
+def merge_walls(
+    layout: Layout,
+    tolerance: float = 0.05,
+    angle_tolerance: float = 0.01,
+) -> Dict[int, int]:
+    """
+    Deduplicate shared walls and merge collinear wall pieces.
+
+    Endpoints are snapped first (see `snap_endpoints`). Walls are then
+    grouped into lines: they are sorted by direction, base height, height
+    and offset from the origin in turn, and split wherever consecutive
+    values differ by more than the tolerance, so walls within the tolerance
+    of each other always share a line. Within each line the walls are
+    swept in order and overlapping or touching ones are merged. A merged
+    wall keeps the ID and direction of its lowest-ID piece and the largest
+    thickness of its pieces. Doors and windows on merged-away walls are
+    moved to the surviving wall.
+
+    Grouping and sweeping only sort, so the pass takes O(n log n) time in
+    the number of walls.
+
+    Args:
+        layout: Layout to modify in place.
+        tolerance: Maximum distance in meters for endpoints to be snapped
+                   and for walls to count as overlapping or collinear.
+        angle_tolerance: Maximum difference in radians for walls to count
+                         as parallel.
+
+    Returns:
+        Mapping from the ID of every removed wall to the ID of the wall it
+        was merged into.
+    """
+    snap_endpoints(layout.walls, tolerance)
+
+    kept: List[Wall] = []
+    angled: List[Tuple[float, Wall]] = []
+    for wall in layout.walls:
+        angle = _wall_angle(wall, tolerance)
+        if angle is None:
+            kept.append(wall)
+        else:
+            angled.append((angle, wall))
+
+    # Multiples of `step` evenly divide a right angle, so lines of
+    # axis-aligned walls get exact axes
+    step = (math.pi / 2) / max(1, round((math.pi / 2) / angle_tolerance))
+    lines: List[List[Tuple[float, float, Wall]]] = []
+    for parallel in _angle_groups(angled, angle_tolerance):
+        # Measure every wall of the group along the axis of its lowest-ID wall
+        axis = round(min(parallel, key=lambda item: item[1].id)[0] / step) * step
+        cos, sin = math.cos(axis), math.sin(axis)
+        placed = [
+            (
+                -sin * (wall.ax + wall.bx) / 2 + cos * (wall.ay + wall.by) / 2,
+                cos * wall.ax + sin * wall.ay,
+                cos * wall.bx + sin * wall.by,
+                wall,
+            )
+            for _, wall in parallel
+        ]
+        for level in _chains(placed, lambda item: min(item[3].az, item[3].bz), tolerance):
+            for same_height in _chains(level, lambda item: item[3].height, tolerance):
+                for line in _chains(same_height, lambda item: item[0], tolerance):
+                    lines.append([(start, end, wall) for _, start, end, wall in line])
+
+    merged_into: Dict[int, int] = {}
+    for pieces in lines:
+        # Sweep the pieces by where they start along the line
+        pieces.sort(key=lambda piece: min(piece[0], piece[1]))
+        group: List[Tuple[float, float, Wall]] = []
+        group_end = None
+        for piece in pieces + [None]:
+            if piece is not None and group and min(piece[0], piece[1]) <= group_end + tolerance:
+                group.append(piece)
+                group_end = max(group_end, piece[0], piece[1])
+                continue
+            if group:
+                kept.append(_merge_group(group, merged_into))
+            if piece is not None:
+                group = [piece]
+                group_end = max(piece[0], piece[1])
+
+    kept.sort(key=lambda wall: wall.id)
+    layout.walls = kept
+
+    for opening in layout.doors + layout.windows:
+        opening.wall_id = merged_into.get(opening.wall_id, opening.wall_id)
+    return merged_into
+
+
+def _merge_group(group: List[Tuple[float, float, Wall]], merged_into: Dict[int, int]) -> Wall:
+    """Merge overlapping collinear walls into the one with the lowest ID."""
+    survivor = min((wall for _, _, wall in group), key=lambda wall: wall.id)
+    if len(group) == 1:
+        return survivor
+
+    # The extreme endpoints of the group become the merged wall's endpoints
+    low = high = None
+    for start, end, wall in group:
+        for t, point in ((start, (wall.ax, wall.ay, wall.az)), (end, (wall.bx, wall.by, wall.bz))):
+            if low is None or t < low[0]:
+                low = (t, point)
+            if high is None or t > high[0]:
+                high = (t, point)
+
+    survivor_start = next(start for start, _, wall in group if wall is survivor)
+    survivor_end = next(end for _, end, wall in group if wall is survivor)
+    first, last = (low, high) if survivor_start <= survivor_end else (high, low)
+    (survivor.ax, survivor.ay, survivor.az) = first[1]
+    (survivor.bx, survivor.by, survivor.bz) = last[1]
+    survivor.thickness = max(wall.thickness for _, _, wall in group)
+    survivor.height = max(wall.height for _, _, wall in group)
+
+    for _, _, wall in group:
+        if wall is not survivor:
+            merged_into[wall.id] = survivor.id
+    return survivor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge shared and collinear walls of a SpatialLM layout")
+    parser.add_argument("--layout-file", type=str, required=True, help="Layout file")
+    parser.add_argument("--output", type=str, help="Output layout file (default: print)")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Snapping and overlap tolerance in meters")
+
+    args = parser.parse_args()
+
+    with open(args.layout_file, "r") as f:
+        layout = read_layout(f, Layout())
+
+    wall_count = len(layout.walls)
+    merged = merge_walls(layout, tolerance=args.tolerance)
+    print(f"Merged {len(merged)} of {wall_count} walls")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            write_layout(layout, f)
+    else:
+        write_layout(layout, sys.stdout)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,93 @@ Arc LLM Web Interface
 This script provides a web interface for Arc LLM using Flask.
 """
 
+import io
+import mimetypes
 import os
 import tempfile
+import threading
 import uuid
-from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, render_template, request, redirect, url_for, send_file, jsonify, stream_with_context
 
 from arc_llm import ArcLLM
+from entity_feed import EntityFeed, parse_cursor
+from floor_plan import render_png, render_svg
+from gltf_export import layout_to_glb
+from layout_store import RECORDING_ARTIFACT, LayoutStore
+from model_router import ModelRouter
+from room_geometry import room_report
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight, description_key
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+app.config['LAYOUT_STORE'] = os.environ.get(
+    'ARC_LLM_STORE', os.path.join(os.path.dirname(__file__), 'layouts.db')
+)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
-# Create upload folder if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Layouts and their recordings live in one indexed store; the least recently
+# updated layouts are evicted beyond the optional retention limits
+max_layouts = os.environ.get('ARC_LLM_STORE_MAX_LAYOUTS')
+max_bytes = os.environ.get('ARC_LLM_STORE_MAX_BYTES')
+layout_store = LayoutStore(
+    app.config['LAYOUT_STORE'],
+    max_layouts=int(max_layouts) if max_layouts else None,
+    max_bytes=int(max_bytes) if max_bytes else None
+)
 
 # Initialize Arc LLM
 claude_api_key = os.environ.get("CLAUDE_API_KEY")
-arc_llm = ArcLLM(claude_api_key=claude_api_key)
+# Descriptions similar to a recent one reuse its generated structure; set
+# ARC_LLM_CACHE_THRESHOLD, e.g. to 0.85, to enable the cache
+cache_threshold = float(os.environ.get("ARC_LLM_CACHE_THRESHOLD", "0"))
+semantic_cache = SemanticCache(threshold=cache_threshold, max_entries=100000) if cache_threshold > 0 else None
+# Descriptions are routed to a model by size unless ARC_LLM_MODEL_ROUTING is 0
+model_routing = os.environ.get("ARC_LLM_MODEL_ROUTING", "1") != "0"
+arc_llm = ArcLLM(
+    claude_api_key=claude_api_key,
+    semantic_cache=semantic_cache,
+    model_router=ModelRouter() if model_routing else None
+)
+generate_flight = SingleFlight()
+
+# Incremental edit sessions by layout ID, least recently used first
+MAX_SESSIONS = 256
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+# Most records a single /layouts or /usage request returns
+MAX_LIST_LIMIT = 1000
+
+# Entity feeds of streamed generations by layout ID, oldest first. Only
+# finished feeds are evicted, so at most MAX_FEEDS generations are pending
+MAX_FEEDS = 256
+feeds = OrderedDict()
+# Layout ID of the running generation by description key, so identical
+# concurrent streams share one feed
+streaming = {}
+feeds_lock = threading.Lock()
+stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ARC_LLM_STREAM_WORKERS', '8')),
+    thread_name_prefix='stream'
+)
+
+
+def _save_recording(layout_id, name, write):
+    """Write a recording to a temporary file with `write(path)` and store it."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vis_path = os.path.join(tmp_dir, name)
+        write(vis_path)
+        layout_store.put_file(layout_id, name, vis_path)
+
+
+def _send_artifact(data, name, as_attachment=False):
+    """Send the contents of a stored artifact."""
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return send_file(
+        io.BytesIO(data), mimetype=mimetype, as_attachment=as_attachment, download_name=name
+    )
 
 
 @app.route('/')
@@ -30,6 +100,38 @@ def index():
     return render_template('index.html')
 
 
+def _generate_layout(text, mode):
+    """Generate, save and render a layout; returns the JSON response fields."""
+    # Generate layout from text
+    layout_str, model = arc_llm.convert_text_to_layout(text, return_model=True)
+
+    # Save layout to the store
+    layout_id = str(uuid.uuid4())
+    layout_store.put_layout(layout_id, layout_str, description=text, model=model)
+
+    result = {
+        'layout_id': layout_id,
+        'layout': layout_str
+    }
+
+    # The 2D preview is rendered on demand, so the 3D recording is optional
+    if mode == 'preview_only':
+        return result
+
+    # Generate visualization, either as one recording or as per-floor chunks
+    if mode == 'chunked':
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            result['manifest'] = arc_llm.visualize_chunked(layout_str, chunk_dir)
+            layout_store.put_directory(layout_id, 'chunks', chunk_dir)
+        return result
+
+    _save_recording(
+        layout_id, RECORDING_ARTIFACT,
+        lambda vis_path: arc_llm.visualize(layout_str, output_file=vis_path)
+    )
+    return result
+
+
 @app.route('/generate', methods=['POST'])
 def generate():
     """Generate layout from text description."""
@@ -37,50 +139,277 @@ def generate():
     if not text:
         return jsonify({'error': 'No text provided'}), 400
 
+    if request.form.get('preview_only'):
+        mode = 'preview_only'
+    elif request.form.get('chunked'):
+        mode = 'chunked'
+    else:
+        mode = 'full'
+
     try:
-        # Generate layout from text
-        layout_str = arc_llm.convert_text_to_layout(text)
+        # Identical concurrent submissions share one generation and render
+        result = generate_flight.do(
+            description_key(text, mode), _generate_layout, text, mode
+        )
+        result = dict(result)
+        result['preview_url'] = url_for('preview', layout_id=result['layout_id'], fmt='svg')
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _stream_layout(key, layout_id, text, feed):
+    """Generate a layout in the background, publishing entities as they are parsed."""
+    try:
+        session = arc_llm.new_session()
+        for changes in arc_llm.follow_text(text, session):
+            feed.publish('entities', changes.to_dict())
+
+        # The saved layout goes through the full converter, with merged walls
+        layout_str = arc_llm.text_to_layout.generate_layout(session.description)
+        layout_store.put_layout(layout_id, layout_str, description=text, model=session.model)
+        _save_recording(
+            layout_id, RECORDING_ARTIFACT,
+            lambda vis_path: arc_llm.visualize(layout_str, output_file=vis_path)
+        )
+        feed.close('done', {'layout_id': layout_id, 'layout': layout_str})
+    except Exception as e:
+        feed.close('failed', {'error': str(e)})
+    finally:
+        with feeds_lock:
+            if streaming.get(key) == layout_id:
+                del streaming[key]
+
+
+@app.route('/stream', methods=['POST'])
+def stream():
+    """Start generating a layout and return the URL of its entity feed."""
+    text = request.form.get('text')
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+
+    # Identical concurrent submissions share one generation and feed
+    key = description_key(text, 'stream')
+    with feeds_lock:
+        layout_id = streaming.get(key)
+        if layout_id is None:
+            if len(feeds) >= MAX_FEEDS:
+                finished = [feed_id for feed_id, feed in feeds.items() if feed.closed]
+                for feed_id in finished[:len(feeds) - MAX_FEEDS + 1]:
+                    del feeds[feed_id]
+                if len(feeds) >= MAX_FEEDS:
+                    return jsonify({'error': 'Too many generations in progress'}), 503
+
+            layout_id = str(uuid.uuid4())
+            feed = EntityFeed()
+            feeds[layout_id] = feed
+            streaming[key] = layout_id
+            stream_executor.submit(_stream_layout, key, layout_id, text, feed)
+
+    return jsonify({
+        'layout_id': layout_id,
+        'events_url': url_for('events', layout_id=layout_id),
+        'preview_url': url_for('preview', layout_id=layout_id, fmt='svg')
+    })
+
 
-        # Save layout to file
-        layout_id = str(uuid.uuid4())
-        layout_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{layout_id}.txt')
-        with open(layout_path, 'w') as f:
-            f.write(layout_str)
+@app.route('/events/<layout_id>')
+def events(layout_id):
+    """
+    Stream a generation's parsed entities as server-sent events.
 
-        # Generate visualization
-        vis_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{layout_id}.rrd')
-        arc_llm.visualize(layout_str, output_file=vis_path)
+    "entities" events carry the added entity records and removed entity IDs
+    of one update, and the feed ends with a "done" or "failed" event. Clients
+    resume after a disconnect with the `Last-Event-ID` header, which
+    EventSource sends automatically, or a `cursor` query parameter.
+    """
+    with feeds_lock:
+        feed = feeds.get(layout_id)
+    if feed is None:
+        return "Feed not found", 404
+
+    cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('cursor'))
+    return Response(
+        stream_with_context(feed.stream(cursor)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/edit', methods=['POST'])
+def edit():
+    """Apply an edited structured description to a layout incrementally."""
+    description = request.form.get('description')
+    if not description:
+        return jsonify({'error': 'No description provided'}), 400
+
+    # Only layouts started by this route can be edited, so a client cannot
+    # replace a generated layout or pick its own ID
+    layout_id = request.form.get('layout_id')
+    with sessions_lock:
+        if layout_id:
+            try:
+                layout_id = str(uuid.UUID(layout_id))
+            except ValueError:
+                return jsonify({'error': 'Invalid layout ID'}), 400
+            session = sessions.pop(layout_id, None)
+            if session is None:
+                return jsonify({'error': 'Edit session not found'}), 404
+        else:
+            layout_id = str(uuid.uuid4())
+            session = arc_llm.new_session()
+        sessions[layout_id] = session
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+
+    try:
+        # Sessions are not thread-safe, so edits to one layout are serialized
+        with session.lock:
+            changes = session.update(description)
+            layout_str = session.to_language_string()
+
+            layout_store.put_layout(layout_id, layout_str)
+
+            # Revision 0 is the full recording, later revisions only the delta
+            if changes.revision == 0:
+                name = RECORDING_ARTIFACT
+            else:
+                name = f'rev{changes.revision}.rrd'
+            if not changes.is_empty or changes.revision == 0:
+                _save_recording(
+                    layout_id, name,
+                    lambda vis_path: session.visualize_changes(changes, output_file=vis_path)
+                )
 
         return jsonify({
             'layout_id': layout_id,
-            'layout': layout_str
+            'layout': layout_str,
+            'revision': changes.revision,
+            'added': len(changes.added),
+            'removed': len(changes.removed),
+            'unchanged': changes.unchanged,
+            'preview_url': url_for('preview', layout_id=layout_id, fmt='svg')
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/delta/<layout_id>/<int:revision>')
+def delta(layout_id, revision):
+    """Download the visualization delta written for one edit revision."""
+    data = layout_store.get_artifact(layout_id, f'rev{revision}.rrd')
+    if data is None:
+        return "Visualization not found", 404
+    return _send_artifact(data, f'{layout_id}.rev{revision}.rrd', as_attachment=True)
+
+
 @app.route('/view/<layout_id>')
 def view(layout_id):
     """View the visualization for a layout."""
-    layout_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{layout_id}.txt')
-    vis_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{layout_id}.rrd')
+    layout_str = layout_store.get_layout(layout_id)
+    if layout_str is None:
+        return "Layout not found", 404
 
-    if not os.path.exists(layout_path) or not os.path.exists(vis_path):
+    # Chunked layouts have no single recording to download, only a manifest
+    return render_template(
+        'view.html',
+        layout_id=layout_id,
+        layout=layout_str,
+        has_recording=layout_store.has_artifact(layout_id, RECORDING_ARTIFACT),
+        has_chunks=layout_store.has_artifact(layout_id, 'chunks/manifest.json')
+    )
+
+
+@app.route('/preview/<layout_id>.<fmt>')
+def preview(layout_id, fmt):
+    """Render a top-down 2D floor plan preview as SVG or PNG."""
+    layout_str = layout_store.get_layout(layout_id)
+    if layout_str is None:
         return "Layout not found", 404
 
-    with open(layout_path, 'r') as f:
-        layout_str = f.read()
+    floor = request.args.get('floor', type=int)
+    if fmt == 'svg':
+        return render_svg(layout_str, floor=floor), 200, {'Content-Type': 'image/svg+xml'}
+    if fmt == 'png':
+        return render_png(layout_str, floor=floor), 200, {'Content-Type': 'image/png'}
+    return "Unsupported preview format", 400
 
-    return render_template('view.html', layout_id=layout_id, layout=layout_str)
+
+@app.route('/export/<layout_id>.glb')
+def export_glb(layout_id):
+    """Download a layout as binary glTF for CAD, BIM and web 3D tools."""
+    layout_str = layout_store.get_layout(layout_id)
+    if layout_str is None:
+        return "Layout not found", 404
+
+    # Instancing needs EXT_mesh_gpu_instancing, which some importers lack
+    instancing = request.args.get('instancing', '1') != '0'
+    return layout_to_glb(layout_str, instancing=instancing), 200, {
+        'Content-Type': 'model/gltf-binary',
+        'Content-Disposition': f'attachment; filename={layout_id}.glb'
+    }
+
+
+@app.route('/rooms/<layout_id>')
+def rooms(layout_id):
+    """Get the rooms traced from a layout's walls with their measurements."""
+    layout_str = layout_store.get_layout(layout_id)
+    if layout_str is None:
+        return "Layout not found", 404
+
+    return jsonify({'rooms': room_report(layout_str)})
 
 
 @app.route('/download/<layout_id>')
 def download(layout_id):
     """Download the visualization file."""
-    vis_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{layout_id}.rrd')
-    if not os.path.exists(vis_path):
+    data = layout_store.get_artifact(layout_id, RECORDING_ARTIFACT)
+    if data is None:
         return "Visualization not found", 404
-    return send_file(vis_path, as_attachment=True)
+    return _send_artifact(data, f'{layout_id}.rrd', as_attachment=True)
+
+
+@app.route('/chunks/<layout_id>/<path:filename>')
+def chunks(layout_id, filename):
+    """Serve the chunk manifest or a single per-floor visualization chunk."""
+    data = layout_store.get_artifact(layout_id, f'chunks/{filename}')
+    if data is None:
+        return "Visualization not found", 404
+    return _send_artifact(data, filename)
+
+
+@app.route('/layouts')
+def layouts():
+    """
+    List stored layouts, most recently updated first.
+
+    Query parameters: `limit` (default 20, at most `MAX_LIST_LIMIT`), and
+    optionally `description` or `description_hash` to only list layouts
+    generated from it.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_LIST_LIMIT)
+    description = request.args.get('description')
+    description_hash = request.args.get('description_hash')
+    if description or description_hash:
+        records = layout_store.by_description(description, description_hash, limit=limit)
+    else:
+        records = layout_store.latest(limit)
+    return jsonify({'layouts': records})
+
+
+@app.route('/usage')
+def usage():
+    """
+    Get the token usage, estimated cost and latency of the Claude API calls so far.
+
+    Query parameters: `limit` (default 20, at most `MAX_LIST_LIMIT`) recent
+    calls to list.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_LIST_LIMIT)
+    return jsonify({
+        'summary': arc_llm.claude_api.usage.summary(),
+        'recent': arc_llm.claude_api.usage.recent(limit)
+    })
 
 
 @app.route('/examples')